@@ -50,8 +50,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'productinfo.middleware.QueryBudgetMiddleware',
+    'productinfo.middleware.ReplicaRoutingMiddleware',
 ]
 
+# Per-request SQL instrumentation, see productinfo.middleware.QueryBudgetMiddleware.
+# SAMPLE_RATE below 1.0 instruments only that fraction of requests.
+
+QUERY_BUDGET = {
+    'ENABLED': DEBUG,
+    'SAMPLE_RATE': 1.0,
+    'MAX_QUERIES': 50,
+    'MAX_SQL_TIME': 0.5,
+    'MAX_REPEATS': 5,
+    'RAISE': False,
+}
+
 ROOT_URLCONF = 'finalpro.urls'
 
 TEMPLATES = [
@@ -80,9 +94,175 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Reused for up to a minute, by request threads and by the executor
+        # threads of the async views alike.
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Seconds a connection waits for another's write lock before
+            # failing with "database is locked".
+            'timeout': 5,
+        },
+    },
+    # Local stand-in read replica, filled by `manage.py refresh_replicas`.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['productinfo.routers.ReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# Every worker process must see the same caches: the version stamps in the
+# default cache (see productinfo.versions) are what invalidates cached
+# pages, permission snapshots, lookup tables and ETags in all of them. The
+# file caches work for several processes on one host; use Redis or
+# Memcached across hosts. Never a LocMemCache, which is per process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Rendered page bodies, see productinfo.utils.FragmentCacheMixin.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'fragments',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
+# Replica aliases for list and detail reads, see productinfo.routers. A
+# replica is only used for a page once it has been refreshed since the last
+# write to the models on it; a session that writes reads from the primary
+# for PIN_SECONDS afterwards.
+
+READ_REPLICAS = {
+    'ALIASES': ['replica'],
+    'PIN_SECONDS': 10,
+    'SYNC_CHECK_INTERVAL': 1.0,
+}
+
+
+# SQLite tuning, see productinfo.sqlite. JOURNAL_MODE is stored in the
+# database file, so it is set by `manage.py migrate`; WAL lets reads proceed
+# during a write. The other pragmas run on every new connection and leave
+# the file alone. TRANSACTION_MODE starts the write paths' transactions
+# (productinfo.sqlite.write_atomic) with BEGIN IMMEDIATE, so concurrent
+# writers queue for the lock instead of failing. CACHE_SIZE is in KiB when
+# negative; None skips a setting.
+
+SQLITE_PROFILE = {
+    'ENABLED': True,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE': -64 * 1024,
+    'TEMP_STORE': 'MEMORY',
+    'TRANSACTION_MODE': 'IMMEDIATE',
+}
+
+
+# Stock held for cart items, see productinfo.reservations. Holds are taken
+# out of Product.stock_num and given back by `manage.py sweep_reservations`
+# once they are HOLD_SECONDS old.
+
+RESERVATIONS = {
+    'HOLD_SECONDS': 15 * 60,
+    'CAS_ATTEMPTS': 5,
+    'SWEEP_BATCH_SIZE': 500,
+}
+
+
+# Read-through Product cache, see productinfo.caches.ProductCache.
+# Entries are kept per process unless CACHE_ALIAS names a CACHES entry
+# (for example a FileBasedCache or DatabaseCache) shared by all workers.
+# A per-process entry is dropped within CHECK_INTERVAL seconds of a write
+# to its product in another process, through a version stamp per product in
+# the shared default cache. Hit and miss counts are logged every
+# STATS_LOG_INTERVAL seconds (None turns that off).
+
+PRODUCT_CACHE = {
+    'CACHE_ALIAS': None,
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 10000,
+    'CHECK_INTERVAL': 1.0,
+    'STATS_LOG_INTERVAL': 15 * 60,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'productinfo.caches': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Category, Shipping_Method and Payment_Method are kept whole in every
+# process, see productinfo.caches.LookupCache. A write elsewhere is picked
+# up within CHECK_INTERVAL seconds through the version stamps in the shared
+# default cache, and every copy is reloaded after MAX_AGE seconds anyway.
+
+LOOKUP_CACHE = {
+    'CHECK_INTERVAL': 1.0,
+    'MAX_AGE': 300,
+}
+
+# Best-seller lists, see productinfo.caches.LeaderboardCache. Each window
+# (all time, 7, 30 and 90 days) is rebuilt from the sales counters at most
+# every REFRESH_INTERVAL seconds, per process unless CACHE_ALIAS is set.
+
+LEADERBOARD = {
+    'CACHE_ALIAS': None,
+    'REFRESH_INTERVAL': 300,
+    'SIZE': 10,
+}
+
+# Background jobs, see productinfo.jobs; run them with `manage.py run_jobs`.
+# Exports and uploaded imports are kept in FILE_DIR (default BASE_DIR/jobs).
+# A running job that hasn't reported for STALE_SECONDS is queued again.
+
+JOBS = {
+    'FILE_DIR': None,
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'STALE_SECONDS': 300,
+    'PROGRESS_INTERVAL': 1.0,
+}
+
+
+AUTHENTICATION_BACKENDS = [
+    'productinfo.backends.PermissionSnapshotBackend',
+]
+
+# User rows and permission sets are cached per user, see
+# productinfo.backends. Saves replace them at once through the shared
+# version stamps; TIMEOUT bounds how long one outlives a change made
+# without signals, such as a queryset update().
+
+AUTH_SNAPSHOT = {
+    'TIMEOUT': 300,
+}
+
+# Sessions are read from the cache and written through to the database.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -1,14 +1,40 @@
 from django.contrib import admin
 
+from productinfo.forms import ProductForm
 from productinfo.models import Category, Shipping_Method, Payment_Method, Customer, Product, Shopping_Cart, Cart_Item, \
-	Order, Order_Product
+	Order, Order_Product, Job
+from productinfo.reservations import save_product
+
+
+class OrderAdmin(admin.ModelAdmin):
+	list_display = ('order_id', 'order_date', 'customer_id', 'total_price', 'line_count')
+	readonly_fields = ('total_price', 'line_count')
+	list_filter = ('order_date',)
+
+
+class ProductAdmin(admin.ModelAdmin):
+	form = ProductForm
+
+	def save_model(self, request, obj, form, change):
+		if change:
+			save_product(obj, form.cleaned_data['loaded_stock_version'])
+		else:
+			obj.save()
+
+
+class JobAdmin(admin.ModelAdmin):
+	list_display = ('job_id', 'kind', 'status', 'progress', 'total', 'created_by', 'created_at', 'finished_at')
+	list_filter = ('status', 'kind')
+	readonly_fields = ('worker', 'started_at', 'heartbeat_at', 'finished_at')
+
 
 admin.site.register(Category)
 admin.site.register(Shipping_Method)
 admin.site.register(Payment_Method)
 admin.site.register(Customer)
-admin.site.register(Product)
+admin.site.register(Product, ProductAdmin)
 admin.site.register(Shopping_Cart)
 admin.site.register(Cart_Item)
-admin.site.register(Order)
-admin.site.register(Order_Product)
\ No newline at end of file
+admin.site.register(Order, OrderAdmin)
+admin.site.register(Order_Product)
+admin.site.register(Job, JobAdmin)
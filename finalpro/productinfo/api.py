@@ -0,0 +1,110 @@
+import json
+import zlib
+
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from productinfo.models import Product
+from productinfo.versions import get_version, version_datetime
+
+PRODUCT_API_FIELDS = {
+	'product_id': 'product_id',
+	'product_name': 'product_name',
+	'product_price': 'product_price',
+	'stock_num': 'stock_num',
+	'category_id': 'category_id',
+	'category_name': 'category_id__category_name',
+}
+
+
+def catalog_etag(request, *args, **kwargs):
+	# The response depends only on the catalog version and the query string.
+	return f'{get_version("catalog")}-{zlib.crc32(request.get_full_path().encode()):x}'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+	return version_datetime(get_version('catalog'))
+
+
+def json_response(data):
+	return HttpResponse(json.dumps(data, separators=(',', ':')), content_type='application/json')
+
+
+def selected_fields(request):
+	names = [name for name in request.GET.get('fields', '').split(',') if name]
+	unknown = set(names) - set(PRODUCT_API_FIELDS)
+	if unknown:
+		raise ValueError(f'unknown fields: {", ".join(sorted(unknown))}')
+	return names or list(PRODUCT_API_FIELDS)
+
+
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
+class ProductApiList(LoginRequiredMixin, PermissionRequiredMixin, View):
+	model = Product
+	permission_required = 'productinfo.view_product'
+	# A 403 rather than a redirect to the login page, for API clients.
+	raise_exception = True
+	replica_versions = ('catalog',)
+	default_limit = 100
+	max_limit = 1000
+
+	def get(self, request):
+		try:
+			names = selected_fields(request)
+			products = self.filter_products(request.GET)
+			limit = max(1, min(int(request.GET.get('limit', self.default_limit)), self.max_limit))
+			after = int(request.GET.get('after', 0))
+		except ValueError as error:
+			return HttpResponseBadRequest(str(error))
+
+		lookups = [PRODUCT_API_FIELDS[name] for name in names]
+		rows = list(
+			products.filter(product_id__gt=after)
+			.order_by('product_id')
+			.values_list('product_id', *lookups)[:limit + 1]
+		)
+		results = [dict(zip(names, row[1:])) for row in rows[:limit]]
+		data = {'results': results, 'next': None}
+		if len(rows) > limit:
+			query = request.GET.copy()
+			query['after'] = rows[limit - 1][0]
+			data['next'] = f'{request.path}?{query.urlencode()}'
+		return json_response(data)
+
+	@staticmethod
+	def filter_products(params):
+		products = Product.objects.all()
+		if params.get('category'):
+			category = params['category']
+			if category.isdigit():
+				products = products.filter(category_id=int(category))
+			else:
+				products = products.filter(category_id__category_name=category)
+		if params.get('min_price'):
+			products = products.filter(product_price__gte=float(params['min_price']))
+		if params.get('max_price'):
+			products = products.filter(product_price__lte=float(params['max_price']))
+		if params.get('in_stock') in ('1', 'true'):
+			products = products.filter(stock_num__gt=0)
+		return products
+
+
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
+class ProductApiDetail(LoginRequiredMixin, PermissionRequiredMixin, View):
+	model = Product
+	permission_required = 'productinfo.view_product'
+	raise_exception = True
+	replica_versions = ('catalog',)
+
+	def get(self, request, pk):
+		try:
+			names = selected_fields(request)
+		except ValueError as error:
+			return HttpResponseBadRequest(str(error))
+		row = Product.objects.filter(pk=pk).values_list(*(PRODUCT_API_FIELDS[name] for name in names)).first()
+		if row is None:
+			raise Http404('No product matches the given query.')
+		return json_response(dict(zip(names, row)))
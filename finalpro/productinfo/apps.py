@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProductinfoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'productinfo'
+
+    def ready(self):
+        from productinfo import signals  # noqa: F401
@@ -0,0 +1,158 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
+
+from productinfo.caches import product_cache
+from productinfo.models import Customer, Order
+from productinfo.utils import fragment_key, fragments_cached
+from productinfo.views import CustomerDetail, CustomerList, OrderDetail, OrderList, ProductDetail, ProductList
+
+
+def run_blocking(func, *args, **kwargs):
+	# Executor threads outlive requests and request_started/request_finished
+	# never reach them, so each call does what those signals would: drop the
+	# thread's connections once broken or older than CONN_MAX_AGE.
+	close_old_connections()
+	try:
+		return func(*args, **kwargs)
+	finally:
+		close_old_connections()
+
+
+async def blocking(func, *args, **kwargs):
+	"""
+	Await a blocking ORM, cache or template call on a thread of the default
+	executor instead of the one thread that thread-sensitive sync_to_async
+	runs every sync view on, so independent calls can share asyncio.gather().
+	"""
+	return await sync_to_async(run_blocking, thread_sensitive=False)(func, *args, **kwargs)
+
+
+def has_permission(request, permission_required):
+	# request.user and its permissions may need the database.
+	user = request.user
+	if not user.is_authenticated:
+		return None
+	if isinstance(permission_required, str):
+		permission_required = (permission_required,)
+	return user.has_perms(permission_required)
+
+
+def page_state(request, view_class, fragment_names):
+	"""Return (allowed, fragment key, whether the fragments are cached) in one call."""
+	allowed = has_permission(request, view_class.permission_required)
+	if not allowed:
+		return allowed, None, False
+	key = fragment_key(request, view_class.fragment_versions)
+	return True, key, fragments_cached(fragment_names, key)
+
+
+def async_detail(view_class):
+	"""
+	Turn a coroutine that builds a detail page's context into an async view
+	with view_class's permission, template, fragment cache and replica
+	routing. The context is only built when the fragments aren't cached.
+	"""
+	opts = view_class.model._meta
+	template_name = f'{opts.app_label}/{opts.model_name}{view_class.template_name_suffix}.html'
+	fragment_names = [view_class.fragment_name, f'{view_class.fragment_name}_title']
+
+	def decorator(build_context):
+		@wraps(build_context)
+		async def view(request, *args, **kwargs):
+			allowed, key, cached = await blocking(page_state, request, view_class, fragment_names)
+			if allowed is None:
+				return redirect_to_login(request.get_full_path())
+			if not allowed:
+				raise PermissionDenied
+			context = {'fragment_key': key, 'fragment_timeout': view_class.fragment_timeout}
+			if not cached:
+				context.update(await build_context(request, *args, **kwargs))
+			return await blocking(render, request, template_name, context)
+
+		# Replica routing and benchmark_routes look the model and versions up here.
+		view.view_class = view_class
+		return view
+	return decorator
+
+
+def async_list(view_class):
+	"""
+	Serve a list view from an async view. The page is a single query, so the
+	sync view is run and rendered whole on an executor thread of its own.
+	"""
+	sync_view = view_class.as_view()
+
+	def respond(request, *args, **kwargs):
+		response = sync_view(request, *args, **kwargs)
+		if hasattr(response, 'render'):
+			response.render()
+		return response
+
+	async def view(request, *args, **kwargs):
+		return await blocking(respond, request, *args, **kwargs)
+
+	view.view_class = view_class
+	return view
+
+
+product_list = async_list(ProductList)
+customer_list = async_list(CustomerList)
+order_list = async_list(OrderList)
+
+
+@async_detail(ProductDetail)
+async def product_detail(request, pk):
+	product = await blocking(product_cache.get, pk)
+	if product is None:
+		raise Http404('No product matches the given query.')
+	return {
+		'object': product,
+		'product': product,
+		'category': product.category_id,
+	}
+
+
+@async_detail(CustomerDetail)
+async def customer_detail(request, pk):
+	customer = await blocking(get_object_or_404, Customer, pk=pk)
+	shipping_method, payment_method, order_list, shopping_cart = await asyncio.gather(
+		blocking(getattr, customer, 'sm_id'),
+		blocking(getattr, customer, 'pm_id'),
+		blocking(list, customer.orders.all()),
+		blocking(list, customer.shopping_carts.all()),
+	)
+	return {
+		'object': customer,
+		'customer': customer,
+		'shipping_method': shipping_method,
+		'payment_method': payment_method,
+		'order_list': order_list,
+		'shopping_cart': shopping_cart,
+	}
+
+
+@async_detail(OrderDetail)
+async def order_detail(request, pk):
+	order = await blocking(get_object_or_404, Order, pk=pk)
+	customer_id, shipping_method, payment_method, product_list = await asyncio.gather(
+		blocking(getattr, order, 'customer_id'),
+		blocking(getattr, order, 'sm_id'),
+		blocking(getattr, order, 'pm_id'),
+		blocking(list, order.order_products.with_subtotal().select_related('order_id', 'product_id')),
+	)
+	return {
+		'object': order,
+		'order': order,
+		'customer_id': customer_id,
+		'shipping_method': shipping_method,
+		'payment_method': payment_method,
+		'product_list': product_list,
+		'total': order.total_price,
+	}
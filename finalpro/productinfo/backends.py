@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from productinfo.versions import get_version
+
+AUTH_SNAPSHOT_DEFAULTS = {
+	'TIMEOUT': 300,
+}
+
+
+def snapshot_timeout():
+	return {**AUTH_SNAPSHOT_DEFAULTS, **getattr(settings, 'AUTH_SNAPSHOT', {})}['TIMEOUT']
+
+
+def auth_versions(user_id):
+	# 'auth' covers group and permission changes for everyone; the per-user
+	# stamp covers the user row, their groups and their own permissions.
+	return f'{get_version("auth")}.{get_version(f"user:{user_id}")}'
+
+
+class PermissionSnapshotBackend(ModelBackend):
+	"""
+	ModelBackend that keeps each user row and permission set in the cache.
+
+	The snapshot is taken at login and reused by every later request until a
+	signal in productinfo.signals bumps one of the version stamps it is
+	keyed on, or for AUTH_SNAPSHOT['TIMEOUT'] seconds at most, so
+	PermissionRequiredMixin and the template `perms` cost no auth queries.
+	"""
+
+	@staticmethod
+	def user_key(user_id):
+		return f'productinfo:auth:user:{user_id}:{auth_versions(user_id)}'
+
+	@staticmethod
+	def permissions_key(user_id):
+		return f'productinfo:auth:perms:{user_id}:{auth_versions(user_id)}'
+
+	def get_user(self, user_id):
+		key = self.user_key(user_id)
+		user = cache.get(key)
+		if user is None:
+			user = super().get_user(user_id)
+			if user is not None:
+				cache.set(key, user, timeout=snapshot_timeout())
+		return user
+
+	def get_all_permissions(self, user_obj, obj=None):
+		if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+			return set()
+		if not hasattr(user_obj, '_perm_cache'):
+			key = self.permissions_key(user_obj.pk)
+			permissions = cache.get(key)
+			if permissions is None:
+				permissions = super().get_all_permissions(user_obj)
+				cache.set(key, permissions, timeout=snapshot_timeout())
+			user_obj._perm_cache = permissions
+		return user_obj._perm_cache
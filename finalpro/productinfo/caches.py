@@ -0,0 +1,361 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from productinfo.versions import bump_version, get_version, get_versions
+
+PRODUCT_CACHE_DEFAULTS = {
+	'CACHE_ALIAS': None,
+	'TIMEOUT': 300,
+	'MAX_ENTRIES': 10000,
+	'CHECK_INTERVAL': 1.0,
+	'STATS_LOG_INTERVAL': 15 * 60,
+}
+
+LOOKUP_CACHE_DEFAULTS = {
+	'CHECK_INTERVAL': 1.0,
+	'MAX_AGE': 300,
+}
+
+LEADERBOARD_DEFAULTS = {
+	'CACHE_ALIAS': None,
+	'REFRESH_INTERVAL': 300,
+	'SIZE': 10,
+}
+
+logger = logging.getLogger('productinfo.caches')
+
+
+class LRUStore:
+	"""A thread-safe in-process store with a per-entry TTL and LRU eviction."""
+
+	def __init__(self, timeout, max_entries):
+		self.timeout = timeout
+		self.max_entries = max_entries
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+		self.evictions = 0
+
+	def get(self, key, default=None):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return default
+			expires, value = entry
+			if expires < time.monotonic():
+				del self.entries[key]
+				return default
+			self.entries.move_to_end(key)
+			return value
+
+	def set(self, key, value):
+		with self.lock:
+			self.entries[key] = (time.monotonic() + self.timeout, value)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_entries:
+				self.entries.popitem(last=False)
+				self.evictions += 1
+
+	def delete_many(self, keys):
+		with self.lock:
+			for key in keys:
+				self.entries.pop(key, None)
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+	def __len__(self):
+		with self.lock:
+			return len(self.entries)
+
+
+class SharedStore:
+	"""Adapter over a Django CACHES alias, e.g. a FileBasedCache or DatabaseCache."""
+
+	def __init__(self, alias, timeout):
+		self.cache = caches[alias]
+		self.timeout = timeout
+		self.evictions = None
+
+	def get(self, key, default=None):
+		return self.cache.get(key, default)
+
+	def set(self, key, value):
+		self.cache.set(key, value, self.timeout)
+
+	def delete_many(self, keys):
+		self.cache.delete_many(list(keys))
+
+	def __len__(self):
+		return 0
+
+
+class CachedProduct:
+	"""A cached product with the version stamp of its row it was read at."""
+
+	__slots__ = ('version', 'checked', 'product')
+
+	def __init__(self, version, checked, product):
+		self.version = version
+		self.checked = checked
+		self.product = product
+
+
+class ProductCache:
+	"""
+	Read-through cache of Product rows with their Category attached.
+
+	Entries live in this process (LRU with a TTL) unless PRODUCT_CACHE names
+	a CACHES alias, in which case every process shares them. Signals in
+	productinfo.signals invalidate entries when a product or its category is
+	written. Invalidating also moves the version stamp of each product on,
+	and a process keeping its own entries compares an entry with its stamp
+	no more than every CHECK_INTERVAL seconds, dropping only the products
+	that changed. Callers get their own copy of a cached product.
+
+	stats() is logged to "productinfo.caches" every STATS_LOG_INTERVAL
+	seconds of use.
+	"""
+
+	def __init__(self):
+		self.store = None
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.logged = None
+
+	def get_store(self):
+		if self.store is None:
+			options = {**PRODUCT_CACHE_DEFAULTS, **getattr(settings, 'PRODUCT_CACHE', {})}
+			if options['CACHE_ALIAS']:
+				self.store = SharedStore(options['CACHE_ALIAS'], options['TIMEOUT'])
+			else:
+				self.store = LRUStore(options['TIMEOUT'], options['MAX_ENTRIES'])
+			self.check_interval = options['CHECK_INTERVAL']
+			self.log_interval = options['STATS_LOG_INTERVAL']
+		return self.store
+
+	def count(self, hits=0, misses=0):
+		now = time.monotonic()
+		with self.lock:
+			self.hits += hits
+			self.misses += misses
+			if self.log_interval is None:
+				return
+			if self.logged is None:
+				self.logged = now
+			if now - self.logged < self.log_interval:
+				return
+			self.logged = now
+		logger.info('Product cache: %s', self.stats())
+
+	@staticmethod
+	def key(pk):
+		return f'productinfo:product:{pk}'
+
+	@staticmethod
+	def stamp(pk):
+		return f'product:{pk}'
+
+	def own(self, product):
+		# Entries kept in this process are shared by its threads; a shared
+		# store unpickles a new object on every read already.
+		return product if isinstance(self.store, SharedStore) else copy.deepcopy(product)
+
+	def get(self, pk):
+		return self.get_many([pk]).get(pk)
+
+	def get_many(self, pks):
+		"""Return {pk: product} for the pks that exist, reading the missing ones in one query."""
+		store = self.get_store()
+		# Deletes reach every process sharing a store already.
+		local = isinstance(store, LRUStore)
+		now = time.monotonic()
+		products = {}
+		unchecked = {}
+		for pk in pks:
+			entry = store.get(self.key(pk))
+			if entry is None:
+				continue
+			if local and now - entry.checked >= self.check_interval:
+				unchecked[pk] = entry
+			else:
+				products[pk] = self.own(entry.product)
+		if unchecked:
+			versions = get_versions(self.stamp(pk) for pk in unchecked)
+			for pk, entry in unchecked.items():
+				if versions[self.stamp(pk)] == entry.version:
+					entry.checked = now
+					products[pk] = self.own(entry.product)
+		missing = [pk for pk in pks if pk not in products]
+		self.count(hits=len(products), misses=len(missing))
+		if missing:
+			from productinfo.models import Product
+			# Stamps first: a write after this read moves them on past the entry.
+			versions = get_versions(self.stamp(pk) for pk in missing) if local else {}
+			# Always from the primary, as in LookupCache: a stale replica row
+			# would be kept under the current stamp.
+			for product in (
+				Product.objects.using(DEFAULT_DB_ALIAS).select_related('category_id').filter(pk__in=missing)
+			):
+				entry = CachedProduct(versions.get(self.stamp(product.pk)), now, self.own(product))
+				store.set(self.key(product.pk), entry)
+				products[product.pk] = product
+		return products
+
+	def invalidate(self, *pks):
+		if not pks:
+			return
+		self.get_store().delete_many(self.key(pk) for pk in pks)
+		bump_version(*(self.stamp(pk) for pk in pks))
+
+	def reset(self):
+		with self.lock:
+			self.store = None
+			self.hits = self.misses = 0
+			self.logged = None
+
+	def stats(self):
+		store = self.get_store()
+		with self.lock:
+			hits, misses = self.hits, self.misses
+		lookups = hits + misses
+		return {
+			'hits': hits,
+			'misses': misses,
+			'hit_ratio': hits / lookups if lookups else None,
+			'size': len(store),
+			'evictions': store.evictions,
+		}
+
+
+product_cache = ProductCache()
+
+
+class LookupTable:
+	def __init__(self, version, rows):
+		self.version = version
+		self.rows = rows
+		self.loaded = self.checked = time.monotonic()
+
+
+class LookupCache:
+	"""
+	Whole-table copies of the small lookup models (Category, Shipping_Method
+	and Payment_Method) kept in this process, for LookupForeignKey.
+
+	Each copy remembers the version stamp of its model it was loaded at and
+	is reloaded once the stamp has moved on. The stamp lives in the shared
+	default cache and is looked at no more than every CHECK_INTERVAL seconds,
+	so a write in another process shows up here within that interval. A copy
+	is reloaded after MAX_AGE seconds regardless, in case a stamp was missed.
+	"""
+
+	def __init__(self):
+		self.tables = {}
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def count(self, hit):
+		with self.lock:
+			if hit:
+				self.hits += 1
+			else:
+				self.misses += 1
+
+	def table(self, model):
+		label = model._meta.label_lower
+		with self.lock:
+			table = self.tables.get(label)
+		options = {**LOOKUP_CACHE_DEFAULTS, **getattr(settings, 'LOOKUP_CACHE', {})}
+		now = time.monotonic()
+		if table is not None and now - table.loaded >= options['MAX_AGE']:
+			table = None
+		if table is not None and now - table.checked < options['CHECK_INTERVAL']:
+			self.count(True)
+			return table.rows
+		version = get_version(model._meta.model_name)
+		if table is not None and table.version == version:
+			table.checked = now
+			self.count(True)
+			return table.rows
+		self.count(False)
+		# Always from the primary: a stale replica copy would be kept under
+		# the current stamp until the next write.
+		rows = {obj.pk: obj for obj in model._default_manager.using(DEFAULT_DB_ALIAS).all()}
+		with self.lock:
+			self.tables[label] = LookupTable(version, rows)
+		return rows
+
+	def get(self, model, pk):
+		return self.table(model).get(pk)
+
+	def all(self, model):
+		"""Every row, in Meta.ordering."""
+		return list(self.table(model).values())
+
+	def changed(self, model):
+		# Bumped again once the write is committed, so no process keeps a
+		# copy it loaded between the write and the commit.
+		bump_version(model._meta.model_name)
+		with self.lock:
+			self.tables.pop(model._meta.label_lower, None)
+
+	def reset(self):
+		with self.lock:
+			self.tables.clear()
+			self.hits = self.misses = 0
+
+
+lookup_cache = LookupCache()
+
+
+class LeaderboardCache:
+	"""
+	Best-seller lists from productinfo.rollups.best_sellers, rebuilt from
+	the sales counters at most every REFRESH_INTERVAL seconds per window.
+
+	Lists live in this process unless LEADERBOARD names a CACHES alias, in
+	which case one process rebuilds them for all. Keys carry the date, so
+	the windows move on at midnight.
+	"""
+
+	def __init__(self):
+		self.store = None
+		self.size = None
+
+	def get_store(self):
+		if self.store is None:
+			options = {**LEADERBOARD_DEFAULTS, **getattr(settings, 'LEADERBOARD', {})}
+			if options['CACHE_ALIAS']:
+				self.store = SharedStore(options['CACHE_ALIAS'], options['REFRESH_INTERVAL'])
+			else:
+				self.store = LRUStore(options['REFRESH_INTERVAL'], 32)
+			self.size = options['SIZE']
+		return self.store
+
+	def get(self, days=None):
+		store = self.get_store()
+		today = timezone.localdate()
+		key = f'productinfo:leaderboard:{days or "all"}:{today}'
+		board = store.get(key)
+		if board is None:
+			from productinfo.rollups import best_sellers
+			board = best_sellers(days, self.size, today)
+			store.set(key, board)
+		return board
+
+	def reset(self):
+		self.store = None
+
+
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,64 @@
+from django.utils import timezone
+
+from productinfo.models import Cart_Item, Order, Order_Product, Stock_Reservation
+from productinfo.reservations import take_stock
+from productinfo.rollups import lines_changed
+from productinfo.sqlite import write_atomic
+from productinfo.versions import bump_version
+
+
+class CheckoutError(Exception):
+	pass
+
+
+def checkout(cart, receiver, address, order_date=None):
+	"""
+	Turn a Shopping_Cart into an Order in one transaction: take the stock
+	not already held, create the order with its lines at the current
+	product prices, and empty the cart along with its holds. Returns the
+	new Order.
+	"""
+	with write_atomic():
+		lines = list(cart.cart_items.select_related('product_id', 'reservation').order_by('product_id_id'))
+		if not lines:
+			raise CheckoutError('The shopping cart is empty.')
+		# Stock already held for a line is used up rather than taken again.
+		wanted = {}
+		holds = []
+		for line in lines:
+			wanted[line.product_id_id] = wanted.get(line.product_id_id, 0) + line.quantity
+			hold = getattr(line, 'reservation', None)
+			if hold is not None:
+				wanted[hold.product_id_id] = wanted.get(hold.product_id_id, 0) - hold.quantity
+				holds.append(hold.pk)
+		take_stock(wanted)
+		if holds:
+			# Zeroed so deleting the cart items below doesn't give the stock back.
+			Stock_Reservation.objects.filter(pk__in=holds).update(quantity=0)
+
+		order = Order.objects.create(
+			receiver=receiver,
+			address=address,
+			order_date=order_date or timezone.now(),
+			sm_id_id=cart.sm_id_id,
+			pm_id_id=cart.pm_id_id,
+			customer_id_id=cart.customer_id_id,
+			# bulk_create skips the Order_Product signals that keep these.
+			total_price=sum(line.quantity * line.product_id.product_price for line in lines),
+			line_count=len(lines),
+		)
+		order_lines = Order_Product.objects.bulk_create([
+			Order_Product(
+				order_id=order,
+				product_id_id=line.product_id_id,
+				quantity=line.quantity,
+				price=line.product_id.product_price,
+			)
+			for line in lines
+		])
+		lines_changed(added=[(order.pk, line.product_id_id, line.quantity, line.price) for line in order_lines])
+		Cart_Item.objects.filter(cart_id=cart).delete()
+
+	# The bulk insert skips the model signals that do this.
+	bump_version('order_product')
+	return order
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from productinfo.models import Order_Product
+from productinfo.utils import date_range
+
+EXPORT_COLUMNS = (
+	('order_id', 'order_id'),
+	('order_date', 'order_id__order_date'),
+	('customer_id', 'order_id__customer_id'),
+	('username', 'order_id__customer_id__username'),
+	('receiver', 'order_id__receiver'),
+	('address', 'order_id__address'),
+	('shipping_method', 'order_id__sm_id__sm_name'),
+	('payment_method', 'order_id__pm_id__pm_name'),
+	('oitem_id', 'oitem_id'),
+	('product_id', 'product_id'),
+	('product_name', 'product_id__product_name'),
+	('price', 'price'),
+	('quantity', 'quantity'),
+)
+
+
+def order_lines(start=None, end=None, customer=None):
+	lines = Order_Product.objects.all()
+	lower, upper = date_range(start, end)
+	if lower is not None:
+		lines = lines.filter(order_id__order_date__gte=lower)
+	if upper is not None:
+		lines = lines.filter(order_id__order_date__lt=upper)
+	if customer is not None:
+		lines = lines.filter(order_id__customer_id=customer)
+	return lines
+
+
+def export_rows(lines, chunk_size=2000):
+	"""
+	Yield one tuple per order line, grouped by order.
+
+	Every chunk is its own short query that seeks past the last
+	(order_id, oitem_id) seen, so no read transaction or lock is held for
+	the whole export and memory stays at one chunk.
+	"""
+	# Order on the raw column: ordering on the order_id relation would
+	# follow Order.Meta.ordering and sort by date instead.
+	lines = lines.order_by('order_id_id', 'oitem_id').values_list(*(lookup for name, lookup in EXPORT_COLUMNS))
+	after = None
+	while True:
+		chunk = lines
+		if after is not None:
+			chunk = chunk.filter(Q(order_id_id__gt=after[0]) | Q(order_id_id=after[0], oitem_id__gt=after[1]))
+		count = 0
+		for row in chunk[:chunk_size].iterator(chunk_size=chunk_size):
+			count += 1
+			yield row
+		if count < chunk_size:
+			return
+		after = (row[0], row[8])
+
+
+class Echo:
+	def write(self, value):
+		return value
+
+
+def csv_lines(rows):
+	writer = csv.writer(Echo())
+	yield writer.writerow([name for name, lookup in EXPORT_COLUMNS])
+	for row in rows:
+		yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+	names = [name for name, lookup in EXPORT_COLUMNS]
+	for row in rows:
+		yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(rows, file_format):
+	return csv_lines(rows) if file_format == 'csv' else jsonl_lines(rows)
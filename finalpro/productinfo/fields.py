@@ -0,0 +1,91 @@
+import copy
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from django.forms.models import ModelChoiceIterator
+
+from productinfo.caches import lookup_cache
+
+
+def whole_table(queryset):
+	# Only an unfiltered, default-ordered queryset can be answered from the copy.
+	query = queryset.query
+	return not query.where and not query.order_by and not query.is_sliced and not query.extra
+
+
+class LookupDescriptor(ForwardManyToOneDescriptor):
+	def get_object(self, instance):
+		obj = lookup_cache.get(self.field.remote_field.model, getattr(instance, self.field.attname))
+		if obj is None:
+			return super().get_object(instance)
+		# A copy, so changes made to it don't leak into other requests.
+		return copy.copy(obj)
+
+
+class LookupChoiceIterator(ModelChoiceIterator):
+	def __iter__(self):
+		if not whole_table(self.queryset):
+			yield from super().__iter__()
+			return
+		if self.field.empty_label is not None:
+			yield ('', self.field.empty_label)
+		for obj in lookup_cache.all(self.queryset.model):
+			yield self.choice(obj)
+
+	def __len__(self):
+		if not whole_table(self.queryset):
+			return super().__len__()
+		return len(lookup_cache.all(self.queryset.model)) + (1 if self.field.empty_label is not None else 0)
+
+	def __bool__(self):
+		if not whole_table(self.queryset):
+			return super().__bool__()
+		return self.field.empty_label is not None or bool(lookup_cache.all(self.queryset.model))
+
+
+class LookupChoiceField(forms.ModelChoiceField):
+	iterator = LookupChoiceIterator
+
+	def to_python(self, value):
+		model = self.queryset.model
+		if self.to_field_name not in (None, model._meta.pk.name) or not whole_table(self.queryset):
+			return super().to_python(value)
+		if value in self.empty_values:
+			return None
+		if isinstance(value, model):
+			value = value.pk
+		try:
+			obj = lookup_cache.get(model, model._meta.pk.to_python(value))
+		except (ValidationError, TypeError):
+			obj = None
+		if obj is None:
+			raise ValidationError(
+				self.error_messages['invalid_choice'],
+				code='invalid_choice',
+				params={'value': value},
+			)
+		return copy.copy(obj)
+
+
+class LookupForeignKey(models.ForeignKey):
+	"""
+	A ForeignKey to a small lookup table whose related object and form
+	choices come from productinfo.caches.lookup_cache instead of a query.
+	"""
+	forward_related_accessor_class = LookupDescriptor
+
+	def validate(self, value, model_instance):
+		if value is None or self.get_limit_choices_to() or lookup_cache.get(self.remote_field.model, value) is None:
+			return super().validate(value, model_instance)
+		# Known to exist, so only the plain field checks are left.
+		models.Field.validate(self, value, model_instance)
+
+	def formfield(self, **kwargs):
+		return super().formfield(**{'form_class': LookupChoiceField, **kwargs})
+
+	def deconstruct(self):
+		# Nothing changes in the schema, so migrations see a plain ForeignKey.
+		name, path, args, kwargs = super().deconstruct()
+		return name, 'django.db.models.ForeignKey', args, kwargs
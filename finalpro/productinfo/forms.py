@@ -1,6 +1,7 @@
 from django import forms
 
 from productinfo.models import Customer, Product, Shopping_Cart, Cart_Item, Order, Order_Product
+from productinfo.reservations import StaleStock, save_product
 
 
 class CustomerForm(forms.ModelForm):
@@ -28,14 +29,52 @@ class CustomerForm(forms.ModelForm):
 		return self.cleaned_data['password'].strip()
 
 
+class LoadedVersionField(forms.IntegerField):
+	"""
+	A hidden version token. A redisplayed form carries the current version
+	rather than the one posted: the submission was checked against it, so
+	a stale edit is reported once and can then be saved again.
+	"""
+	widget = forms.HiddenInput
+
+	def bound_data(self, data, initial):
+		return initial
+
+
 class ProductForm(forms.ModelForm):
+	# The stock_version the edited product was loaded at, see save_product.
+	loaded_stock_version = LoadedVersionField(required=False)
+
 	class Meta:
 		model = Product
 		fields = '__all__'
 
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		if self.instance.pk is not None:
+			self.fields['loaded_stock_version'].required = True
+			self.initial.setdefault('loaded_stock_version', self.instance.stock_version)
+
 	def clean_product_name(self):
 		return self.cleaned_data['product_name'].strip()
 
+	def clean(self):
+		cleaned_data = super().clean()
+		version = cleaned_data.get('loaded_stock_version')
+		if self.instance.pk is not None and version is not None and version != self.instance.stock_version:
+			self.add_error(None, str(StaleStock(self.instance)))
+			self.add_error('stock_num', f'The current stock is {self.instance.stock_num}.')
+		return cleaned_data
+
+	def save(self, commit=True):
+		product = super().save(commit=False)
+		if commit:
+			if product._state.adding:
+				product.save()
+			else:
+				save_product(product, self.cleaned_data['loaded_stock_version'])
+		return product
+
 
 class ShoppingCartForm(forms.ModelForm):
 	class Meta:
@@ -48,6 +87,12 @@ class CartItemForm(forms.ModelForm):
 		model = Cart_Item
 		fields = '__all__'
 
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		# A cart's label shows its customer.
+		cart_field = self.fields['cart_id']
+		cart_field.queryset = cart_field.queryset.select_related('customer_id')
+
 
 class OrderForm(forms.ModelForm):
 	class Meta:
@@ -64,4 +109,56 @@ class OrderForm(forms.ModelForm):
 class OrderProductForm(forms.ModelForm):
 	class Meta:
 		model = Order_Product
-		fields = '__all__'
\ No newline at end of file
+		fields = '__all__'
+
+
+class ProductImportForm(forms.Form):
+	file = forms.FileField(help_text='CSV or JSON Lines with product_name, product_price, stock_num (available, not counting units held for carts) and category_name.')
+	format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], initial='csv')
+
+
+class OrderExportForm(forms.Form):
+	start = forms.DateField(required=False)
+	end = forms.DateField(required=False)
+	customer = forms.IntegerField(required=False)
+	format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False)
+
+
+class OrderDateFilterForm(forms.Form):
+	# A century; far larger values would take the cutoff before year 1.
+	days = forms.IntegerField(required=False, min_value=1, max_value=36500, label='Last N days')
+	start = forms.DateField(required=False)
+	end = forms.DateField(required=False)
+
+
+class ProductSearchForm(forms.Form):
+	q = forms.CharField(required=False, max_length=200, label='Search')
+
+
+class SalesReportForm(forms.Form):
+	start = forms.DateField(required=False, help_text='Defaults to twelve months before the end.')
+	end = forms.DateField(required=False, help_text='Defaults to today.')
+	product = forms.ModelChoiceField(Product.objects.all(), required=False, widget=forms.NumberInput,
+									 help_text='Product id, to see the sales of one product.')
+
+	def clean(self):
+		cleaned_data = super().clean()
+		start, end = cleaned_data.get('start'), cleaned_data.get('end')
+		if start and end and start > end:
+			raise forms.ValidationError('The start must not be after the end.')
+		return cleaned_data
+
+
+class RebuildJobForm(forms.Form):
+	batch_size = forms.IntegerField(required=False, min_value=1, help_text='Rows per transaction; blank for the default.')
+
+
+class CheckoutForm(forms.Form):
+	receiver = forms.CharField(max_length=45)
+	address = forms.CharField(max_length=225)
+
+	def clean_receiver(self):
+		return self.cleaned_data['receiver'].strip()
+
+	def clean_address(self):
+		return self.cleaned_data['address'].strip()
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+
+from productinfo.caches import product_cache
+from productinfo.models import Category, Product
+from productinfo.reservations import claim_stock_versions
+from productinfo.rollups import product_moved
+from productinfo.sqlite import write_atomic
+from productinfo.versions import bump_version
+
+PRODUCT_FIELDS = ('product_name', 'product_price', 'stock_num')
+
+
+class ImportResult:
+	def __init__(self, max_errors=100, on_error=None):
+		self.created = 0
+		self.updated = 0
+		self.error_count = 0
+		self.errors = []
+		self.max_errors = max_errors
+		self.on_error = on_error
+
+	def add_error(self, line, message):
+		self.error_count += 1
+		if len(self.errors) < self.max_errors:
+			self.errors.append((line, message))
+		if self.on_error is not None:
+			self.on_error(line, message)
+
+
+def read_rows(stream, file_format):
+	"""Yield (line number, row dict) pairs from a binary CSV or JSON Lines stream."""
+	text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+	if file_format == 'csv':
+		reader = csv.DictReader(text)
+		for row in reader:
+			yield reader.line_num, row
+	else:
+		for line_number, line in enumerate(text, start=1):
+			if not line.strip():
+				continue
+			try:
+				row = json.loads(line)
+			except ValueError as error:
+				row = {'__error__': f'invalid JSON: {error}'}
+			if not isinstance(row, dict):
+				row = {'__error__': 'expected a JSON object'}
+			yield line_number, row
+
+
+def clean_row(row, category_ids):
+	if '__error__' in row:
+		raise ValidationError(row['__error__'])
+	values = {}
+	for name in PRODUCT_FIELDS:
+		field = Product._meta.get_field(name)
+		value = row.get(name)
+		if isinstance(value, str):
+			value = value.strip()
+		try:
+			values[name] = field.clean(value, None)
+		except ValidationError as error:
+			raise ValidationError(f'{name}: {" ".join(error.messages)}')
+	category_name = str(row.get('category_name') or '').strip()
+	if category_name not in category_ids:
+		raise ValidationError(f'category_name: unknown category "{category_name}"')
+	values['category_id_id'] = category_ids[category_name]
+	return values
+
+
+def import_products(rows, batch_size=1000, result=None):
+	"""
+	Upsert products keyed on product_name from (line number, row) pairs.
+
+	Rows are consumed batch_size at a time, so memory stays flat however
+	long the input is. Invalid rows are recorded on the result and skipped;
+	each batch is written in its own transaction.
+	"""
+	result = result or ImportResult()
+	category_ids = dict(Category.objects.values_list('category_name', 'category_id'))
+	rows = iter(rows)
+	while True:
+		batch = list(islice(rows, batch_size))
+		if not batch:
+			return result
+		valid = {}
+		for line_number, row in batch:
+			try:
+				values = clean_row(row, category_ids)
+			except ValidationError as error:
+				result.add_error(line_number, ' '.join(error.messages))
+				continue
+			# A name repeated inside one batch keeps its last row.
+			valid[values['product_name']] = (line_number, values)
+		write_batch(valid, result)
+
+
+def write_batch(valid, result):
+	"""
+	Write one batch. An imported stock_num is the available stock, as in
+	ProductForm, and is written through the same compare-and-swap on
+	stock_version as save_product: a row whose stock moved on (a hold, a
+	checkout or an edit) after the batch was read is rejected rather than
+	overwriting it.
+	"""
+	with write_atomic():
+		existing = Product.objects.in_bulk(list(valid), field_name='product_name')
+		to_update = {}
+		to_create = []
+		for name, (line_number, values) in valid.items():
+			product = existing.get(name)
+			if product is None:
+				to_create.append(Product(**values))
+				continue
+			to_update[product.pk] = (line_number, product, values)
+		for pk in claim_stock_versions({pk: row[1].stock_version for pk, row in to_update.items()}):
+			line_number = to_update.pop(pk)[0]
+			result.add_error(line_number, 'stock_num: the stock changed during the import; import the row again')
+		moved = []
+		for line_number, product, values in to_update.values():
+			if values['category_id_id'] != product.category_id_id:
+				moved.append((product.pk, product.category_id_id, values['category_id_id']))
+			for field, value in values.items():
+				setattr(product, field, value)
+		Product.objects.bulk_create(to_create)
+		Product.objects.bulk_update([product for _, product, _ in to_update.values()],
+									['product_price', 'stock_num', 'category_id'])
+		for product_id, old_category_id, new_category_id in moved:
+			product_moved(product_id, old_category_id, new_category_id)
+	# Bulk writes skip the model signals that normally do this.
+	bump_version('catalog', 'product')
+	product_cache.invalidate(*to_update)
+	result.created += len(to_create)
+	result.updated += len(to_update)
@@ -0,0 +1,288 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from productinfo.exporters import export_lines, export_rows, order_lines
+from productinfo.importers import ImportResult, import_products, read_rows
+from productinfo.models import Job, Order, Product
+from productinfo.rollups import rebuild_rollups
+from productinfo.search import rebuild_search_index
+from productinfo.totals import rebuild_order_totals
+from productinfo.versions import bump_version
+
+logger = logging.getLogger('productinfo.jobs')
+
+JOBS_DEFAULTS = {
+	'FILE_DIR': None,
+	'WORKERS': 2,
+	'POLL_INTERVAL': 1.0,
+	'STALE_SECONDS': 300,
+	'PROGRESS_INTERVAL': 1.0,
+}
+
+HANDLERS = {}
+
+
+def job_settings():
+	return {**JOBS_DEFAULTS, **getattr(settings, 'JOBS', {})}
+
+
+def file_dir():
+	directory = Path(job_settings()['FILE_DIR'] or settings.BASE_DIR / 'jobs')
+	directory.mkdir(parents=True, exist_ok=True)
+	return directory
+
+
+def handler(kind, title):
+	"""Register a function(job, progress) that runs jobs of this kind and returns a summary."""
+	def register(func):
+		func.title = title
+		HANDLERS[kind] = func
+		return func
+	return register
+
+
+class JobLost(Exception):
+	"""The running job was requeued and claimed again since this worker took it."""
+
+
+def job_changed():
+	# Progress is written with update(), which skips the model signals.
+	bump_version('job')
+
+
+class Progress:
+	"""
+	Progress reporting for one running job. Writes are throttled to one per
+	PROGRESS_INTERVAL seconds and double as the job's heartbeat.
+	"""
+
+	def __init__(self, job):
+		self.job = job
+		self.interval = job_settings()['PROGRESS_INTERVAL']
+		self.written = 0.0
+
+	def __call__(self, done, total=None, force=False):
+		self.job.progress = done
+		if total is not None:
+			self.job.total = total
+		now = time.monotonic()
+		if not force and now - self.written < self.interval:
+			return
+		self.written = now
+		updated = Job.objects.filter(pk=self.job.pk, claim_token=self.job.claim_token).update(
+			progress=self.job.progress,
+			total=self.job.total,
+			heartbeat_at=timezone.now(),
+		)
+		if not updated:
+			raise JobLost(self.job.pk)
+		job_changed()
+
+
+def enqueue(kind, params=None, user=None, upload=None):
+	"""Queue a job, saving an uploaded input file first so workers never see it missing."""
+	if kind not in HANDLERS:
+		raise ValueError(f'Unknown job kind {kind!r}.')
+	input_path = ''
+	if upload is not None:
+		path = file_dir() / f'input-{uuid.uuid4().hex}{Path(upload.name).suffix}'
+		with path.open('wb') as destination:
+			for chunk in upload.chunks():
+				destination.write(chunk)
+		input_path = str(path)
+	return Job.objects.create(kind=kind, params=params or {}, created_by=user, input_path=input_path)
+
+
+def claim_next(worker):
+	"""
+	Mark the oldest queued job as running for this worker and return it, or
+	None. The claim is a compare-and-swap on status, so two workers polling
+	the same queue never both take a job, and gets a new claim_token that
+	the job's later writes are made conditional on.
+	"""
+	candidates = Job.objects.filter(status=Job.QUEUED).order_by('job_id').values_list('pk', flat=True)[:10]
+	for job_id in candidates:
+		now = timezone.now()
+		claimed = (
+			Job.objects.filter(pk=job_id, status=Job.QUEUED)
+			.update(status=Job.RUNNING, worker=worker, claim_token=uuid.uuid4().hex, started_at=now, heartbeat_at=now)
+		)
+		if claimed:
+			job_changed()
+			return Job.objects.get(pk=job_id)
+	return None
+
+
+def requeue_stale():
+	"""Put back running jobs whose worker has not reported for STALE_SECONDS."""
+	cutoff = timezone.now() - timedelta(seconds=job_settings()['STALE_SECONDS'])
+	requeued = (
+		Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff)
+		.update(status=Job.QUEUED, worker='', claim_token='', message='Requeued after its worker stopped reporting.')
+	)
+	if requeued:
+		job_changed()
+	return requeued
+
+
+def remove_file(path):
+	if path:
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+
+def run_job(job):
+	"""
+	Run a claimed job and record how it ended, or give up without a trace
+	once another claim has taken it over. Returns the status, None if lost.
+	"""
+	progress = Progress(job)
+	try:
+		try:
+			message = HANDLERS[job.kind](job, progress)
+			status = Job.DONE
+		except JobLost:
+			status = None
+		except Exception as error:
+			logger.exception('Job %s (%s) failed', job.pk, job.kind)
+			message = f'{type(error).__name__}: {error}'
+			status = Job.FAILED
+			remove_file(job.output_path)
+			job.output_path = ''
+		if status is not None:
+			# Only while still ours; a requeued job belongs to another claim now.
+			finished = Job.objects.filter(pk=job.pk, claim_token=job.claim_token).update(
+				status=status,
+				message=message or '',
+				progress=job.progress,
+				total=job.total,
+				output_path=job.output_path,
+				heartbeat_at=timezone.now(),
+				finished_at=timezone.now(),
+			)
+			if finished:
+				job_changed()
+			else:
+				status = None
+		if status is None:
+			logger.warning('Job %s (%s) was claimed again; dropping this run', job.pk, job.kind)
+			remove_file(job.output_path)
+		else:
+			# The upload is only needed until the job has run once.
+			remove_file(job.input_path)
+	finally:
+		# Pool threads outlive the job; don't leave their connections open.
+		connections.close_all()
+	return status
+
+
+class Worker:
+	"""Claims queued jobs and runs up to `workers` of them at once on a thread pool."""
+
+	def __init__(self, workers=None, poll_interval=None, name=None):
+		options = job_settings()
+		self.workers = workers or options['WORKERS']
+		self.poll_interval = poll_interval or options['POLL_INTERVAL']
+		self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+
+	def run(self, once=False):
+		"""Run jobs until interrupted, or with once=True until the queue is empty."""
+		with ThreadPoolExecutor(self.workers, thread_name_prefix='productinfo-job') as pool:
+			running = set()
+			while True:
+				requeue_stale()
+				while len(running) < self.workers:
+					job = claim_next(self.name)
+					if job is None:
+						break
+					logger.info('Running job %s (%s)', job.pk, job.kind)
+					running.add(pool.submit(run_job, job))
+				if not running:
+					if once:
+						return
+					time.sleep(self.poll_interval)
+					continue
+				running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED).not_done
+
+
+def optional_date(value):
+	return date.fromisoformat(value) if value else None
+
+
+@handler('export_orders', 'Export orders')
+def export_orders_job(job, progress):
+	params = job.params
+	file_format = params.get('format') or 'csv'
+	lines = order_lines(optional_date(params.get('start')), optional_date(params.get('end')), params.get('customer'))
+	progress(0, lines.count(), force=True)
+	# Per claim, so a run that was requeued meanwhile never writes the same file.
+	path = file_dir() / f'orders-{job.pk}-{job.claim_token}.{file_format}'
+	job.output_path = str(path)
+	exported = 0
+
+	def counted(rows):
+		nonlocal exported
+		for row in rows:
+			yield row
+			exported += 1
+			progress(exported)
+
+	with path.open('w', newline='') as output:
+		for line in export_lines(counted(export_rows(lines)), file_format):
+			output.write(line)
+	return f'Exported {exported} order lines.'
+
+
+@handler('import_products', 'Import products')
+def import_products_job(job, progress):
+	path = Path(job.input_path)
+	size = path.stat().st_size
+	result = ImportResult()
+	with path.open('rb') as stream:
+		def tracked(rows):
+			# Progress is the share of the file read so far.
+			for row in rows:
+				yield row
+				progress(stream.tell(), size)
+
+		import_products(tracked(read_rows(stream, job.params.get('format', 'csv'))), result=result)
+	progress(size, size)
+	lines = [f'Created {result.created}, updated {result.updated}, rejected {result.error_count} rows.']
+	lines.extend(f'Line {line}: {message}' for line, message in result.errors)
+	return '\n'.join(lines)
+
+
+@handler('rebuild_order_totals', 'Rebuild order totals')
+def rebuild_order_totals_job(job, progress):
+	progress(0, Order.objects.count(), force=True)
+	checked, stale = rebuild_order_totals(job.params.get('batch_size', 1000), progress=progress)
+	return f'Checked {checked} orders, rebuilt {stale}.'
+
+
+@handler('rebuild_product_search', 'Rebuild the product search index')
+def rebuild_product_search_job(job, progress):
+	if connection.vendor != 'sqlite':
+		raise RuntimeError('The product search index is an SQLite FTS5 table.')
+	progress(0, Product.objects.count(), force=True)
+	indexed = rebuild_search_index(job.params.get('batch_size', 5000), progress)
+	return f'Indexed {indexed} products.'
+
+
+@handler('rebuild_sales_rollups', 'Rebuild the sales rollups')
+def rebuild_sales_rollups_job(job, progress):
+	params = job.params
+	days = rebuild_rollups(optional_date(params.get('start')), optional_date(params.get('end')),
+						   params.get('chunk_days', 31), progress)
+	return f'Rebuilt {days} days of sales rollups.'
@@ -0,0 +1,218 @@
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from productinfo import urls
+
+# Extra query strings requested on top of the bare route, for filters that
+# change the SQL a view issues.
+ROUTE_QUERIES = {
+	'productinfo_order_list_urlpattern': ['days=30', 'start=2022-01-01&end=2022-02-01'],
+}
+
+SCAN = re.compile(r'^SCAN (?:TABLE )?(?P<table>\w+)(?: AS (?P<alias>\w+))?(?P<rest>.*)$')
+TEMP_BTREE = re.compile(r'USE TEMP B-TREE FOR (?P<clause>.+)$')
+ALIAS = re.compile(r'(?:FROM|JOIN) "(?P<table>\w+)"(?: (?P<alias>T\d+))?')
+COMPARISON = re.compile(r'"(?P<alias>\w+)"\."(?P<column>\w+)" (?P<operator>=|IN|IS|<=|>=|<|>) (?!"|T\d+\.)')
+ORDER_BY = re.compile(r' ORDER BY (?P<columns>.+?)(?: LIMIT \d+| OFFSET \d+|\)|$)')
+COLUMN = re.compile(r'"(?P<alias>\w+)"\."(?P<column>\w+)"')
+
+
+class Finding:
+	def __init__(self, route, sql, problem, model=None, columns=()):
+		self.route = route
+		self.sql = sql
+		self.problem = problem
+		self.model = model
+		self.columns = tuple(columns)
+
+
+class Command(BaseCommand):
+	help = ('Request every named productinfo route, run EXPLAIN QUERY PLAN on the queries it '
+			'issues and report full table scans and temporary B-tree sorts with the '
+			'Meta.indexes that would avoid them. SQLite only.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--username',
+							help='Request the routes as this user. Defaults to the first active superuser.')
+		parser.add_argument('--route', action='append',
+							help='Only check this URL name. Repeatable.')
+
+	def handle(self, *args, **options):
+		if connection.vendor != 'sqlite':
+			raise CommandError('EXPLAIN QUERY PLAN output is only understood for SQLite.')
+		self.verbosity = options['verbosity']
+		self.tables = {
+			model._meta.db_table: model
+			for model in apps.get_app_config('productinfo').get_models()
+		}
+
+		findings = []
+		# Nothing a GET does (sessions, last_login) is kept, the dummy cache
+		# makes every view take its cold path so all of its queries are seen,
+		# and with replicas off they all run on the connection explained.
+		with transaction.atomic(), override_settings(CACHES={
+			'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+		}, READ_REPLICAS={'ALIASES': []}):
+			client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+			client.force_login(self.get_user(options['username']))
+			for name, url in self.routes(options['route']):
+				findings.extend(self.check_route(client, name, url))
+			transaction.set_rollback(True)
+
+		self.report(findings)
+
+	def get_user(self, username):
+		users = User.objects.filter(is_active=True)
+		user = users.filter(username=username).first() if username else users.filter(is_superuser=True).first()
+		if user is None:
+			raise CommandError(f'No active user {username!r}.' if username else
+							   'No active superuser; pass --username.')
+		return user
+
+	def routes(self, names):
+		for pattern in urls.urlpatterns:
+			if names and pattern.name not in names:
+				continue
+			if 'pk' in pattern.pattern.converters:
+				model = pattern.callback.view_class.model
+				obj = model.objects.order_by('pk').first()
+				if obj is None:
+					self.stderr.write(f'Skipping {pattern.name}: no {model.__name__} rows.')
+					continue
+				url = reverse(pattern.name, kwargs={'pk': obj.pk})
+			else:
+				url = reverse(pattern.name)
+			yield pattern.name, url
+			for query in ROUTE_QUERIES.get(pattern.name, []):
+				yield pattern.name, f'{url}?{query}'
+
+	def check_route(self, client, name, url):
+		with CaptureQueriesContext(connection) as captured:
+			response = client.get(url)
+			if response.streaming:
+				# Exports only query as they are read; the first chunk is enough.
+				# The test client closes the rest without closing the connection.
+				next(iter(response.streaming_content), None)
+		if self.verbosity > 1:
+			self.stdout.write(f'{url}: {response.status_code}, {len(captured)} queries')
+
+		findings = []
+		seen = set()
+		for query in captured:
+			sql = query['sql']
+			if sql in seen or not sql.startswith('SELECT'):
+				continue
+			seen.add(sql)
+			findings.extend(self.check_query(url, sql))
+		return findings
+
+	def check_query(self, route, sql):
+		with connection.cursor() as cursor:
+			cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+			plan = [row[3] for row in cursor.fetchall()]
+		if self.verbosity > 2:
+			self.stdout.write('\n'.join([sql] + [f'  {step}' for step in plan]))
+
+		aliases = {match['alias'] or match['table']: match['table'] for match in ALIAS.finditer(sql)}
+		findings = []
+		for step in plan:
+			scan = SCAN.match(step)
+			if scan and scan['table'] in self.tables and 'USING' not in scan['rest']:
+				alias = scan['alias'] or scan['table']
+				# An unfiltered scan that stops at a LIMIT is a page read in
+				# rowid order, which is what the list views want.
+				if ' LIMIT ' in sql and not self.filtered(sql, alias):
+					continue
+				findings.append(self.propose(route, sql, f'full scan of {scan["table"]}',
+											 alias, aliases, order=False))
+			btree = TEMP_BTREE.search(step)
+			if btree:
+				alias = self.ordered_alias(sql)
+				findings.append(self.propose(route, sql, f'temp B-tree for {btree["clause"]}',
+											 alias, aliases, order=True))
+		return findings
+
+	@staticmethod
+	def filtered(sql, alias):
+		return any(match['alias'] == alias for match in COMPARISON.finditer(sql))
+
+	@staticmethod
+	def ordered_alias(sql):
+		order_by = ORDER_BY.search(sql)
+		if order_by:
+			column = COLUMN.search(order_by['columns'])
+			if column:
+				return column['alias']
+		return None
+
+	def propose(self, route, sql, problem, alias, aliases, order):
+		"""
+		Build a candidate index for `alias`: equality columns first, then
+		range columns, then the ORDER BY columns.
+		"""
+		model = self.tables.get(aliases.get(alias, alias))
+		if model is None:
+			return Finding(route, sql, problem)
+
+		equal, ranged, ordered = [], [], []
+		for match in COMPARISON.finditer(sql):
+			if match['alias'] == alias:
+				(equal if match['operator'] in ('=', 'IN', 'IS') else ranged).append(match['column'])
+		if order:
+			order_by = ORDER_BY.search(sql)
+			if order_by:
+				ordered = [
+					match['column'] for match in COLUMN.finditer(order_by['columns'])
+					if match['alias'] == alias
+				]
+		columns = list(dict.fromkeys(equal + ranged + ordered))
+		# A trailing primary key is implied by every SQLite index.
+		if columns[-1:] == [model._meta.pk.column]:
+			columns.pop()
+		if not columns or self.indexed(model, columns):
+			return Finding(route, sql, problem, model)
+		return Finding(route, sql, problem, model, columns)
+
+	@staticmethod
+	def indexed(model, columns):
+		with connection.cursor() as cursor:
+			constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+		return any(
+			constraint['columns'][:len(columns)] == columns
+			for constraint in constraints.values()
+			if constraint['index'] or constraint['unique'] or constraint['primary_key']
+		)
+
+	def report(self, findings):
+		if not findings:
+			self.stdout.write(self.style.SUCCESS('No full scans or temporary sorts found.'))
+			return
+
+		proposals = defaultdict(dict)
+		for finding in findings:
+			self.stdout.write(self.style.WARNING(f'{finding.route}: {finding.problem}'))
+			if self.verbosity > 1:
+				self.stdout.write(f'  {finding.sql}')
+			if finding.columns:
+				proposals[finding.model][finding.columns] = finding
+
+		if not proposals:
+			self.stdout.write('No index would help; these queries read whole tables or sort '
+							  'on columns an existing index already leads with.')
+			return
+		self.stdout.write('\nProposed Meta.indexes:')
+		for model, candidates in proposals.items():
+			columns_to_fields = {field.column: field.name for field in model._meta.concrete_fields}
+			self.stdout.write(f'\n{model.__name__}:')
+			for columns in candidates:
+				index = models.Index(fields=[columns_to_fields[column] for column in columns])
+				index.set_name_with_model(model)
+				self.stdout.write(f'\tmodels.Index(fields={index.fields!r}, name={index.name!r}),')
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from productinfo.management.commands.benchmark_routes import percentile
+from productinfo.models import Customer, Order, Product
+
+# (sync route, async route, model whose pks the detail routes cycle through)
+ROUTES = [
+	('productinfo_product_list_urlpattern', 'productinfo_async_product_list_urlpattern', None),
+	('productinfo_product_detail_urlpattern', 'productinfo_async_product_detail_urlpattern', Product),
+	('productinfo_customer_list_urlpattern', 'productinfo_async_customer_list_urlpattern', None),
+	('productinfo_customer_detail_urlpattern', 'productinfo_async_customer_detail_urlpattern', Customer),
+	('productinfo_order_list_urlpattern', 'productinfo_async_order_list_urlpattern', None),
+	('productinfo_order_detail_urlpattern', 'productinfo_async_order_detail_urlpattern', Order),
+]
+
+# Detail requests cycle through this many objects.
+DETAIL_OBJECTS = 100
+
+
+async def asgi_get(application, path, cookie):
+	"""Send one GET through the ASGI application the way a server like uvicorn does."""
+	path, _, query = path.partition('?')
+	scope = {
+		'type': 'http',
+		'asgi': {'version': '3.0'},
+		'http_version': '1.1',
+		'method': 'GET',
+		'scheme': 'http',
+		'path': path,
+		'raw_path': path.encode(),
+		'query_string': query.encode(),
+		'root_path': '',
+		'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+		'client': ('127.0.0.1', 0),
+		'server': ('localhost', 80),
+	}
+	status = None
+
+	async def receive():
+		return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+	async def send(message):
+		nonlocal status
+		if message['type'] == 'http.response.start':
+			status = message['status']
+
+	await application(scope, receive, send)
+	return status
+
+
+class Command(BaseCommand):
+	help = ('Compare requests per second of the sync and async product, customer and order '
+			'read views when served through ASGI with many requests in flight at once.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--concurrency', type=int, action='append',
+							help='Requests in flight at once. Repeatable; defaults to 1, 10 and 50.')
+		parser.add_argument('--requests', type=int, default=500,
+							help='Requests per route, mode and concurrency.')
+		parser.add_argument('--cold', action='store_true',
+							help='Disable the page fragment cache so every request builds its page.')
+		parser.add_argument('--username',
+							help='Benchmark as this existing user instead of a pi_admin member.')
+		parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+	def handle(self, *args, **options):
+		concurrencies = options['concurrency'] or [1, 10, 50]
+		if min(concurrencies) < 1 or options['requests'] < 1:
+			raise CommandError('--concurrency and --requests must be at least 1.')
+		cookie = self.session_cookie(options['username'])
+
+		overrides = {'READ_REPLICAS': {'ALIASES': []}}
+		if options['cold']:
+			overrides['CACHES'] = {
+				**settings.CACHES,
+				'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+			}
+		results = {}
+		with override_settings(**overrides):
+			application = ASGIHandler()
+			for sync_name, async_name, model in ROUTES:
+				paths = self.paths(model)
+				if paths is None:
+					self.stderr.write(f'Skipping {sync_name}: no {model.__name__} rows.')
+					continue
+				for name in (sync_name, async_name):
+					urls = [reverse(name, args=args) for args in paths]
+					results[name] = {}
+					for concurrency in concurrencies:
+						result = asyncio.run(self.measure(application, urls, cookie, concurrency, options['requests']))
+						results[name][concurrency] = result
+						self.stdout.write(
+							f'{name:50} c={concurrency:<4} {result["rps"]:8.1f} req/s  '
+							f'p50 {result["p50_ms"]:7.2f}ms  p95 {result["p95_ms"]:7.2f}ms  '
+							f'errors {result["errors"]}'
+						)
+
+		if options['output']:
+			report = {
+				'created': datetime.now().isoformat(timespec='seconds'),
+				'requests': options['requests'],
+				'cold': options['cold'],
+				'results': results,
+			}
+			with open(options['output'], 'w') as output:
+				json.dump(report, output, indent=2, sort_keys=True)
+			self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}.'))
+
+	@staticmethod
+	def session_cookie(username):
+		if username:
+			try:
+				user = User.objects.get(username=username)
+			except User.DoesNotExist:
+				raise CommandError(f'No user {username!r}.')
+		else:
+			user, created = User.objects.get_or_create(username='benchmark_pi_admin')
+			if created:
+				user.set_unusable_password()
+				user.save()
+			user.groups.set([Group.objects.get(name='pi_admin')])
+		client = Client()
+		client.force_login(user)
+		return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+	@staticmethod
+	def paths(model):
+		if model is None:
+			return [()]
+		pks = list(model.objects.order_by('pk').values_list('pk', flat=True)[:DETAIL_OBJECTS])
+		return [(pk,) for pk in pks] or None
+
+	@staticmethod
+	async def measure(application, urls, cookie, concurrency, total):
+		timings = []
+		errors = 0
+		sent = 0
+
+		async def client():
+			nonlocal errors, sent
+			while sent < total:
+				url = urls[sent % len(urls)]
+				sent += 1
+				start = time.perf_counter()
+				status = await asgi_get(application, url, cookie)
+				timings.append(time.perf_counter() - start)
+				if status != 200:
+					errors += 1
+
+		start = time.perf_counter()
+		await asyncio.gather(*(client() for n in range(concurrency)))
+		elapsed = time.perf_counter() - start
+		return {
+			'rps': round(total / elapsed, 1),
+			'p50_ms': round(statistics.median(timings) * 1000, 3),
+			'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+			'errors': errors,
+		}
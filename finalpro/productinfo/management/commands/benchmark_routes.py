@@ -0,0 +1,214 @@
+import importlib
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from productinfo import urls
+from productinfo.caches import leaderboard_cache, lookup_cache, product_cache
+from productinfo.management.commands.seed_data import DEFAULT_END_DATE
+from productinfo.routers import replica_exists
+
+GROUPS = ['pi_admin', 'pi_user', 'pi_customer']
+
+# Every request takes its cold path, so the timings and query counts are
+# those of the views rather than of warm fragment, permission or product
+# cache hits. Nothing is written to the caches the site uses either, such
+# as the version stamps a --scale run's seeding would bump.
+NO_CACHES = {
+	'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+	'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+# seed_data counts at scale 1; --scale N multiplies them.
+BASE_COUNTS = {
+	'customers': 200,
+	'products': 200,
+	'carts': 100,
+	'cart_items': 500,
+	'orders': 1000,
+	'order_products': 5000,
+}
+
+
+def percentile(samples, fraction):
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+	help = ('Time every named productinfo route as a pi_admin, pi_user and pi_customer member '
+			'and write p50/p95 latency, query counts and peak memory to a JSON file.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--output', default='benchmark_results.json')
+		parser.add_argument('--repeat', type=int, default=20)
+		parser.add_argument('--scale', type=int, action='append',
+							help='Seed a throwaway test database at this multiple of the base '
+								 'counts and benchmark it. Repeatable. Without it the configured '
+								 'database is benchmarked as is.')
+		parser.add_argument('--baseline', help='Compare this run against a saved results file.')
+		parser.add_argument('--threshold', type=float, default=1.25,
+							help='Report routes whose p95 or query count grew by more than this factor.')
+
+	def handle(self, *args, **options):
+		self.verbosity = options['verbosity']
+		results = {}
+		with override_settings(
+			CACHES=NO_CACHES,
+			PRODUCT_CACHE={**getattr(settings, 'PRODUCT_CACHE', {}), 'CACHE_ALIAS': None},
+			LEADERBOARD={**getattr(settings, 'LEADERBOARD', {}), 'CACHE_ALIAS': None},
+		):
+			if options['scale']:
+				for scale in options['scale']:
+					results[f'scale-{scale}'] = self.run_scaled(scale, options['repeat'])
+			else:
+				results['current'] = self.run_routes(options['repeat'])
+
+		report = {
+			'created': datetime.now().isoformat(timespec='seconds'),
+			'repeat': options['repeat'],
+			'results': results,
+		}
+		with open(options['output'], 'w') as output:
+			json.dump(report, output, indent=2, sort_keys=True)
+		self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}.'))
+
+		if options['baseline']:
+			with open(options['baseline']) as baseline:
+				regressions = self.compare(json.load(baseline)['results'], results, options['threshold'])
+			for line in regressions:
+				self.stdout.write(self.style.WARNING(line))
+			if regressions:
+				raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}.')
+			self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+	def run_scaled(self, scale, repeat):
+		old_name = connection.settings_dict['NAME']
+		connection.creation.create_test_db(verbosity=0, autoclobber=True)
+		# Replicas are copies of the real database, not of the test one.
+		replicas_off = override_settings(READ_REPLICAS={'ALIASES': []})
+		replicas_off.enable()
+		try:
+			# Permissions only exist after the first post_migrate, which is too
+			# late for migration 0008 on a fresh database; assign them again.
+			migration = importlib.import_module('productinfo.migrations.0008_create_group_permissions')
+			migration.add_group_permissions_data(apps, None)
+			call_command('seed_data', seed=scale, end_date=DEFAULT_END_DATE,
+						 stdout=self.stdout if self.verbosity > 1 else None,
+						 **{name: count * scale for name, count in BASE_COUNTS.items()})
+			return self.run_routes(repeat)
+		finally:
+			replicas_off.disable()
+			connection.creation.destroy_test_db(old_name, verbosity=0)
+
+	def run_routes(self, repeat):
+		routes = list(self.routes())
+		results = {}
+		for group_name in GROUPS:
+			client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+			user = self.benchmark_user(group_name)
+			try:
+				client.force_login(user)
+				results[group_name] = {
+					name: self.measure(client, url, repeat)
+					for name, url in routes
+				}
+			finally:
+				# Leave the benchmarked database without the user or its session.
+				client.logout()
+				user.delete()
+		return results
+
+	@staticmethod
+	def benchmark_user(group_name):
+		# Left over if an earlier run was killed; it is ours to replace.
+		User.objects.filter(username=f'benchmark_{group_name}').delete()
+		user = User(username=f'benchmark_{group_name}')
+		user.set_unusable_password()
+		user.save()
+		user.groups.set([Group.objects.get(name=group_name)])
+		return user
+
+	@staticmethod
+	def capture_queries(stack):
+		"""Capture the queries of every database alias, skipping SQLite files that don't exist."""
+		return [
+			stack.enter_context(CaptureQueriesContext(connections[alias]))
+			for alias in connections
+			if replica_exists(alias)
+		]
+
+	def routes(self):
+		for pattern in urls.urlpatterns:
+			if 'pk' in pattern.pattern.converters:
+				model = pattern.callback.view_class.model
+				obj = model.objects.order_by('pk').first()
+				if obj is None:
+					self.stderr.write(f'Skipping {pattern.name}: no {model.__name__} rows.')
+					continue
+				yield pattern.name, reverse(pattern.name, kwargs={'pk': obj.pk})
+			else:
+				yield pattern.name, reverse(pattern.name)
+
+	@staticmethod
+	def clear_process_caches():
+		for store in (lookup_cache, product_cache, leaderboard_cache):
+			store.reset()
+
+	def measure(self, client, url, repeat):
+		timings = []
+		query_counts = []
+		for n in range(repeat):
+			self.clear_process_caches()
+			with ExitStack() as stack:
+				captured = self.capture_queries(stack)
+				start = time.perf_counter()
+				response = client.get(url)
+				timings.append(time.perf_counter() - start)
+			query_counts.append(sum(len(queries) for queries in captured))
+
+		# Tracing allocations slows requests down a lot, so peak memory is
+		# taken from one extra request outside the timed ones.
+		self.clear_process_caches()
+		tracemalloc.start()
+		try:
+			client.get(url)
+			peak = tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+		return {
+			'url': url,
+			'status': response.status_code,
+			'p50_ms': round(statistics.median(timings) * 1000, 3),
+			'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+			'queries': max(query_counts),
+			'peak_memory_kb': round(peak / 1024, 1),
+		}
+
+	@staticmethod
+	def compare(baseline, current, threshold):
+		regressions = []
+		for scale, groups in current.items():
+			for group_name, routes in groups.items():
+				for name, result in routes.items():
+					before = baseline.get(scale, {}).get(group_name, {}).get(name)
+					if before is None:
+						continue
+					for metric in ('p95_ms', 'queries'):
+						if before[metric] and result[metric] > before[metric] * threshold:
+							regressions.append(
+								f'{scale} {group_name} {name}: {metric} {before[metric]} -> {result[metric]}')
+		return regressions
@@ -0,0 +1,131 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import F
+from django.test.utils import override_settings
+
+from productinfo.models import Customer, Order, Product
+from productinfo.sqlite import sqlite_profile_settings, write_atomic
+
+ALIAS = 'sqlite_benchmark'
+
+
+class Worker(threading.Thread):
+	"""Mix of page-sized reads and read-then-write transactions like a form post."""
+
+	def __init__(self, deadline, write_ratio, product_pks, customer_pks, seed):
+		super().__init__()
+		self.deadline = deadline
+		self.write_ratio = write_ratio
+		self.product_pks = product_pks
+		self.customer_pks = customer_pks
+		self.random = random.Random(seed)
+		self.reads = self.writes = self.locked = 0
+		self.latencies = []
+
+	def run(self):
+		try:
+			while time.monotonic() < self.deadline:
+				start = time.perf_counter()
+				try:
+					if self.random.random() < self.write_ratio:
+						self.write()
+						self.writes += 1
+					else:
+						self.read()
+						self.reads += 1
+				except OperationalError:
+					self.locked += 1
+				self.latencies.append(time.perf_counter() - start)
+		finally:
+			connections[ALIAS].close()
+
+	def read(self):
+		customer = self.random.choice(self.customer_pks)
+		list(Order.objects.using(ALIAS).filter(customer_id=customer)[:25])
+		list(Product.objects.using(ALIAS).filter(pk__gte=self.random.choice(self.product_pks))[:25])
+
+	def write(self):
+		with write_atomic(ALIAS):
+			product = Product.objects.using(ALIAS).get(pk=self.random.choice(self.product_pks))
+			Product.objects.using(ALIAS).filter(pk=product.pk).update(stock_num=F('stock_num') + 1)
+
+
+class Command(BaseCommand):
+	help = ('Measure read and write throughput of the default SQLite database under concurrent '
+			'threads, without and with the SQLITE_PROFILE pragmas. Runs against throwaway copies.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--threads', type=int, default=8)
+		parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run.')
+		parser.add_argument('--write-ratio', type=float, default=0.2)
+
+	def handle(self, *args, **options):
+		self.duration = options['duration']
+		source = connections['default']
+		if source.vendor != 'sqlite' or source.is_in_memory_db():
+			raise CommandError('The default database must be an SQLite file.')
+		product_pks = list(Product.objects.values_list('pk', flat=True))
+		customer_pks = list(Customer.objects.values_list('pk', flat=True))
+		if not product_pks or not customer_pks:
+			raise CommandError('Seed some products and customers first, e.g. with seed_data.')
+
+		profile = {**sqlite_profile_settings(), 'ENABLED': True}
+		runs = [
+			('default pragmas', {'ENABLED': False}, 'DELETE'),
+			('SQLITE_PROFILE', profile, profile['JOURNAL_MODE']),
+		]
+		with tempfile.TemporaryDirectory() as directory:
+			for label, run_profile, journal_mode in runs:
+				path = Path(directory) / f'{label.split()[0].lower()}.sqlite3'
+				self.copy_database(source, path, journal_mode)
+				connections.databases[ALIAS] = {**source.settings_dict, 'NAME': str(path)}
+				try:
+					with override_settings(SQLITE_PROFILE=run_profile):
+						self.report(label, self.run_workers(options, product_pks, customer_pks))
+				finally:
+					connections[ALIAS].close()
+					del connections.databases[ALIAS]
+
+	@staticmethod
+	def copy_database(source, path, journal_mode):
+		source.ensure_connection()
+		target = sqlite3.connect(path)
+		try:
+			source.connection.backup(target)
+			# The journal mode is stored in the file, so each copy starts from
+			# the mode its run is meant to measure.
+			target.execute(f'PRAGMA journal_mode = {journal_mode}')
+		finally:
+			target.close()
+
+	@staticmethod
+	def run_workers(options, product_pks, customer_pks):
+		deadline = time.monotonic() + options['duration']
+		workers = [
+			Worker(deadline, options['write_ratio'], product_pks, customer_pks, seed)
+			for seed in range(options['threads'])
+		]
+		for worker in workers:
+			worker.start()
+		for worker in workers:
+			worker.join()
+		return workers
+
+	def report(self, label, workers):
+		duration = self.duration
+		latencies = sorted(latency for worker in workers for latency in worker.latencies)
+		reads = sum(worker.reads for worker in workers)
+		writes = sum(worker.writes for worker in workers)
+		locked = sum(worker.locked for worker in workers)
+		p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0
+		self.stdout.write(
+			f'{label:>16}: {reads / duration:8.1f} reads/s  {writes / duration:7.1f} writes/s  '
+			f'{locked:5d} locked  p95 {p95 * 1000:7.2f} ms'
+		)
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productinfo.exporters import export_lines, export_rows, order_lines
+
+
+class Command(BaseCommand):
+	help = 'Stream orders and their lines as CSV or JSON Lines, one row per order line.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--output', help='File to write; defaults to stdout.')
+		parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+		parser.add_argument('--start', type=date.fromisoformat, help='First order date (YYYY-MM-DD).')
+		parser.add_argument('--end', type=date.fromisoformat, help='Last order date (YYYY-MM-DD).')
+		parser.add_argument('--customer', type=int, help='Only this customer_id.')
+		parser.add_argument('--chunk-size', type=int, default=2000,
+							help='Order lines read per query.')
+
+	def handle(self, *args, **options):
+		if options['chunk_size'] < 1:
+			raise CommandError('--chunk-size must be at least 1.')
+		lines = order_lines(options['start'], options['end'], options['customer'])
+		output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+		try:
+			for line in export_lines(export_rows(lines, options['chunk_size']), options['format']):
+				output.write(line)
+		finally:
+			if output is not self.stdout:
+				output.close()
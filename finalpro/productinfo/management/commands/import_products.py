@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productinfo.importers import ImportResult, import_products, read_rows
+
+
+class Command(BaseCommand):
+	help = ('Create or update products from a CSV or JSON Lines file with product_name, '
+			'product_price, stock_num and category_name columns.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('path')
+		parser.add_argument('--format', choices=['csv', 'jsonl'],
+							help='Defaults to the file extension.')
+		parser.add_argument('--batch-size', type=int, default=1000,
+							help='Rows written per transaction.')
+
+	def handle(self, *args, **options):
+		if options['batch_size'] < 1:
+			raise CommandError('--batch-size must be at least 1.')
+		path = Path(options['path'])
+		file_format = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.json') else 'csv')
+		result = ImportResult(
+			max_errors=0,
+			on_error=lambda line, message: self.stderr.write(f'line {line}: {message}'),
+		)
+		with path.open('rb') as stream:
+			import_products(read_rows(stream, file_format), options['batch_size'], result)
+		self.stdout.write(self.style.SUCCESS(
+			f'Created {result.created}, updated {result.updated}, rejected {result.error_count} rows.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productinfo.totals import rebuild_order_totals
+
+
+class Command(BaseCommand):
+	help = 'Rebuild or verify the materialized Order.total_price and Order.line_count.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000,
+							help='Orders updated per transaction.')
+		parser.add_argument('--verify', action='store_true',
+							help='Only report orders whose stored totals are stale.')
+
+	def handle(self, *args, **options):
+		if options['batch_size'] < 1:
+			raise CommandError('--batch-size must be at least 1.')
+		verify = options['verify']
+
+		def report(order, row):
+			self.stdout.write(
+				f'order {order.pk}: stored {order.total_price} / {order.line_count} lines, '
+				f'actual {row["total"]} / {row["count"]} lines'
+			)
+
+		checked, stale = rebuild_order_totals(options['batch_size'], verify, report if verify else None)
+		action = 'found stale' if verify else 'rebuilt'
+		self.stdout.write(self.style.SUCCESS(f'Checked {checked} orders, {action} {stale}.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from productinfo.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+	help = ('Rebuild the product full-text search index from Product and Category, a batch '
+			'of products per transaction, e.g. after writes that bypassed its triggers.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=5000,
+							help='Products reindexed per transaction.')
+
+	def handle(self, *args, **options):
+		if connection.vendor != 'sqlite':
+			raise CommandError('The product search index is an SQLite FTS5 table.')
+		if options['batch_size'] < 1:
+			raise CommandError('--batch-size must be at least 1.')
+
+		def progress(indexed):
+			if options['verbosity'] > 1:
+				self.stdout.write(f'{indexed} products indexed...')
+
+		start = time.perf_counter()
+		indexed = rebuild_search_index(options['batch_size'], progress)
+		self.stdout.write(f'Indexed {indexed} products in {time.perf_counter() - start:.2f}s.')
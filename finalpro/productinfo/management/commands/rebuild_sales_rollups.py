@@ -0,0 +1,33 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productinfo.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+	help = ('Backfill the daily sales rollups from the order history, a chunk of days per '
+			'transaction, e.g. after bulk writes that bypassed the Order_Product signals.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--start', type=date.fromisoformat,
+							help='First day to rebuild (YYYY-MM-DD); defaults to the first order.')
+		parser.add_argument('--end', type=date.fromisoformat,
+							help='Last day to rebuild (YYYY-MM-DD); defaults to the last order.')
+		parser.add_argument('--chunk-days', type=int, default=31,
+							help='Days rebuilt per transaction.')
+
+	def handle(self, *args, **options):
+		if options['chunk_days'] < 1:
+			raise CommandError('--chunk-days must be at least 1.')
+		if options['start'] and options['end'] and options['start'] > options['end']:
+			raise CommandError('--start must not be after --end.')
+
+		def progress(days):
+			if options['verbosity'] > 1:
+				self.stdout.write(f'{days} days rebuilt...')
+
+		start = time.perf_counter()
+		days = rebuild_rollups(options['start'], options['end'], options['chunk_days'], progress)
+		self.stdout.write(f'Rebuilt {days} days of sales rollups in {time.perf_counter() - start:.2f}s.')
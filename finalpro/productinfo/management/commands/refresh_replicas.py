@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from productinfo.routers import SYNC_TABLE, read_replica_settings, sync_stamps
+from productinfo.versions import now_version
+
+
+class Command(BaseCommand):
+	help = ('Copy the primary SQLite database into each READ_REPLICAS alias with the online '
+			'backup API, and record when, so the router only uses replicas that are current.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--database', action='append',
+							help='Refresh only this replica alias. Repeatable.')
+		parser.add_argument('--interval', type=float,
+							help='Keep refreshing every this many seconds.')
+
+	def handle(self, *args, **options):
+		aliases = options['database'] or read_replica_settings()['ALIASES']
+		if not aliases:
+			raise CommandError('READ_REPLICAS lists no ALIASES.')
+		for alias in aliases:
+			if alias not in connections.databases or alias == DEFAULT_DB_ALIAS:
+				raise CommandError(f'{alias!r} is not a replica database alias.')
+			if connections[alias].vendor != 'sqlite' or connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+				raise CommandError(f'{alias}: only SQLite replicas of an SQLite primary can be copied here.')
+
+		while True:
+			for alias in aliases:
+				start = time.perf_counter()
+				self.refresh(alias)
+				self.stdout.write(f'Refreshed {alias} in {time.perf_counter() - start:.2f}s.')
+			if not options['interval']:
+				break
+			time.sleep(options['interval'])
+
+	@staticmethod
+	def refresh(alias):
+		# Stamp before copying: a write that lands during the copy gets a
+		# newer version and keeps the replica unused for that model.
+		stamp = now_version()
+		source = connections[DEFAULT_DB_ALIAS]
+		target = connections[alias]
+		source.ensure_connection()
+		target.ensure_connection()
+		source.connection.backup(target.connection)
+		with target.cursor() as cursor:
+			cursor.execute(f'CREATE TABLE IF NOT EXISTS {SYNC_TABLE} (synced_at integer NOT NULL)')
+			cursor.execute(f'DELETE FROM {SYNC_TABLE}')
+			cursor.execute(f'INSERT INTO {SYNC_TABLE} (synced_at) VALUES (%s)', [stamp])
+		sync_stamps.reset()
@@ -0,0 +1,38 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productinfo.jobs import HANDLERS, Worker, enqueue
+
+
+class Command(BaseCommand):
+	help = ('Run queued background jobs (exports, imports and rebuilds) on a pool of threads, '
+			'or queue one with --enqueue.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--workers', type=int,
+							help='Jobs run at once; defaults to JOBS["WORKERS"].')
+		parser.add_argument('--poll-interval', type=float,
+							help='Seconds between looks at the queue; defaults to JOBS["POLL_INTERVAL"].')
+		parser.add_argument('--once', action='store_true',
+							help='Exit once the queue is empty instead of waiting for more jobs.')
+		parser.add_argument('--enqueue', choices=sorted(HANDLERS),
+							help='Queue a job of this kind with default parameters and exit.')
+
+	def handle(self, *args, **options):
+		if options['enqueue']:
+			job = enqueue(options['enqueue'])
+			self.stdout.write(f'Queued job {job.pk}.')
+			return
+		if options['workers'] is not None and options['workers'] < 1:
+			raise CommandError('--workers must be at least 1.')
+		if options['verbosity'] > 1:
+			logger = logging.getLogger('productinfo.jobs')
+			logger.setLevel(logging.INFO)
+			logger.addHandler(logging.StreamHandler(self.stdout))
+		worker = Worker(options['workers'], options['poll_interval'])
+		self.stdout.write(f'Worker {worker.name} running up to {worker.workers} jobs at once.')
+		try:
+			worker.run(once=options['once'])
+		except KeyboardInterrupt:
+			self.stdout.write('Stopped; running jobs were allowed to finish.')
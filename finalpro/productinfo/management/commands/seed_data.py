@@ -0,0 +1,233 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from productinfo.models import (
+	Category,
+	Shipping_Method,
+	Payment_Method,
+	Customer,
+	Product,
+	Shopping_Cart,
+	Cart_Item,
+	Order,
+	Order_Product,
+)
+from productinfo.rollups import rebuild_rollups
+from productinfo.versions import bump_version
+
+# A fixed default rather than today, so a --seed reproduces the same rows on
+# any day.
+DEFAULT_END_DATE = date(2022, 5, 1)
+
+
+def next_pk(model):
+	return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def spread(total, buckets):
+	"""Split total into `buckets` counts that differ by at most one."""
+	base, extra = divmod(total, buckets) if buckets else (0, 0)
+	for index in range(buckets):
+		yield base + (1 if index < extra else 0)
+
+
+class Command(BaseCommand):
+	help = ('Seed synthetic productinfo data for load testing. The same --seed, counts '
+			'and --end-date (which defaults to a fixed date) on an empty database always '
+			'produce identical rows; on one with rows, primary keys follow the existing ones.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--seed', type=int, default=0)
+		parser.add_argument('--batch-size', type=int, default=5000)
+		parser.add_argument('--categories', type=int, default=20)
+		parser.add_argument('--shipping-methods', type=int, default=5)
+		parser.add_argument('--payment-methods', type=int, default=5)
+		parser.add_argument('--customers', type=int, default=1000)
+		parser.add_argument('--products', type=int, default=1000)
+		parser.add_argument('--carts', type=int, default=500)
+		parser.add_argument('--cart-items', type=int, default=2000)
+		parser.add_argument('--orders', type=int, default=5000)
+		parser.add_argument('--order-products', type=int, default=20000)
+		parser.add_argument('--days', type=int, default=365,
+							help='Spread order dates over this many days before --end-date.')
+		parser.add_argument('--end-date', type=date.fromisoformat, default=DEFAULT_END_DATE,
+							help=f'Last order date (YYYY-MM-DD), {DEFAULT_END_DATE} by default.')
+
+	def handle(self, *args, **options):
+		self.rng = random.Random(options['seed'])
+		self.batch_size = options['batch_size']
+		self.prefix = f's{options["seed"]}'
+
+		counts = {name: options[name] for name in (
+			'categories', 'shipping_methods', 'payment_methods', 'customers', 'products',
+			'carts', 'cart_items', 'orders', 'order_products')}
+		for lookup in ('categories', 'shipping_methods', 'payment_methods', 'customers'):
+			if counts[lookup] < 1 and any(counts[name] for name in ('products', 'carts', 'orders')):
+				raise CommandError(f'--{lookup.replace("_", "-")} must be at least 1.')
+		if counts['carts'] > counts['customers']:
+			raise CommandError('Each customer has at most one shopping cart: --carts must not exceed --customers.')
+		if counts['cart_items'] > counts['carts'] * counts['products']:
+			raise CommandError('--cart-items must not exceed --carts x --products.')
+		if counts['order_products'] and not (counts['orders'] and counts['products']):
+			raise CommandError('--order-products needs at least one order and one product.')
+
+		try:
+			self.seed_lookups(counts)
+			self.seed_customers(counts['customers'])
+			self.seed_products(counts['products'])
+			self.seed_carts(counts['carts'], counts['cart_items'])
+			self.seed_orders(counts['orders'], counts['order_products'], options['end_date'], options['days'])
+			if counts['orders']:
+				# The bulk inserts skip the signals that keep the sales rollups.
+				rebuild_rollups(options['end_date'] - timedelta(days=max(options['days'], 1)), options['end_date'])
+			bump_version('catalog', *(model._meta.model_name for model in (
+				Category, Shipping_Method, Payment_Method, Customer, Product,
+				Shopping_Cart, Cart_Item, Order, Order_Product)))
+		except IntegrityError as error:
+			raise CommandError(f'{error}. Rows from seed {options["seed"]} probably exist already; '
+							   'use another --seed or an empty database.')
+		self.stdout.write(self.style.SUCCESS(
+			'Seeded ' + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items()) + '.'))
+
+	def create(self, model, objects):
+		batch = []
+		for obj in objects:
+			batch.append(obj)
+			if len(batch) >= self.batch_size:
+				self.flush(model, batch)
+				batch = []
+		if batch:
+			self.flush(model, batch)
+
+	@staticmethod
+	def flush(model, batch):
+		with transaction.atomic():
+			model.objects.bulk_create(batch)
+
+	def seed_lookups(self, counts):
+		self.category_ids = self.create_lookup(
+			Category, counts['categories'], 'category', 'category_name', 'category_description')
+		self.sm_ids = self.create_lookup(
+			Shipping_Method, counts['shipping_methods'], 'shipping', 'sm_name', 'sm_description')
+		self.pm_ids = self.create_lookup(
+			Payment_Method, counts['payment_methods'], 'payment', 'pm_name', 'pm_description')
+
+	def create_lookup(self, model, count, label, name_field, description_field):
+		start = next_pk(model)
+		self.create(model, (
+			model(pk=start + n, **{
+				name_field: f'{self.prefix}-{label}-{n}',
+				description_field: f'Synthetic {label} {n}',
+			})
+			for n in range(count)
+		))
+		return range(start, start + count)
+
+	def seed_customers(self, count):
+		start = next_pk(Customer)
+		rng = self.rng
+		self.customer_ids = range(start, start + count)
+		self.create(Customer, (
+			Customer(
+				pk=pk,
+				first_name=f'First{pk}',
+				last_name=f'Last{pk}',
+				username=f'{self.prefix}-user{pk}',
+				password='seeded',
+				email=f'{self.prefix}-user{pk}@example.com',
+				sm_id_id=rng.choice(self.sm_ids),
+				pm_id_id=rng.choice(self.pm_ids),
+			)
+			for pk in self.customer_ids
+		))
+
+	def seed_products(self, count):
+		start = next_pk(Product)
+		rng = self.rng
+		self.product_ids = range(start, start + count)
+		self.product_prices = [round(rng.uniform(0.5, 200), 2) for n in range(count)]
+		self.create(Product, (
+			Product(
+				pk=pk,
+				product_name=f'{self.prefix}-product-{pk}',
+				product_price=price,
+				stock_num=rng.randint(0, 500),
+				category_id_id=rng.choice(self.category_ids),
+			)
+			for pk, price in zip(self.product_ids, self.product_prices)
+		))
+
+	def seed_carts(self, count, item_count):
+		rng = self.rng
+		start = next_pk(Shopping_Cart)
+		cart_ids = range(start, start + count)
+		self.create(Shopping_Cart, (
+			Shopping_Cart(
+				pk=pk,
+				customer_id_id=customer_id,
+				sm_id_id=rng.choice(self.sm_ids),
+				pm_id_id=rng.choice(self.pm_ids),
+			)
+			for pk, customer_id in zip(cart_ids, self.customer_ids)
+		))
+
+		def items():
+			pk = next_pk(Cart_Item)
+			for cart_id, lines in zip(cart_ids, spread(item_count, count)):
+				# Sample without replacement to honour unique (cart_id, product_id).
+				for product_id in rng.sample(self.product_ids, lines):
+					yield Cart_Item(pk=pk, cart_id_id=cart_id, product_id_id=product_id,
+									quantity=rng.randint(1, 5))
+					pk += 1
+
+		self.create(Cart_Item, items())
+
+	def seed_orders(self, count, line_count, end_date, days):
+		rng = self.rng
+		end = timezone.make_aware(datetime.combine(end_date, time.max).replace(microsecond=0))
+		span = max(days, 1) * 86400
+		order_pk = next_pk(Order)
+		line_pk = next_pk(Order_Product)
+		orders, lines = [], []
+		for lines_in_order in spread(line_count, count):
+			order = Order(
+				pk=order_pk,
+				order_date=end - timedelta(seconds=rng.randrange(span)),
+				receiver=f'Receiver {order_pk}',
+				address=f'{order_pk} Synthetic St',
+				customer_id_id=rng.choice(self.customer_ids),
+				sm_id_id=rng.choice(self.sm_ids),
+				pm_id_id=rng.choice(self.pm_ids),
+			)
+			# bulk_create skips the Order_Product signals, so fill the
+			# materialized totals in as the lines are generated.
+			for n in range(lines_in_order):
+				index = rng.randrange(len(self.product_ids))
+				line = Order_Product(
+					pk=line_pk,
+					order_id_id=order_pk,
+					product_id_id=self.product_ids[index],
+					price=self.product_prices[index],
+					quantity=rng.randint(1, 5),
+				)
+				order.total_price += line.price * line.quantity
+				order.line_count += 1
+				lines.append(line)
+				line_pk += 1
+			orders.append(order)
+			order_pk += 1
+			if len(lines) >= self.batch_size or len(orders) >= self.batch_size:
+				self.flush_orders(orders, lines)
+				orders, lines = [], []
+		if orders:
+			self.flush_orders(orders, lines)
+
+	def flush_orders(self, orders, lines):
+		with transaction.atomic():
+			Order.objects.bulk_create(orders)
+			Order_Product.objects.bulk_create(lines)
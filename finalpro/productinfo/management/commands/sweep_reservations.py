@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from productinfo.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+	help = 'Give the stock of expired cart item holds back to their products.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int,
+							help='Holds released per transaction; defaults to RESERVATIONS["SWEEP_BATCH_SIZE"].')
+		parser.add_argument('--interval', type=float,
+							help='Keep sweeping every this many seconds.')
+
+	def handle(self, *args, **options):
+		while True:
+			released = sweep_expired(batch_size=options['batch_size'])
+			if released or options['verbosity'] > 1:
+				self.stdout.write(f'Released {released} expired holds.')
+			if not options['interval']:
+				break
+			time.sleep(options['interval'])
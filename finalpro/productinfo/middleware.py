@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from productinfo.routers import (
+	PIN_SESSION_KEY, RequestRouting, choose_replica, read_replica_settings, replica_versions, routing,
+	serves_from_replica,
+)
+
+logger = logging.getLogger('productinfo.querybudget')
+
+APP_DIR = str(Path(__file__).resolve().parent)
+
+QUERY_BUDGET_DEFAULTS = {
+	'ENABLED': False,
+	'SAMPLE_RATE': 1.0,
+	'MAX_QUERIES': 50,
+	'MAX_SQL_TIME': 0.5,
+	'MAX_REPEATS': 5,
+	'RAISE': False,
+}
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+# The recorder of the request being measured. Context variables follow the
+# request into sync_to_async threads, where async views run their queries.
+recording = ContextVar('productinfo_query_recorder', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+	pass
+
+
+def query_budget_settings():
+	return {**QUERY_BUDGET_DEFAULTS, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+def fingerprint(sql):
+	# Queries reach the wrapper with %s placeholders, so only IN lists of
+	# varying length need folding to make repeats compare equal.
+	return IN_LIST.sub('IN (...)', sql)
+
+
+def query_origin():
+	"""Return the innermost template line and productinfo code line on the stack."""
+	template = code = None
+	frame = sys._getframe(2)
+	while frame is not None and (template is None or code is None):
+		if template is None and frame.f_code.co_name == 'render_annotated':
+			node = frame.f_locals.get('self')
+			origin = getattr(node, 'origin', None)
+			token = getattr(node, 'token', None)
+			if origin is not None and token is not None:
+				template = f'{origin.template_name}:{token.lineno}'
+		filename = frame.f_code.co_filename
+		if code is None and filename.startswith(APP_DIR) and filename != __file__:
+			code = f'{Path(filename).relative_to(APP_DIR)}:{frame.f_lineno}'
+		frame = frame.f_back
+	return template, code
+
+
+class QueryRecorder:
+	def __init__(self):
+		self.queries = []
+
+	def __call__(self, execute, sql, params, many, context):
+		start = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			template, code = query_origin()
+			self.queries.append({
+				'fingerprint': fingerprint(sql),
+				'time': time.perf_counter() - start,
+				'template': template,
+				'code': code,
+			})
+
+	@property
+	def total_time(self):
+		return sum(query['time'] for query in self.queries)
+
+	def repeats(self):
+		return Counter(query['fingerprint'] for query in self.queries)
+
+
+def record_query(execute, sql, params, many, context):
+	# Installed on every connection by productinfo.signals.connection_opened.
+	recorder = recording.get()
+	if recorder is None:
+		return execute(sql, params, many, context)
+	return recorder(execute, sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+	"""
+	Records the queries each request issues and reports views that go over
+	the QUERY_BUDGET setting: too many queries, too much SQL time, or the
+	same statement repeated (the usual shape of an N+1). Set SAMPLE_RATE
+	below 1.0 to instrument only a fraction of production requests.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if asyncio.iscoroutinefunction(get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if asyncio.iscoroutinefunction(self.get_response):
+			return self.__acall__(request)
+		budget = query_budget_settings()
+		if not budget['ENABLED'] or random.random() >= budget['SAMPLE_RATE']:
+			return self.get_response(request)
+
+		recorder = QueryRecorder()
+		token = recording.set(recorder)
+		try:
+			response = self.get_response(request)
+		finally:
+			recording.reset(token)
+		self.check_budget(request, recorder, budget)
+		return response
+
+	async def __acall__(self, request):
+		budget = query_budget_settings()
+		if not budget['ENABLED'] or random.random() >= budget['SAMPLE_RATE']:
+			return await self.get_response(request)
+
+		recorder = QueryRecorder()
+		token = recording.set(recorder)
+		try:
+			response = await self.get_response(request)
+		finally:
+			recording.reset(token)
+		self.check_budget(request, recorder, budget)
+		return response
+
+	def check_budget(self, request, recorder, budget):
+		match = getattr(request, 'resolver_match', None)
+		view_name = match.view_name if match else request.path
+		count = len(recorder.queries)
+		total_time = recorder.total_time
+		repeated = {sql: times for sql, times in recorder.repeats().items() if times > budget['MAX_REPEATS']}
+
+		problems = []
+		if count > budget['MAX_QUERIES']:
+			problems.append(f'{count} queries (budget {budget["MAX_QUERIES"]})')
+		if total_time > budget['MAX_SQL_TIME']:
+			problems.append(f'{total_time:.3f}s of SQL (budget {budget["MAX_SQL_TIME"]}s)')
+		for sql, times in repeated.items():
+			origins = Counter(
+				f'{query["template"] or "-"} / {query["code"] or "-"}'
+				for query in recorder.queries if query['fingerprint'] == sql
+			)
+			where = ', '.join(f'{origin} x{n}' for origin, n in origins.most_common(3))
+			problems.append(f'repeated {times}x from {where}: {sql}')
+
+		logger.debug('%s: %d queries, %.3fs SQL', view_name, count, total_time)
+		if problems:
+			message = f'Query budget exceeded for {view_name}: ' + '; '.join(problems)
+			if budget['RAISE']:
+				raise QueryBudgetExceeded(message)
+			logger.warning(message)
+
+
+class ReplicaRoutingMiddleware:
+	"""
+	Lets GET and HEAD requests to list and detail views read from a replica
+	in READ_REPLICAS, as long as the replica was copied after the last write
+	to every model the view shows. A request that writes pins its session
+	to the primary for PIN_SECONDS so the user reads their own writes.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if asyncio.iscoroutinefunction(get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if asyncio.iscoroutinefunction(self.get_response):
+			return self.__acall__(request)
+		state = RequestRouting()
+		token = routing.set(state)
+		try:
+			response = self.get_response(request)
+		finally:
+			routing.reset(token)
+		if state.wrote:
+			self.pin(request)
+		return response
+
+	async def __acall__(self, request):
+		state = RequestRouting()
+		token = routing.set(state)
+		try:
+			response = await self.get_response(request)
+		finally:
+			routing.reset(token)
+		if state.wrote:
+			# Loading the session may query the database.
+			await sync_to_async(self.pin)(request)
+		return response
+
+	@staticmethod
+	def pin(request):
+		if hasattr(request, 'session'):
+			request.session[PIN_SESSION_KEY] = time.time() + read_replica_settings()['PIN_SECONDS']
+
+	def process_view(self, request, view_func, view_args, view_kwargs):
+		view_class = getattr(view_func, 'view_class', None)
+		if (
+			view_class is None
+			or request.method not in ('GET', 'HEAD')
+			or not serves_from_replica(view_class)
+			or not read_replica_settings()['ALIASES']
+		):
+			return None
+		if hasattr(request, 'session') and request.session.get(PIN_SESSION_KEY, 0) > time.time():
+			return None
+		routing.get().replica = choose_replica(replica_versions(view_class))
+		return None
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:38
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+
+
+def populate_order_totals(apps, schema_editor):
+    order_model_class = apps.get_model('productinfo', 'Order')
+    order_product_model_class = apps.get_model('productinfo', 'Order_Product')
+    totals = (
+        order_product_model_class.objects
+        .order_by()
+        .values('order_id')
+        .annotate(total=Sum(F('quantity') * F('price'), output_field=FloatField()), count=Count('pk'))
+    )
+    for row in totals.iterator():
+        order_model_class.objects.filter(pk=row['order_id']).update(
+            total_price=row['total'],
+            line_count=row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0008_create_group_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_order_totals,
+            migrations.RunPython.noop
+        ),
+    ]
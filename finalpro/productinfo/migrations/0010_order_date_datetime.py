@@ -0,0 +1,127 @@
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+BATCH_SIZE = 2000
+
+EXTRA_FORMATS = [
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d %H:%M',
+    '%Y/%m/%d',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y',
+]
+
+# Unreadable dates listed when the migration stops, at most.
+MAX_LISTED = 50
+
+
+def parse_order_date(value):
+    value = (value or '').strip()
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime(day.year, day.month, day.day) if day else None
+    except ValueError:
+        parsed = None
+    for date_format in EXTRA_FORMATS:
+        if parsed is not None:
+            break
+        try:
+            parsed = datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def convert_order_dates(apps, schema_editor):
+    order_model_class = apps.get_model('productinfo', 'Order')
+    unparsed = []
+    last_pk = 0
+    while True:
+        batch = list(
+            order_model_class.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'order_date')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for order in batch:
+            order.order_datetime = parse_order_date(order.order_date)
+            if order.order_datetime is None:
+                unparsed.append(order)
+        if not unparsed:
+            order_model_class.objects.bulk_update(batch, ['order_datetime'])
+    if unparsed:
+        # Stop rather than guess: the migration is rolled back, so the dates
+        # can be corrected and the migration run again.
+        listed = ', '.join(f'{order.pk}: {order.order_date!r}' for order in unparsed[:MAX_LISTED])
+        more = f' and {len(unparsed) - MAX_LISTED} more' if len(unparsed) > MAX_LISTED else ''
+        raise ValueError(
+            f'{len(unparsed)} orders have an order_date that could not be read '
+            f'(order_id: order_date): {listed}{more}. Correct them and migrate again.'
+        )
+
+
+def restore_order_dates(apps, schema_editor):
+    order_model_class = apps.get_model('productinfo', 'Order')
+    last_pk = 0
+    while True:
+        batch = list(
+            order_model_class.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'order_datetime')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for order in batch:
+            order.order_date = timezone.localtime(order.order_datetime).strftime('%Y-%m-%d %H:%M:%S')
+        order_model_class.objects.bulk_update(batch, ['order_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0009_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_datetime',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_date',
+            field=models.CharField(max_length=225, blank=True, default=''),
+        ),
+        migrations.RunPython(
+            convert_order_dates,
+            restore_order_dates
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='order_date',
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='order_datetime',
+            new_name='order_date',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0010_order_date_datetime'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cart_item',
+            options={'ordering': ['cart_id_id', 'product_id_id']},
+        ),
+        migrations.AlterModelOptions(
+            name='order_product',
+            options={'ordering': ['order_id_id']},
+        ),
+        migrations.AddIndex(
+            model_name='cart_item',
+            index=models.Index(fields=['product_id', 'cart_id'], name='cartitem_product_cart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_id', 'order_date'], name='order_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order_product',
+            index=models.Index(fields=['product_id', 'order_id'], name='orderproduct_product_order_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Stock_Reservation',
+            fields=[
+                ('reservation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('ci_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='productinfo.cart_item')),
+                ('product_id', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservations', to='productinfo.product')),
+            ],
+            options={
+                'ordering': ['expires_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_TABLE = 'productinfo_product_search'
+
+# Written by the triggers below and by the rebuild_product_search command.
+INDEX_PRODUCTS = '''
+    SELECT p.product_id, p.product_name, c.category_name, c.category_description
+    FROM productinfo_product p
+    INNER JOIN productinfo_category c ON c.category_id = p.category_id_id
+'''
+
+CREATE_SEARCH = [
+    f'''CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        product_name, category_name, category_description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )''',
+    # Name matches count most, then the category name, then its description.
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')",
+    f'''CREATE TRIGGER {SEARCH_TABLE}_product_insert AFTER INSERT ON productinfo_product BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, product_name, category_name, category_description)
+        {INDEX_PRODUCTS} WHERE p.product_id = new.product_id;
+    END''',
+    # Model.save() writes every column; the WHEN clauses skip saves that
+    # leave the indexed text alone, such as stock changes.
+    f'''CREATE TRIGGER {SEARCH_TABLE}_product_update
+    AFTER UPDATE OF product_id, product_name, category_id_id ON productinfo_product
+    WHEN old.product_id IS NOT new.product_id OR old.product_name IS NOT new.product_name
+        OR old.category_id_id IS NOT new.category_id_id
+    BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.product_id;
+        INSERT INTO {SEARCH_TABLE} (rowid, product_name, category_name, category_description)
+        {INDEX_PRODUCTS} WHERE p.product_id = new.product_id;
+    END''',
+    f'''CREATE TRIGGER {SEARCH_TABLE}_product_delete AFTER DELETE ON productinfo_product BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.product_id;
+    END''',
+    f'''CREATE TRIGGER {SEARCH_TABLE}_category_update
+    AFTER UPDATE OF category_name, category_description ON productinfo_category
+    WHEN old.category_name IS NOT new.category_name
+        OR old.category_description IS NOT new.category_description
+    BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid IN (
+            SELECT product_id FROM productinfo_product WHERE category_id_id = old.category_id
+        );
+        INSERT INTO {SEARCH_TABLE} (rowid, product_name, category_name, category_description)
+        {INDEX_PRODUCTS} WHERE c.category_id = new.category_id;
+    END''',
+    f'INSERT INTO {SEARCH_TABLE} (rowid, product_name, category_name, category_description) {INDEX_PRODUCTS}',
+]
+
+DROP_SEARCH = [
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_product_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_product_update',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_product_delete',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_category_update',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; search_products() falls back to icontains elsewhere.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SEARCH:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SEARCH:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0012_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product_Search',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='productinfo.product')),
+                ('product_name', models.TextField()),
+                ('category_name', models.TextField()),
+                ('category_description', models.TextField()),
+                ('query', models.TextField(db_column='productinfo_product_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'productinfo_product_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            create_search_index,
+            drop_search_index
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:53
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def populate_sales_rollups(apps, schema_editor):
+    order_model_class = apps.get_model('productinfo', 'Order')
+    order_product_model_class = apps.get_model('productinfo', 'Order_Product')
+    daily_sales_model_class = apps.get_model('productinfo', 'Daily_Sales')
+    lines = order_product_model_class.objects.order_by().annotate(day=TruncDate('order_id__order_date'))
+    sums = {
+        'lines': Count('pk'),
+        'units': Sum('quantity'),
+        'revenue': Sum(F('quantity') * F('price'), output_field=FloatField()),
+    }
+
+    daily = {
+        row['day']: row
+        for row in order_model_class.objects.order_by()
+        .annotate(day=TruncDate('order_date')).values('day').annotate(orders=Count('pk'))
+    }
+    for row in lines.values('day').annotate(**sums):
+        daily.setdefault(row['day'], {'orders': 0}).update(row)
+    daily_sales_model_class.objects.bulk_create(
+        [daily_sales_model_class(**row) for row in daily.values()], batch_size=1000)
+
+    for model_name, column, lookup in (
+            ('Daily_Product_Sales', 'product_id_id', 'product_id'),
+            ('Daily_Category_Sales', 'category_id_id', 'product_id__category_id'),
+            ('Daily_Shipping_Sales', 'sm_id_id', 'order_id__sm_id'),
+            ('Daily_Payment_Sales', 'pm_id_id', 'order_id__pm_id')):
+        model_class = apps.get_model('productinfo', model_name)
+        model_class.objects.bulk_create(
+            [
+                model_class(day=row['day'], lines=row['lines'], units=row['units'], revenue=row['revenue'],
+                            **{column: row[lookup]})
+                for row in lines.values('day', lookup).annotate(**sums).iterator()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0014_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Daily_Sales',
+            fields=[
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('orders', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Daily_Shipping_Sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('sm_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='productinfo.shipping_method')),
+            ],
+            options={
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Daily_Product_Sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('product_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='productinfo.product')),
+            ],
+            options={
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Daily_Payment_Sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('pm_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='productinfo.payment_method')),
+            ],
+            options={
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Daily_Category_Sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('category_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='productinfo.category')),
+            ],
+            options={
+                'ordering': ['day'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='daily_shipping_sales',
+            constraint=models.UniqueConstraint(fields=('day', 'sm_id'), name='unique_daily_shipping_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='daily_product_sales',
+            constraint=models.UniqueConstraint(fields=('day', 'product_id'), name='unique_daily_product_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='daily_payment_sales',
+            constraint=models.UniqueConstraint(fields=('day', 'pm_id'), name='unique_daily_payment_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='daily_category_sales',
+            constraint=models.UniqueConstraint(fields=('day', 'category_id'), name='unique_daily_category_sales'),
+        ),
+        migrations.RunPython(
+            populate_sales_rollups,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def populate_product_sales(apps, schema_editor):
+    daily_product_sales_model_class = apps.get_model('productinfo', 'Daily_Product_Sales')
+    product_sales_model_class = apps.get_model('productinfo', 'Product_Sales')
+    totals = (
+        daily_product_sales_model_class.objects
+        .order_by()
+        .values('product_id')
+        .annotate(total_lines=Sum('lines'), total_units=Sum('units'), total_revenue=Sum('revenue'))
+    )
+    product_sales_model_class.objects.bulk_create(
+        [
+            product_sales_model_class(product_id_id=row['product_id'], lines=row['total_lines'],
+                                      units=row['total_units'], revenue=row['total_revenue'])
+            for row in totals.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0015_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product_Sales',
+            fields=[
+                ('product_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='productinfo.product')),
+                ('lines', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            populate_product_sales,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productinfo', '0016_product_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='claim_token',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
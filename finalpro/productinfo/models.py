@@ -1,6 +1,24 @@
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.conf import settings
+from django.db import models, router
+from django.db.models import Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, UniqueConstraint, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
+from django.utils import timezone
+
+from productinfo.fields import LookupForeignKey
+from productinfo.sqlite import write_atomic
+from productinfo.utils import date_range
+
+
+def stored_values(instance, fields, using=None):
+	"""
+	The stored values of fields for instance, as a dict keyed by attname (empty
+	if there is no row), read and where possible locked inside the current
+	transaction: the row may have changed since the instance was loaded.
+	"""
+	model = type(instance)
+	using = using or router.db_for_write(model, instance=instance)
+	return model._default_manager.using(using).select_for_update().filter(pk=instance.pk).values(*fields).first() or {}
 
 
 class Category(models.Model):
@@ -56,8 +74,8 @@ class Customer(models.Model):
 	username = models.CharField(max_length=45)
 	password = models.CharField(max_length=45)
 	email = models.CharField(max_length=225)
-	sm_id = models.ForeignKey(Shipping_Method, related_name='customers', on_delete=models.PROTECT)
-	pm_id = models.ForeignKey(Payment_Method, related_name='customers', on_delete=models.PROTECT)
+	sm_id = LookupForeignKey(Shipping_Method, related_name='customers', on_delete=models.PROTECT)
+	pm_id = LookupForeignKey(Payment_Method, related_name='customers', on_delete=models.PROTECT)
 
 	def __str__(self):
 		return f'{self.username} - {self.email}'
@@ -89,7 +107,22 @@ class Product(models.Model):
 	product_name = models.CharField(max_length=225, unique=True)
 	product_price = models.FloatField()
 	stock_num = models.IntegerField()
-	category_id = models.ForeignKey(Category, related_name='products', on_delete=models.PROTECT)
+	# Compare-and-swap token for stock_num, see productinfo.reservations.
+	stock_version = models.IntegerField(default=0, editable=False)
+	category_id = LookupForeignKey(Category, related_name='products', on_delete=models.PROTECT)
+
+	def save(self, *args, **kwargs):
+		editing = not self._state.adding
+		with write_atomic(kwargs.get('using')):
+			if self.pk is not None:
+				# The stored category, so a change can move the sales rollups.
+				self._loaded_values = stored_values(self, ['category_id_id'], kwargs.get('using'))
+			if editing:
+				# An edit may set stock_num, so move the token on in the same UPDATE.
+				self.stock_version = F('stock_version') + 1
+			super().save(*args, **kwargs)
+		if editing:
+			self.refresh_from_db(fields=['stock_version'])
 
 	def __str__(self):
 		return f'{self.product_id} - {self.product_name}'
@@ -116,12 +149,32 @@ class Product(models.Model):
 		]
 
 
+class Product_Search(models.Model):
+	"""
+	The SQLite FTS5 table productinfo_product_search, kept in step with
+	Product and Category by triggers (see migration 0013). rowid is the
+	product_id; `query` is FTS5's hidden table-named column, so
+	filter(search__query=...) is a MATCH, and `rank` is its bm25 score.
+	"""
+	product = models.OneToOneField(Product, primary_key=True, db_column='rowid',
+								   related_name='search', on_delete=models.DO_NOTHING)
+	product_name = models.TextField()
+	category_name = models.TextField()
+	category_description = models.TextField()
+	query = models.TextField(db_column='productinfo_product_search')
+	rank = models.FloatField()
+
+	class Meta:
+		managed = False
+		db_table = 'productinfo_product_search'
+
+
 class Shopping_Cart(models.Model):
 	cart_id = models.AutoField(primary_key=True)
 	# total_price = models.FloatField()
 	customer_id = models.ForeignKey(Customer, related_name='shopping_carts', on_delete=models.PROTECT)
-	sm_id = models.ForeignKey(Shipping_Method, related_name='shopping_carts', on_delete=models.PROTECT)
-	pm_id = models.ForeignKey(Payment_Method, related_name='shopping_carts', on_delete=models.PROTECT)
+	sm_id = LookupForeignKey(Shipping_Method, related_name='shopping_carts', on_delete=models.PROTECT)
+	pm_id = LookupForeignKey(Payment_Method, related_name='shopping_carts', on_delete=models.PROTECT)
 
 	def __str__(self):
 		return f'{self.cart_id} - {self.customer_id}'
@@ -141,6 +194,11 @@ class Shopping_Cart(models.Model):
 					   kwargs={'pk':self.pk}
 					   )
 
+	def get_checkout_url(self):
+		return reverse('productinfo_shoppingcart_checkout_urlpattern',
+					   kwargs={'pk':self.pk}
+					   )
+
 	class Meta:
 		ordering = ['cart_id']
 		constraints = [
@@ -148,12 +206,38 @@ class Shopping_Cart(models.Model):
 		]
 
 
+class LineItemQuerySet(models.QuerySet):
+	price_expression = None
+
+	def subtotal_expression(self):
+		return ExpressionWrapper(F('quantity') * self.price_expression, output_field=FloatField())
+
+	def with_subtotal(self):
+		return self.annotate(sub_total=self.subtotal_expression())
+
+	def total(self):
+		return self.aggregate(
+			total=Coalesce(Sum(self.subtotal_expression()), Value(0.0), output_field=FloatField())
+		)['total']
+
+
+class CartItemQuerySet(LineItemQuerySet):
+	# Cart lines have no stored price; they are valued at the current product price.
+	price_expression = F('product_id__product_price')
+
+
+class OrderProductQuerySet(LineItemQuerySet):
+	price_expression = F('price')
+
+
 class Cart_Item(models.Model):
 	ci_id = models.AutoField(primary_key=True)
 	quantity = models.IntegerField()
 	cart_id = models.ForeignKey(Shopping_Cart, related_name='cart_items', on_delete=models.PROTECT)
 	product_id = models.ForeignKey(Product, related_name='cart_items', on_delete=models.PROTECT)
 
+	objects = CartItemQuerySet.as_manager()
+
 	def __str__(self):
 		return f'{self.cart_id} - {self.product_id}'
 
@@ -173,25 +257,81 @@ class Cart_Item(models.Model):
 					   )
 
 	class Meta:
-		ordering = ['cart_id', 'product_id']
+		ordering = ['cart_id_id', 'product_id_id']
 		constraints = [
 			UniqueConstraint(fields=['cart_id', 'product_id'], name='unique_cartitem')
 		]
+		indexes = [
+			models.Index(fields=['product_id', 'cart_id'], name='cartitem_product_cart_idx')
+		]
+
+
+# What the sales rollups and order totals are moved away from on a write.
+ORDER_STORED_FIELDS = ['order_date', 'sm_id_id', 'pm_id_id']
+ORDER_PRODUCT_STORED_FIELDS = ['order_id_id', 'product_id_id', 'quantity', 'price']
+
+
+class OrderQuerySet(models.QuerySet):
+	def placed_between(self, start=None, end=None):
+		lower, upper = date_range(start, end)
+		orders = self
+		if lower is not None:
+			orders = orders.filter(order_date__gte=lower)
+		if upper is not None:
+			orders = orders.filter(order_date__lt=upper)
+		return orders
+
+	def refresh_totals(self):
+		# Recompute the materialized totals from the order lines, on every line
+		# write and after bulk writes that bypass the Order_Product signals.
+		lines = Order_Product.objects.filter(order_id=OuterRef('pk')).order_by().values('order_id')
+		return self.update(
+			total_price=Coalesce(
+				Subquery(lines.annotate(total=Sum(F('quantity') * F('price'), output_field=FloatField()))
+						 .values('total')),
+				Value(0.0), output_field=FloatField()),
+			line_count=Coalesce(
+				Subquery(lines.annotate(count=Count('pk')).values('count')),
+				Value(0)),
+		)
 
 
 class Order(models.Model):
 	order_id = models.AutoField(primary_key=True)
-	# total_price = models.FloatField()
-	order_date = models.CharField(max_length=225)
+	total_price = models.FloatField(default=0, editable=False)
+	line_count = models.IntegerField(default=0, editable=False)
+	order_date = models.DateTimeField(db_index=True)
 	receiver = models.CharField(max_length=45)
 	address = models.CharField(max_length=225)
-	sm_id = models.ForeignKey(Shipping_Method, related_name='orders', on_delete=models.PROTECT)
-	pm_id = models.ForeignKey(Payment_Method, related_name='orders', on_delete=models.PROTECT)
+	sm_id = LookupForeignKey(Shipping_Method, related_name='orders', on_delete=models.PROTECT)
+	pm_id = LookupForeignKey(Payment_Method, related_name='orders', on_delete=models.PROTECT)
 	customer_id = models.ForeignKey(Customer, related_name='orders', on_delete=models.PROTECT)
 
+	objects = OrderQuerySet.as_manager()
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Remember the stored date and methods so the sales rollups can move
+		# this order's lines when they are changed.
+		instance._loaded_values = dict(zip(field_names, values))
+		return instance
+
+	def save(self, *args, **kwargs):
+		with write_atomic(kwargs.get('using')):
+			if self.pk is not None:
+				self._loaded_values = stored_values(self, ORDER_STORED_FIELDS, kwargs.get('using'))
+			super().save(*args, **kwargs)
+
+	def delete(self, *args, **kwargs):
+		with write_atomic(kwargs.get('using')):
+			self._loaded_values = stored_values(self, ORDER_STORED_FIELDS, kwargs.get('using'))
+			return super().delete(*args, **kwargs)
+
 	def __str__(self):
-		return f'{self.order_id} - {self.order_date}'
-		# return f'{self.order_id} - {self.order_date} - {self.total_price}'
+		if self.order_date is None:
+			return f'{self.order_id}'
+		return f'{self.order_id} - {timezone.localtime(self.order_date):%Y-%m-%d %H:%M:%S}'
 
 	def get_absolute_url(self):
 		return reverse('productinfo_order_detail_urlpattern',
@@ -213,6 +353,9 @@ class Order(models.Model):
 		constraints = [
 			UniqueConstraint(fields=['order_id'], name='unique_order')
 		]
+		indexes = [
+			models.Index(fields=['customer_id', 'order_date'], name='order_customer_date_idx')
+		]
 
 
 class Order_Product(models.Model):
@@ -222,6 +365,29 @@ class Order_Product(models.Model):
 	order_id = models.ForeignKey(Order, related_name='order_products', on_delete=models.PROTECT)
 	product_id = models.ForeignKey(Product, related_name='order_products', on_delete=models.PROTECT)
 
+	objects = OrderProductQuerySet.as_manager()
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Remember what is stored so the sales rollups can be adjusted by the
+		# difference when this line is changed or deleted.
+		instance._loaded_values = dict(zip(field_names, values))
+		return instance
+
+	def save(self, *args, **kwargs):
+		with write_atomic(kwargs.get('using')):
+			if self.pk is not None:
+				# Read again inside the transaction: the line may have changed
+				# since this instance was loaded, e.g. from a stale form.
+				self._loaded_values = stored_values(self, ORDER_PRODUCT_STORED_FIELDS, kwargs.get('using'))
+			super().save(*args, **kwargs)
+
+	def delete(self, *args, **kwargs):
+		with write_atomic(kwargs.get('using')):
+			self._loaded_values = stored_values(self, ORDER_PRODUCT_STORED_FIELDS, kwargs.get('using'))
+			return super().delete(*args, **kwargs)
+
 	def __str__(self):
 		return f'{self.order_id} - {self.product_id}'
 
@@ -241,7 +407,172 @@ class Order_Product(models.Model):
 					   )
 
 	class Meta:
-		ordering = ['order_id']
+		ordering = ['order_id_id']
 		constraints = [
 			UniqueConstraint(fields=['oitem_id', 'order_id', 'product_id'], name='unique_orderproduct')
 		]
+		indexes = [
+			models.Index(fields=['product_id', 'order_id'], name='orderproduct_product_order_idx')
+		]
+
+
+class Stock_Reservation(models.Model):
+	reservation_id = models.AutoField(primary_key=True)
+	quantity = models.IntegerField()
+	expires_at = models.DateTimeField(db_index=True)
+	ci_id = models.OneToOneField(Cart_Item, related_name='reservation', on_delete=models.CASCADE)
+	product_id = models.ForeignKey(Product, related_name='reservations', on_delete=models.PROTECT)
+
+	def __str__(self):
+		return f'{self.product_id} x {self.quantity} until {timezone.localtime(self.expires_at):%Y-%m-%d %H:%M:%S}'
+
+	class Meta:
+		ordering = ['expires_at']
+
+
+class Sales_Rollup(models.Model):
+	"""Sales on one day, kept current by productinfo.rollups."""
+	day = models.DateField()
+	lines = models.IntegerField(default=0)
+	units = models.IntegerField(default=0)
+	revenue = models.FloatField(default=0)
+
+	class Meta:
+		abstract = True
+		ordering = ['day']
+
+
+class Daily_Sales(Sales_Rollup):
+	day = models.DateField(primary_key=True)
+	orders = models.IntegerField(default=0)
+
+	def __str__(self):
+		return f'{self.day} - {self.orders} orders, {self.revenue}'
+
+
+class Daily_Product_Sales(Sales_Rollup):
+	product_id = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+
+	def __str__(self):
+		return f'{self.day} - {self.product_id_id}'
+
+	class Meta(Sales_Rollup.Meta):
+		constraints = [
+			UniqueConstraint(fields=['day', 'product_id'], name='unique_daily_product_sales')
+		]
+
+
+class Product_Sales(models.Model):
+	"""All-time sales of one product, kept equal to the sum of its Daily_Product_Sales rows."""
+	product_id = models.OneToOneField(Product, primary_key=True, related_name='sales', on_delete=models.CASCADE)
+	lines = models.IntegerField(default=0)
+	units = models.IntegerField(default=0)
+	revenue = models.FloatField(default=0)
+
+	def __str__(self):
+		return f'{self.product_id_id} - {self.units} units, {self.revenue}'
+
+
+class Daily_Category_Sales(Sales_Rollup):
+	category_id = models.ForeignKey(Category, related_name='daily_sales', on_delete=models.CASCADE)
+
+	def __str__(self):
+		return f'{self.day} - {self.category_id_id}'
+
+	class Meta(Sales_Rollup.Meta):
+		constraints = [
+			UniqueConstraint(fields=['day', 'category_id'], name='unique_daily_category_sales')
+		]
+
+
+class Daily_Shipping_Sales(Sales_Rollup):
+	sm_id = models.ForeignKey(Shipping_Method, related_name='daily_sales', on_delete=models.CASCADE)
+
+	def __str__(self):
+		return f'{self.day} - {self.sm_id_id}'
+
+	class Meta(Sales_Rollup.Meta):
+		constraints = [
+			UniqueConstraint(fields=['day', 'sm_id'], name='unique_daily_shipping_sales')
+		]
+
+
+class Daily_Payment_Sales(Sales_Rollup):
+	pm_id = models.ForeignKey(Payment_Method, related_name='daily_sales', on_delete=models.CASCADE)
+
+	def __str__(self):
+		return f'{self.day} - {self.pm_id_id}'
+
+	class Meta(Sales_Rollup.Meta):
+		constraints = [
+			UniqueConstraint(fields=['day', 'pm_id'], name='unique_daily_payment_sales')
+		]
+
+
+class Job(models.Model):
+	"""A unit of background work run by `manage.py run_jobs`, see productinfo.jobs."""
+	QUEUED = 'queued'
+	RUNNING = 'running'
+	DONE = 'done'
+	FAILED = 'failed'
+	STATUS_CHOICES = [
+		(QUEUED, 'Queued'),
+		(RUNNING, 'Running'),
+		(DONE, 'Done'),
+		(FAILED, 'Failed'),
+	]
+
+	job_id = models.AutoField(primary_key=True)
+	kind = models.CharField(max_length=45)
+	params = models.JSONField(default=dict, blank=True)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+	progress = models.IntegerField(default=0)
+	total = models.IntegerField(null=True, blank=True)
+	message = models.TextField(blank=True, default='')
+	input_path = models.CharField(max_length=255, blank=True, default='')
+	output_path = models.CharField(max_length=255, blank=True, default='')
+	worker = models.CharField(max_length=100, blank=True, default='')
+	# New for every claim, so a worker can tell whether the job is still its own.
+	claim_token = models.CharField(max_length=32, blank=True, default='', editable=False)
+	created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='jobs', null=True, blank=True,
+								   on_delete=models.SET_NULL)
+	created_at = models.DateTimeField(default=timezone.now)
+	started_at = models.DateTimeField(null=True, blank=True)
+	heartbeat_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	def __str__(self):
+		return f'{self.job_id} - {self.kind} ({self.status})'
+
+	def get_absolute_url(self):
+		return reverse('productinfo_job_detail_urlpattern',
+					   kwargs={'pk':self.pk}
+					   )
+
+	def get_download_url(self):
+		return reverse('productinfo_job_download_urlpattern',
+					   kwargs={'pk':self.pk}
+					   )
+
+	@property
+	def title(self):
+		from productinfo.jobs import HANDLERS
+		handler = HANDLERS.get(self.kind)
+		return handler.title if handler else self.kind
+
+	@property
+	def finished(self):
+		return self.status in (self.DONE, self.FAILED)
+
+	@property
+	def percent(self):
+		if not self.total:
+			return None
+		return min(100, round(100 * self.progress / self.total))
+
+	class Meta:
+		ordering = ['-job_id']
+		indexes = [
+			models.Index(fields=['status', 'job_id'], name='job_status_idx'),
+			models.Index(fields=['created_by', 'job_id'], name='job_creator_idx'),
+		]
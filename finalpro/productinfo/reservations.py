@@ -0,0 +1,223 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from productinfo.caches import product_cache
+from productinfo.models import Product, Stock_Reservation
+from productinfo.sqlite import write_atomic
+from productinfo.versions import bump_version
+
+RESERVATIONS_DEFAULTS = {
+	'HOLD_SECONDS': 15 * 60,
+	'CAS_ATTEMPTS': 5,
+	'SWEEP_BATCH_SIZE': 500,
+}
+
+# Products per conditional UPDATE; each one adds three parameters.
+STOCK_BATCH_SIZE = 200
+
+
+def reservation_settings():
+	return {**RESERVATIONS_DEFAULTS, **getattr(settings, 'RESERVATIONS', {})}
+
+
+class StockError(Exception):
+	pass
+
+
+class OutOfStock(StockError):
+	def __init__(self, shortages):
+		self.shortages = shortages
+		if shortages:
+			detail = ', '.join(f'{name} (wanted {wanted}, {left} left)' for name, wanted, left in shortages)
+		else:
+			detail = 'stock changed meanwhile, please try again'
+		super().__init__(f'Not enough stock: {detail}.')
+
+
+class StockConflict(StockError):
+	def __init__(self, product_pk):
+		super().__init__(f'Product {product_pk} kept changing; please try again.')
+
+
+class StaleStock(StockError):
+	def __init__(self, product):
+		super().__init__(
+			f'The stock of {product.product_name} changed while it was being edited; '
+			f'check the current stock and save again.'
+		)
+
+
+def stock_changed(pks):
+	# Stock is written with update(), which skips the model signals.
+	def invalidate():
+		bump_version('catalog', 'product')
+		product_cache.invalidate(*pks)
+	transaction.on_commit(invalidate)
+
+
+def adjust_stock(product_pk, delta):
+	"""
+	Add delta (negative to take) to one product's stock_num by compare-and-swap
+	on stock_version, so no row lock is held between the read and the write.
+	"""
+	for attempt in range(reservation_settings()['CAS_ATTEMPTS']):
+		name, stock, version = (
+			Product.objects.filter(pk=product_pk)
+			.values_list('product_name', 'stock_num', 'stock_version').get()
+		)
+		if stock + delta < 0:
+			raise OutOfStock([(name, -delta, stock)])
+		swapped = (
+			Product.objects.filter(pk=product_pk, stock_version=version)
+			.update(stock_num=stock + delta, stock_version=version + 1)
+		)
+		if swapped:
+			stock_changed([product_pk])
+			return stock + delta
+	raise StockConflict(product_pk)
+
+
+def save_product(product, loaded_version):
+	"""
+	Save an edited product, whose stock_num is an absolute value, only if its
+	stock hasn't moved on (a hold, a checkout, an import or another edit)
+	since it was read at stock_version loaded_version. Raises StaleStock
+	otherwise, so a stale form never overwrites stock taken meanwhile.
+	"""
+	with write_atomic():
+		if claim_stock_versions({product.pk: loaded_version}):
+			raise StaleStock(product)
+		product.save()
+
+
+def claim_stock_versions(loaded):
+	"""
+	Move the stock_version of each {product pk: version read} on by one in
+	batched conditional updates, only where it is still the version read,
+	so the caller can then write stock_num absolutely. Returns the pks
+	whose stock moved on meanwhile (or that were deleted); those are left
+	alone.
+	"""
+	stale = []
+	pks = sorted(loaded)
+	for start in range(0, len(pks), STOCK_BATCH_SIZE):
+		batch = pks[start:start + STOCK_BATCH_SIZE]
+		for attempt in range(reservation_settings()['CAS_ATTEMPTS']):
+			version = Case(
+				*(When(pk=pk, then=Value(loaded[pk])) for pk in batch),
+				output_field=IntegerField(),
+			)
+			# A savepoint, so a partly claimed batch is undone before the
+			# stale products are picked out and the rest claimed again.
+			with transaction.atomic():
+				claimed = (
+					Product.objects.filter(pk__in=batch, stock_version=version)
+					.update(stock_version=F('stock_version') + 1)
+				)
+				if claimed == len(batch):
+					break
+				transaction.set_rollback(True)
+			current = set(Product.objects.filter(pk__in=batch, stock_version=version).values_list('pk', flat=True))
+			stale.extend(pk for pk in batch if pk not in current)
+			batch = [pk for pk in batch if pk in current]
+			if not batch:
+				break
+		else:
+			raise StockConflict(batch[0])
+	return stale
+
+
+def take_stock(wanted):
+	"""
+	Take {product pk: quantity} from stock_num in batched conditional updates,
+	only where enough is left; negative quantities are given back. Raises
+	OutOfStock if any product is short; earlier batches are left for the
+	caller's transaction to roll back.
+	"""
+	pks = sorted(pk for pk, quantity in wanted.items() if quantity)
+	for start in range(0, len(pks), STOCK_BATCH_SIZE):
+		batch = pks[start:start + STOCK_BATCH_SIZE]
+		quantity = Case(
+			*(When(pk=pk, then=Value(wanted[pk])) for pk in batch),
+			output_field=IntegerField(),
+		)
+		try:
+			# A savepoint, so a short batch is undone before the shortfall is read.
+			with transaction.atomic():
+				updated = (
+					Product.objects.filter(pk__in=batch, stock_num__gte=quantity)
+					.update(stock_num=F('stock_num') - quantity, stock_version=F('stock_version') + 1)
+				)
+				if updated != len(batch):
+					raise OutOfStock([])
+		except OutOfStock:
+			short = (
+				Product.objects.filter(pk__in=batch, stock_num__lt=quantity)
+				.values_list('pk', 'product_name', 'stock_num')
+			)
+			raise OutOfStock([(name, wanted[pk], left) for pk, name, left in short])
+	if pks:
+		stock_changed(pks)
+
+
+def hold_stock(cart_item):
+	"""
+	Reserve stock for a cart item's current product and quantity, adjusting
+	its existing hold by the difference and extending the expiry.
+	"""
+	hold = Stock_Reservation.objects.filter(ci_id=cart_item).first()
+	held = 0
+	if hold is not None:
+		if hold.product_id_id == cart_item.product_id_id:
+			held = hold.quantity
+		else:
+			adjust_stock(hold.product_id_id, hold.quantity)
+	if cart_item.quantity != held:
+		adjust_stock(cart_item.product_id_id, held - cart_item.quantity)
+
+	expires_at = timezone.now() + timedelta(seconds=reservation_settings()['HOLD_SECONDS'])
+	if hold is None:
+		hold = Stock_Reservation(ci_id=cart_item)
+	hold.product_id_id = cart_item.product_id_id
+	hold.quantity = cart_item.quantity
+	hold.expires_at = expires_at
+	hold.save()
+	return hold
+
+
+def release_holds(holds):
+	"""Give the stock of these holds back and delete them, in one transaction."""
+	holds = list(holds)
+	if not holds:
+		return 0
+	returned = {}
+	for hold in holds:
+		returned[hold.product_id_id] = returned.get(hold.product_id_id, 0) - hold.quantity
+	with write_atomic():
+		take_stock(returned)
+		pks = [hold.pk for hold in holds]
+		# Zeroed first so the post_delete receiver has nothing left to return.
+		Stock_Reservation.objects.filter(pk__in=pks).update(quantity=0)
+		Stock_Reservation.objects.filter(pk__in=pks).delete()
+	return len(holds)
+
+
+def sweep_expired(now=None, batch_size=None):
+	"""Release holds that expired before now, batch_size at a time. Returns the count."""
+	now = now or timezone.now()
+	batch_size = batch_size or reservation_settings()['SWEEP_BATCH_SIZE']
+	released = 0
+	while True:
+		with write_atomic():
+			batch = list(
+				Stock_Reservation.objects.filter(expires_at__lt=now)
+				.select_for_update(skip_locked=True)
+				.order_by('expires_at')[:batch_size]
+			)
+			released += release_holds(batch)
+		if len(batch) < batch_size:
+			return released
@@ -0,0 +1,325 @@
+from collections import defaultdict
+from datetime import timedelta
+from heapq import nlargest
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, FloatField, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from productinfo.models import (
+	Daily_Category_Sales,
+	Daily_Payment_Sales,
+	Daily_Product_Sales,
+	Daily_Sales,
+	Daily_Shipping_Sales,
+	Order,
+	Order_Product,
+	Product,
+	Product_Sales,
+)
+from productinfo.sqlite import write_atomic
+from productinfo.utils import date_range
+
+# Days covered by the windowed best-seller lists, besides all time.
+WINDOWS = (7, 30, 90)
+
+# Each rollup with the column it is broken down by and where an order line
+# gets that column from.
+ROLLUPS = [
+	(Daily_Sales, None, None),
+	(Daily_Product_Sales, 'product_id_id', 'product_id'),
+	(Daily_Category_Sales, 'category_id_id', 'product_id__category_id'),
+	(Daily_Shipping_Sales, 'sm_id_id', 'order_id__sm_id'),
+	(Daily_Payment_Sales, 'pm_id_id', 'order_id__pm_id'),
+]
+
+
+def sales_day(value):
+	return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def add_to_row(model, key, changes):
+	"""Add changes to the rollup row with this key, creating it if it isn't there yet."""
+	increments = {name: F(name) + value for name, value in changes.items()}
+	if model.objects.filter(**key).update(**increments):
+		return
+	try:
+		with transaction.atomic():
+			model.objects.create(**key, **changes)
+	except IntegrityError:
+		# Created by a concurrent write since the update above.
+		model.objects.filter(**key).update(**increments)
+
+
+class SalesChange:
+	"""
+	Changes to the rollups and the all-time Product_Sales counters, summed
+	per row first so a write that touches several lines of one day updates
+	each row once.
+	"""
+
+	def __init__(self):
+		# (model, day, column, value) -> [orders, lines, units, revenue]
+		self.rows = defaultdict(lambda: [0, 0, 0, 0.0])
+
+	def order(self, day, count=1):
+		self.rows[Daily_Sales, day, None, None][0] += count
+
+	def row(self, model, day, column, value, lines, units, revenue):
+		row = self.rows[model, day, column, value]
+		row[1] += lines
+		row[2] += units
+		row[3] += revenue
+
+	def add(self, day, sm_id, pm_id, product_id, category_id, lines, units, revenue):
+		values = {'product_id_id': product_id, 'category_id_id': category_id, 'sm_id_id': sm_id, 'pm_id_id': pm_id}
+		for model, column, lookup in ROLLUPS:
+			self.row(model, day, column, values.get(column), lines, units, revenue)
+		self.total(product_id, lines, units, revenue)
+
+	def total(self, product_id, lines, units, revenue):
+		self.row(Product_Sales, None, 'product_id_id', product_id, lines, units, revenue)
+
+	def line(self, day, sm_id, pm_id, product_id, category_id, quantity, price, sign=1):
+		self.add(day, sm_id, pm_id, product_id, category_id, sign, sign * quantity, sign * quantity * price)
+
+	def changes(self):
+		"""Yield (model, key, changes) for every row that changed."""
+		for (model, day, column, value), (orders, lines, units, revenue) in self.rows.items():
+			# Revenue summed in another order can be a rounding error off.
+			if not (orders or lines or units or abs(revenue) > 1e-6):
+				continue
+			key = {} if day is None else {'day': day}
+			if column is not None:
+				key[column] = value
+			changes = {'lines': lines, 'units': units, 'revenue': revenue}
+			if model is Daily_Sales:
+				changes['orders'] = orders
+			yield model, key, changes
+
+	def save(self):
+		for model, key, changes in self.changes():
+			add_to_row(model, key, changes)
+		self.rows.clear()
+
+	def create(self):
+		"""Insert the day rows as new ones, for days whose rollups were cleared."""
+		objects = defaultdict(list)
+		for model, key, changes in self.changes():
+			if model is Product_Sales:
+				add_to_row(model, key, changes)
+			else:
+				objects[model].append(model(**key, **changes))
+		for model, batch in objects.items():
+			model.objects.bulk_create(batch, batch_size=1000)
+		self.rows.clear()
+
+
+def product_categories(product_ids):
+	return dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id'))
+
+
+def lines_changed(removed=(), added=()):
+	"""
+	Take order lines out of the rollups and put others in. Each line is an
+	(order_id, product_id, quantity, price) tuple; removed lines are taken
+	out with the values they were added with.
+	"""
+	lines = [*removed, *added]
+	if not lines:
+		return
+	orders = {
+		pk: (sales_day(order_date), sm_id, pm_id)
+		for pk, order_date, sm_id, pm_id in Order.objects.filter(pk__in={line[0] for line in lines})
+		.values_list('pk', 'order_date', 'sm_id', 'pm_id')
+	}
+	categories = product_categories({line[1] for line in lines})
+	change = SalesChange()
+	for sign, group in ((-1, removed), (1, added)):
+		for order_id, product_id, quantity, price in group:
+			day, sm_id, pm_id = orders[order_id]
+			change.line(day, sm_id, pm_id, product_id, categories[product_id], quantity, price, sign)
+	change.save()
+
+
+def order_changed(order, previous=None):
+	"""
+	Count a new order, or move an order and its lines when its date or
+	methods change. previous is the stored (order_date, sm_id, pm_id), or
+	None for a new order.
+	"""
+	current = (sales_day(order.order_date), order.sm_id_id, order.pm_id_id)
+	change = SalesChange()
+	if previous is None:
+		change.order(current[0])
+		change.save()
+		return
+	previous = (sales_day(previous[0]), previous[1], previous[2])
+	if previous == current:
+		return
+	change.order(previous[0], -1)
+	change.order(current[0])
+	lines = list(order.order_products.values_list('product_id', 'quantity', 'price'))
+	categories = product_categories({line[0] for line in lines})
+	for product_id, quantity, price in lines:
+		change.line(*previous, product_id, categories[product_id], quantity, price, -1)
+		change.line(*current, product_id, categories[product_id], quantity, price)
+	change.save()
+
+
+def product_moved(product_id, old_category_id, new_category_id):
+	"""
+	Move a product's sales from its old category's rows to its new one's,
+	as order lines take their category from the product.
+	"""
+	if old_category_id == new_category_id:
+		return
+	change = SalesChange()
+	days = Daily_Product_Sales.objects.filter(product_id=product_id).values_list('day', 'lines', 'units', 'revenue')
+	for day, lines, units, revenue in days:
+		change.row(Daily_Category_Sales, day, 'category_id_id', old_category_id, -lines, -units, -revenue)
+		change.row(Daily_Category_Sales, day, 'category_id_id', new_category_id, lines, units, revenue)
+	change.save()
+
+
+def order_deleted(order_date):
+	# Orders with lines are protected, so there is nothing else to take out.
+	change = SalesChange()
+	change.order(sales_day(order_date), -1)
+	change.save()
+
+
+def rebuild_days(first, last):
+	"""
+	Recompute the rollups for the days first to last, inclusive, from the
+	orders, moving the all-time counters by what the days' products gain
+	or lose.
+	"""
+	change = SalesChange()
+	cleared = (
+		Daily_Product_Sales.objects.filter(day__range=(first, last))
+		.order_by()
+		.values_list('product_id')
+		.annotate(Sum('lines'), Sum('units'), Sum('revenue'))
+	)
+	for product_id, lines, units, revenue in cleared:
+		change.total(product_id, -lines, -units, -revenue)
+	with connection.cursor() as cursor:
+		# Plain DELETEs; the rollups have no dependents or delete signals worth sending.
+		for model, column, lookup in ROLLUPS:
+			cursor.execute(
+				f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE day BETWEEN %s AND %s',
+				[first, last],
+			)
+	day = first
+	while day <= last:
+		# A day at a time, so the day is known without truncating every order
+		# date in SQL, and each query stays on the order_date index.
+		lower, upper = date_range(day, day)
+		orders = Order.objects.filter(order_date__gte=lower, order_date__lt=upper)
+		count = orders.count()
+		if count:
+			change.order(day, count)
+			lines = (
+				Order_Product.objects.filter(order_id__in=orders.values('pk'))
+				.order_by()
+				.values_list('product_id', 'product_id__category_id', 'order_id__sm_id', 'order_id__pm_id')
+				.annotate(
+					lines=Count('pk'),
+					units=Sum('quantity'),
+					revenue=Sum(F('quantity') * F('price'), output_field=FloatField()),
+				)
+			)
+			for product_id, category_id, sm_id, pm_id, lines, units, revenue in lines:
+				change.add(day, sm_id, pm_id, product_id, category_id, lines, units, revenue)
+		day += timedelta(days=1)
+	change.create()
+
+
+def rebuild_rollups(start=None, end=None, chunk_days=31, progress=None):
+	"""
+	Rebuild the rollups from start to end (by default the first to the
+	last order), chunk_days at a time with each chunk in one transaction.
+	progress is called with the number of days rebuilt so far. Returns
+	that number.
+	"""
+	if start is None or end is None:
+		bounds = Order.objects.aggregate(first=Min('order_date'), last=Max('order_date'))
+		if bounds['first'] is None:
+			return 0
+		start = start or sales_day(bounds['first'])
+		end = end or sales_day(bounds['last'])
+	done = 0
+	first = start
+	while first <= end:
+		last = min(first + timedelta(days=chunk_days - 1), end)
+		with write_atomic():
+			rebuild_days(first, last)
+		done += (last - first).days + 1
+		if progress is not None:
+			progress(done)
+		first = last + timedelta(days=1)
+	return done
+
+
+def monthly_sales(start, end, product_id=None):
+	"""Sales per month from start to end, for every product or only one."""
+	sums = {'lines': Sum('lines'), 'units': Sum('units'), 'revenue': Sum('revenue')}
+	if product_id is None:
+		rows = Daily_Sales.objects.all()
+		sums['orders'] = Sum('orders')
+	else:
+		rows = Daily_Product_Sales.objects.filter(product_id=product_id)
+	return list(
+		rows.filter(day__range=(start, end))
+		.annotate(month=TruncMonth('day'))
+		.values('month')
+		.annotate(**sums)
+		.order_by('month')
+	)
+
+
+def sales_breakdown(model, field, start, end):
+	"""Sales from start to end per value of field, best selling first."""
+	return list(
+		model.objects.filter(day__range=(start, end), lines__gt=0)
+		.values(field)
+		.annotate(lines=Sum('lines'), units=Sum('units'), revenue=Sum('revenue'))
+		.order_by('-revenue')
+	)
+
+
+def best_sellers(days=None, size=10, today=None):
+	"""
+	The size best selling products by units and by revenue, overall and in
+	each category, over the last `days` days up to today or, with days
+	None, all time. Lists hold (product_id, category_id, units, revenue):
+
+		{'units': [...], 'revenue': [...], 'categories': {category_id: {'units': [...], 'revenue': [...]}}}
+	"""
+	if days is None:
+		rows = Product_Sales.objects.values_list('product_id', 'product_id__category_id', 'units', 'revenue')
+	else:
+		today = today or timezone.localdate()
+		rows = (
+			Daily_Product_Sales.objects.filter(day__gt=today - timedelta(days=days), day__lte=today)
+			.order_by()
+			.values_list('product_id', 'product_id__category_id')
+			.annotate(Sum('units'), Sum('revenue'))
+		)
+	rows = [row for row in rows if row[2] > 0]
+
+	def top(group):
+		# Ties go to the lower product id, so the lists don't shuffle between refreshes.
+		return {
+			'units': nlargest(size, group, key=lambda row: (row[2], row[3], -row[0])),
+			'revenue': nlargest(size, group, key=lambda row: (row[3], row[2], -row[0])),
+		}
+
+	categories = defaultdict(list)
+	for row in rows:
+		categories[row[1]].append(row)
+	board = top(rows)
+	board['categories'] = {category_id: top(group) for category_id, group in categories.items()}
+	return board
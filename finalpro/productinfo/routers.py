@@ -0,0 +1,153 @@
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.views.generic.detail import BaseDetailView
+from django.views.generic.list import BaseListView
+
+from productinfo.versions import get_version
+
+READ_REPLICAS_DEFAULTS = {
+	'ALIASES': [],
+	'PIN_SECONDS': 10,
+	'SYNC_CHECK_INTERVAL': 1.0,
+}
+
+# Written into each replica by refresh_replicas, never present on the primary.
+SYNC_TABLE = 'productinfo_replica_sync'
+
+PIN_SESSION_KEY = '_productinfo_pinned_until'
+
+routing = ContextVar('productinfo_routing', default=None)
+
+
+def read_replica_settings():
+	return {**READ_REPLICAS_DEFAULTS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+class RequestRouting:
+	"""Per-request routing decision, shared by the middleware and the router."""
+
+	def __init__(self, replica=None):
+		self.replica = replica
+		self.wrote = False
+
+
+class SyncStamps:
+	"""
+	The version stamp each replica was copied at, read from the replica
+	itself and remembered for SYNC_CHECK_INTERVAL seconds.
+	"""
+
+	def __init__(self):
+		self.stamps = {}
+		self.lock = threading.Lock()
+
+	def get(self, alias, interval):
+		with self.lock:
+			checked, stamp = self.stamps.get(alias, (None, None))
+		if checked is not None and time.monotonic() - checked < interval:
+			return stamp
+		try:
+			with connections[alias].cursor() as cursor:
+				cursor.execute(f'SELECT synced_at FROM {SYNC_TABLE}')
+				row = cursor.fetchone()
+			stamp = row[0] if row else None
+		except DatabaseError:
+			# Not refreshed yet, or mid-refresh; use the primary meanwhile.
+			stamp = None
+		with self.lock:
+			self.stamps[alias] = (time.monotonic(), stamp)
+		return stamp
+
+	def reset(self):
+		with self.lock:
+			self.stamps.clear()
+
+
+sync_stamps = SyncStamps()
+
+
+def replica_exists(alias):
+	# Connecting to an SQLite file that isn't there would create an empty one.
+	connection = connections[alias]
+	if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+		return True
+	return os.path.exists(connection.settings_dict['NAME'])
+
+
+def replica_versions(view_class):
+	"""Version names whose data a view reads, see FragmentCacheMixin.fragment_versions."""
+	names = getattr(view_class, 'replica_versions', None) or getattr(view_class, 'fragment_versions', ())
+	model = getattr(view_class, 'model', None)
+	if model is not None:
+		names = (*names, model._meta.model_name)
+	return names
+
+
+def serves_from_replica(view_class):
+	return (
+		issubclass(view_class, (BaseListView, BaseDetailView))
+		or getattr(view_class, 'replica_versions', None) is not None
+	)
+
+
+def choose_replica(names):
+	"""
+	Return a replica copied after the last change to every name in `names`,
+	or None. A replica that is older than any of them could serve a page
+	that is then cached under the newer version stamp. Replicas that have
+	never been copied are skipped without connecting to them.
+	"""
+	options = read_replica_settings()
+	newest = max((get_version(name) for name in names), default=0)
+	fresh = [
+		alias for alias in options['ALIASES']
+		if replica_exists(alias) and (sync_stamps.get(alias, options['SYNC_CHECK_INTERVAL']) or 0) > newest
+	]
+	return random.choice(fresh) if fresh else None
+
+
+class ReplicaRouter:
+	"""
+	Send productinfo reads to the replica chosen for the current request by
+	ReplicaRoutingMiddleware, and everything else to the primary.
+	"""
+
+	@staticmethod
+	def routed(model):
+		return model._meta.app_label == 'productinfo'
+
+	def db_for_read(self, model, **hints):
+		if not self.routed(model):
+			return None
+		state = routing.get()
+		if state is not None and state.replica is not None:
+			return state.replica
+		# Explicitly, so instances read from a replica don't pull their
+		# relations from it outside a replica request.
+		return DEFAULT_DB_ALIAS
+
+	def db_for_write(self, model, **hints):
+		if not self.routed(model):
+			return None
+		state = routing.get()
+		if state is not None:
+			state.wrote = True
+		return DEFAULT_DB_ALIAS
+
+	def allow_relation(self, obj1, obj2, **hints):
+		databases = {DEFAULT_DB_ALIAS, *read_replica_settings()['ALIASES']}
+		if obj1._state.db in databases and obj2._state.db in databases:
+			return True
+		return None
+
+	def allow_migrate(self, db, app_label, model_name=None, **hints):
+		# Replicas get their schema with the data from refresh_replicas.
+		if db in read_replica_settings()['ALIASES']:
+			return False
+		return None
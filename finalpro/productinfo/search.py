@@ -0,0 +1,96 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from productinfo.models import Product, Product_Search
+from productinfo.sqlite import write_atomic
+
+TERM = re.compile(r'\w+')
+
+# Written to the FTS5 table by the triggers of migration 0013 as well.
+INDEX_PRODUCTS = '''
+	SELECT p.product_id, p.product_name, c.category_name, c.category_description
+	FROM productinfo_product p
+	INNER JOIN productinfo_category c ON c.category_id = p.category_id_id
+'''
+
+
+def search_terms(text):
+	return TERM.findall(text or '')
+
+
+def fts_query(text):
+	"""
+	Turn free text into an FTS5 query that matches every word as a prefix,
+	so 'blue sh' finds 'Blue Shirt'. Quoting each term keeps FTS5 operators
+	and column filters in the input from being interpreted.
+	"""
+	return ' '.join(f'"{term}"*' for term in search_terms(text))
+
+
+def search_products(text):
+	"""
+	Products matching every word of `text` in their name or their category's
+	name or description, best bm25 rank first.
+	"""
+	terms = search_terms(text)
+	if not terms:
+		return Product.objects.none()
+	if connection.vendor != 'sqlite':
+		condition = Q()
+		for term in terms:
+			condition &= (
+				Q(product_name__icontains=term)
+				| Q(category_id__category_name__icontains=term)
+				| Q(category_id__category_description__icontains=term)
+			)
+		return Product.objects.filter(condition).order_by('product_name', 'pk')
+	return (
+		Product.objects
+		.filter(search__query=fts_query(text))
+		.order_by('search__rank', 'pk')
+	)
+
+
+def rebuild_search_index(batch_size, progress=None):
+	"""
+	Rewrite the search rows for products batch_size product ids at a time, so
+	each transaction stays short, then drop rows of products that are gone and
+	merge the index b-trees. Returns the number of products indexed.
+	"""
+	table = Product_Search._meta.db_table
+	indexed = 0
+	last_pk = 0
+	with connection.cursor() as cursor:
+		while True:
+			cursor.execute(
+				'SELECT product_id FROM productinfo_product WHERE product_id > %s '
+				'ORDER BY product_id LIMIT 1 OFFSET %s',
+				[last_pk, batch_size - 1],
+			)
+			row = cursor.fetchone()
+			upper = row[0] if row else None
+			with write_atomic():
+				if upper is None:
+					cursor.execute(f'DELETE FROM {table} WHERE rowid > %s', [last_pk])
+					cursor.execute(
+						f'INSERT INTO {table} (rowid, product_name, category_name, category_description) '
+						f'{INDEX_PRODUCTS} WHERE p.product_id > %s',
+						[last_pk],
+					)
+				else:
+					cursor.execute(f'DELETE FROM {table} WHERE rowid > %s AND rowid <= %s', [last_pk, upper])
+					cursor.execute(
+						f'INSERT INTO {table} (rowid, product_name, category_name, category_description) '
+						f'{INDEX_PRODUCTS} WHERE p.product_id > %s AND p.product_id <= %s',
+						[last_pk, upper],
+					)
+				indexed += cursor.rowcount
+			if progress is not None:
+				progress(indexed)
+			if upper is None:
+				break
+			last_pk = upper
+		cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+	return indexed
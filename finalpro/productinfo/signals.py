@@ -0,0 +1,229 @@
+from django.db import connections, transaction
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from productinfo.caches import lookup_cache, product_cache
+from productinfo.jobs import job_changed
+from productinfo.reservations import adjust_stock
+from productinfo.rollups import lines_changed, order_changed, order_deleted, product_moved, rebuild_days, sales_day
+from productinfo.middleware import record_query
+from productinfo.models import (
+	Category, Job, Order, Order_Product, Payment_Method, Product, Shipping_Method, Stock_Reservation,
+)
+from productinfo.sqlite import apply_journal_mode, apply_sqlite_profile
+from productinfo.versions import bump_version
+
+# Models that cached pages are built from, i.e. every name used in a
+# fragment_versions (see productinfo.utils.FragmentCacheMixin). Writes to
+# the others, such as stock holds and sales rollups, leave the pages alone.
+PAGE_MODELS = {
+	'customer', 'shipping_method', 'payment_method', 'shopping_cart', 'cart_item',
+	'category', 'product', 'order', 'order_product',
+}
+
+
+def stored_sale(instance):
+	loaded = getattr(instance, '_loaded_values', {})
+	try:
+		return loaded['order_id_id'], loaded['product_id_id'], loaded['quantity'], loaded['price']
+	except KeyError:
+		return None
+
+
+@receiver(post_save, sender=Order_Product)
+def order_product_saved(sender, instance, created, raw=False, **kwargs):
+	if raw:
+		return
+	sale = (instance.order_id_id, instance.product_id_id, instance.quantity, instance.price)
+	previous_sale = None if created else stored_sale(instance)
+	# Recounted rather than moved by the difference, so totals that are off
+	# for any reason are put right by the next write to the order.
+	orders = {instance.order_id_id}
+	if previous_sale is not None:
+		orders.add(previous_sale[0])
+	Order.objects.filter(pk__in=orders).refresh_totals()
+	if created:
+		lines_changed(added=[sale])
+	elif previous_sale is None:
+		# What the rollups hold for this line isn't known; recount its day.
+		day = sales_day(Order.objects.values_list('order_date', flat=True).get(pk=instance.order_id_id))
+		rebuild_days(day, day)
+	elif previous_sale != sale:
+		lines_changed(removed=[previous_sale], added=[sale])
+	instance._loaded_values = {
+		'order_id_id': instance.order_id_id,
+		'product_id_id': instance.product_id_id,
+		'quantity': instance.quantity,
+		'price': instance.price,
+	}
+
+
+@receiver(post_delete, sender=Order_Product)
+def order_product_deleted(sender, instance, **kwargs):
+	removed = stored_sale(instance) or (instance.order_id_id, instance.product_id_id, instance.quantity, instance.price)
+	Order.objects.filter(pk=removed[0]).refresh_totals()
+	lines_changed(removed=[removed])
+
+
+def stored_order(instance):
+	loaded = getattr(instance, '_loaded_values', {})
+	try:
+		return loaded['order_date'], loaded['sm_id_id'], loaded['pm_id_id']
+	except KeyError:
+		return None
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+	if raw:
+		return
+	previous = None if created else stored_order(instance)
+	if created or previous is not None:
+		order_changed(instance, previous)
+	else:
+		# Order.save reads the stored row first, so this is an order saved
+		# without it (e.g. with save_base); recount its day at least.
+		day = sales_day(instance.order_date)
+		rebuild_days(day, day)
+	instance._loaded_values = {
+		'order_date': instance.order_date,
+		'sm_id_id': instance.sm_id_id,
+		'pm_id_id': instance.pm_id_id,
+	}
+
+
+@receiver(post_delete, sender=Order)
+def order_removed(sender, instance, **kwargs):
+	previous = stored_order(instance)
+	order_deleted(previous[0] if previous else instance.order_date)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+	if raw or created:
+		return
+	loaded = getattr(instance, '_loaded_values', {})
+	if 'category_id_id' in loaded:
+		# Order lines are rolled up under their product's current category.
+		product_moved(instance.pk, loaded['category_id_id'], instance.category_id_id)
+	instance._loaded_values = {'category_id_id': instance.category_id_id}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+	# Again once committed, so an API response read between the write and
+	# the commit isn't kept under the new ETag.
+	bump_version('catalog')
+	transaction.on_commit(lambda: bump_version('catalog'))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+	# Again once committed, so no process keeps the row it read meanwhile.
+	pk = instance.pk
+	product_cache.invalidate(pk)
+	transaction.on_commit(lambda: product_cache.invalidate(pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+	# Cached products carry their category, so drop every product in it.
+	pks = list(instance.products.values_list('pk', flat=True))
+	product_cache.invalidate(*pks)
+	transaction.on_commit(lambda: product_cache.invalidate(*pks))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Shipping_Method)
+@receiver(post_delete, sender=Shipping_Method)
+@receiver(post_save, sender=Payment_Method)
+@receiver(post_delete, sender=Payment_Method)
+def lookup_changed(sender, **kwargs):
+	transaction.on_commit(lambda: lookup_cache.changed(sender))
+
+
+@receiver(post_delete, sender=Stock_Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+	# A hold deleted with its cart item gives its stock back; holds that were
+	# used up or already released are zeroed before deletion.
+	if instance.quantity:
+		adjust_stock(instance.product_id_id, instance.quantity)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def model_changed(sender, **kwargs):
+	# Per-model version stamps key the cached page fragments. Bumped again
+	# once committed, so no page read between the write and the commit is
+	# cached under the new stamp.
+	if sender._meta.app_label == 'productinfo' and sender._meta.model_name in PAGE_MODELS:
+		name = sender._meta.model_name
+		bump_version(name)
+		transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def job_saved(sender, **kwargs):
+	# The job pages aren't cached, but replica routing checks this stamp.
+	job_changed()
+
+
+@receiver(user_logged_in)
+def snapshot_permissions(sender, request, user, **kwargs):
+	# Take the snapshot once per login rather than on the first page.
+	user.get_all_permissions()
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+	bump_version(f'user:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permissions_changed(sender, **kwargs):
+	bump_version('auth')
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	if not action.startswith('post_'):
+		return
+	if not reverse:
+		bump_version(f'user:{instance.pk}')
+	elif pk_set:
+		bump_version(*(f'user:{pk}' for pk in pk_set))
+	else:
+		# Clearing a group (or permission) from the reverse side doesn't say which users lost it.
+		bump_version('auth')
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+	apply_sqlite_profile(connection)
+	# Reconnecting fires this again on the same wrapper.
+	if record_query not in connection.execute_wrappers:
+		connection.execute_wrappers.append(record_query)
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+	# Sent once per installed app; the mode only needs setting once.
+	if sender.name == 'productinfo':
+		apply_journal_mode(connections[using])
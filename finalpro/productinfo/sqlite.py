@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+SQLITE_PROFILE_DEFAULTS = {
+	'ENABLED': False,
+	'JOURNAL_MODE': 'WAL',
+	'SYNCHRONOUS': 'NORMAL',
+	'MMAP_SIZE': 256 * 1024 * 1024,
+	'CACHE_SIZE': -64 * 1024,
+	'TEMP_STORE': 'MEMORY',
+	'TRANSACTION_MODE': 'IMMEDIATE',
+}
+
+
+def sqlite_profile_settings():
+	return {**SQLITE_PROFILE_DEFAULTS, **getattr(settings, 'SQLITE_PROFILE', {})}
+
+
+def profile_pragmas(profile):
+	"""
+	Return the per-connection PRAGMA statements for a profile, skipping
+	settings left as None. None of them change the database file.
+	"""
+	return [
+		f'PRAGMA {name.lower()} = {profile[name]}'
+		for name in ('SYNCHRONOUS', 'MMAP_SIZE', 'CACHE_SIZE', 'TEMP_STORE')
+		if profile[name] is not None
+	]
+
+
+def profile_enabled(connection):
+	return connection.vendor == 'sqlite' and sqlite_profile_settings()['ENABLED']
+
+
+def apply_sqlite_profile(connection):
+	if not profile_enabled(connection):
+		return
+	with connection.cursor() as cursor:
+		for pragma in profile_pragmas(sqlite_profile_settings()):
+			cursor.execute(pragma)
+
+
+def apply_journal_mode(connection):
+	"""
+	Switch the database to the profile's JOURNAL_MODE. The mode is stored in
+	the file, so this is done when migrating rather than on every connection.
+	"""
+	journal_mode = sqlite_profile_settings()['JOURNAL_MODE']
+	if not profile_enabled(connection) or connection.is_in_memory_db() or journal_mode is None:
+		return
+	with connection.cursor() as cursor:
+		cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+
+@contextmanager
+def write_atomic(using=None):
+	"""
+	atomic() for a block that writes. On SQLite with a TRANSACTION_MODE, the
+	outermost block starts with BEGIN <mode>: a deferred transaction that
+	reads and then writes can't wait for the write lock (it would deadlock),
+	so SQLite fails it with "database is locked" whatever the timeout. Taking
+	the lock up front makes concurrent writers queue instead. Nested blocks
+	are plain savepoints.
+	"""
+	using = using or DEFAULT_DB_ALIAS
+	connection = connections[using]
+	mode = sqlite_profile_settings()['TRANSACTION_MODE']
+	if not mode or not profile_enabled(connection) or connection.in_atomic_block or not connection.get_autocommit():
+		with transaction.atomic(using=using):
+			yield
+		return
+	transaction.set_autocommit(False, using=using)
+	try:
+		with connection.cursor() as cursor:
+			cursor.execute(f'BEGIN {mode}')
+		# With autocommit off, atomic() runs inside this transaction and
+		# leaves the commit to the code below.
+		with transaction.atomic(using=using):
+			yield
+		transaction.commit(using=using)
+	except BaseException:
+		transaction.rollback(using=using)
+		raise
+	finally:
+		transaction.set_autocommit(True, using=using)
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import caches
+from django.db.models import Count, F, FloatField, Sum
+from django.test import TestCase, override_settings
+
+from productinfo.caches import leaderboard_cache, lookup_cache, product_cache
+from productinfo.models import Category, Customer, Order, Payment_Method, Product, Shipping_Method
+
+DAY = datetime(2022, 5, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+# Local-memory caches, so tests never touch the file caches the site uses.
+TEST_CACHES = {
+	'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+	'template_fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-fragments'},
+}
+
+
+@override_settings(
+	CACHES=TEST_CACHES,
+	READ_REPLICAS={'ALIASES': []},
+)
+class ProductinfoTestCase(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.category = Category.objects.create(category_name='Books', category_description='Books')
+		cls.other_category = Category.objects.create(category_name='Games', category_description='Games')
+		cls.sm = Shipping_Method.objects.create(sm_name='Post', sm_description='Post')
+		cls.pm = Payment_Method.objects.create(pm_name='Card', pm_description='Card')
+		cls.customer = Customer.objects.create(
+			first_name='Ann', last_name='Lee', username='ann', password='x', email='ann@example.com',
+			sm_id=cls.sm, pm_id=cls.pm,
+		)
+		cls.book = Product.objects.create(product_name='Book', product_price=10.0, stock_num=10, category_id=cls.category)
+		cls.pen = Product.objects.create(product_name='Pen', product_price=2.5, stock_num=100, category_id=cls.category)
+
+	def setUp(self):
+		# The caches outlive each test's rolled back transaction, and on_commit
+		# hooks that would invalidate them never run inside one.
+		for alias in ('default', 'template_fragments'):
+			caches[alias].clear()
+		for store in (lookup_cache, product_cache, leaderboard_cache):
+			store.reset()
+
+	def log_in(self, *permissions):
+		"""Log the test client in as a new user with these 'app_label.codename' permissions."""
+		user = User.objects.create_user(f'user{User.objects.count()}')
+		for permission in permissions:
+			app_label, codename = permission.split('.')
+			user.user_permissions.add(Permission.objects.get(content_type__app_label=app_label, codename=codename))
+		self.client.force_login(user)
+		return user
+
+	def create_order(self, order_date=DAY, **kwargs):
+		fields = {'receiver': 'Ann Lee', 'address': 'Street 1', 'sm_id': self.sm, 'pm_id': self.pm,
+				  'customer_id': self.customer}
+		return Order.objects.create(order_date=order_date, **{**fields, **kwargs})
+
+	def assertTotalsStored(self, *orders):
+		for order in orders:
+			lines = order.order_products.aggregate(
+				total=Sum(F('quantity') * F('price'), output_field=FloatField()), count=Count('pk'))
+			order.refresh_from_db()
+			self.assertAlmostEqual(order.total_price, lines['total'] or 0.0)
+			self.assertEqual(order.line_count, lines['count'])
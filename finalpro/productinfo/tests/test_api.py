@@ -0,0 +1,57 @@
+import json
+
+from django.urls import reverse
+
+from productinfo.models import Product
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class ProductApiTests(ProductinfoTestCase):
+	list_url = reverse('productinfo_api_product_list_urlpattern')
+
+	def detail_url(self, pk):
+		return reverse('productinfo_api_product_detail_urlpattern', kwargs={'pk': pk})
+
+	def test_anonymous_requests_are_refused(self):
+		self.assertEqual(self.client.get(self.list_url).status_code, 403)
+		self.assertEqual(self.client.get(self.detail_url(self.book.pk)).status_code, 403)
+
+	def test_view_product_permission_is_required(self):
+		self.log_in()
+		self.assertEqual(self.client.get(self.list_url).status_code, 403)
+
+	def test_list_pages_and_selects_fields(self):
+		self.log_in('productinfo.view_product')
+		response = self.client.get(self.list_url, {'limit': 1, 'fields': 'product_name,category_name'})
+		data = json.loads(response.content)
+		self.assertEqual(data['results'], [{'product_name': 'Book', 'category_name': 'Books'}])
+		data = json.loads(self.client.get(data['next']).content)
+		self.assertEqual(data['results'], [{'product_name': 'Pen', 'category_name': 'Books'}])
+		self.assertIsNone(data['next'])
+
+	def test_conditional_get(self):
+		self.log_in('productinfo.view_product')
+		response = self.client.get(self.list_url)
+		self.assertEqual(response.status_code, 200)
+		etag = response['ETag']
+		self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		# Another query string is another representation.
+		self.assertEqual(self.client.get(self.list_url, {'limit': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+		product = Product.objects.get(pk=self.pen.pk)
+		product.product_price = 3.0
+		product.save()
+		response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_bad_parameters(self):
+		self.log_in('productinfo.view_product')
+		for params in ({'fields': 'secret'}, {'limit': 'many'}, {'after': 'x'}, {'min_price': 'cheap'}):
+			with self.subTest(params=params):
+				self.assertEqual(self.client.get(self.list_url, params).status_code, 400)
+		self.assertEqual(self.client.get(self.detail_url(self.book.pk), {'fields': 'secret'}).status_code, 400)
+
+	def test_missing_product(self):
+		self.log_in('productinfo.view_product')
+		self.assertEqual(self.client.get(self.detail_url(0)).status_code, 404)
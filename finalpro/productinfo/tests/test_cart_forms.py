@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from productinfo.models import Cart_Item, Customer, Shopping_Cart
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class CartItemFormQueryTests(ProductinfoTestCase):
+	def add_cart(self):
+		number = Customer.objects.count()
+		customer = Customer.objects.create(
+			first_name='Bo', last_name='Kim', username=f'bo{number}', password='x', email=f'bo{number}@example.com',
+			sm_id=self.sm, pm_id=self.pm,
+		)
+		return Shopping_Cart.objects.create(customer_id=customer, sm_id=self.sm, pm_id=self.pm)
+
+	def count_queries(self, url):
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(self.client.get(url).status_code, 200)
+		return len(queries)
+
+	def test_cart_choices_do_not_query_per_cart(self):
+		self.log_in('productinfo.add_cart_item', 'productinfo.change_cart_item')
+		cart = self.add_cart()
+		item = Cart_Item.objects.create(cart_id=cart, product_id=self.book, quantity=1)
+		urls = [
+			reverse('productinfo_cartitem_create_urlpattern'),
+			reverse('productinfo_cartitem_update_urlpattern', kwargs={'pk': item.pk}),
+		]
+		# Once first, so the permission snapshot is cached before counting.
+		for url in urls:
+			self.count_queries(url)
+		before = [self.count_queries(url) for url in urls]
+		for _ in range(5):
+			self.add_cart()
+		self.assertEqual([self.count_queries(url) for url in urls], before)
@@ -0,0 +1,59 @@
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from productinfo.checkout import CheckoutError, checkout
+from productinfo.models import Cart_Item, Product, Shopping_Cart
+from productinfo.reservations import StockError
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class CheckoutTests(ProductinfoTestCase):
+	def setUp(self):
+		super().setUp()
+		self.cart = Shopping_Cart.objects.create(customer_id=self.customer, sm_id=self.sm, pm_id=self.pm)
+
+	def add(self, product, quantity):
+		return Cart_Item.objects.create(cart_id=self.cart, product_id=product, quantity=quantity)
+
+	def test_cart_becomes_an_order(self):
+		self.add(self.book, 2)
+		self.add(self.pen, 4)
+		Product.objects.filter(pk=self.pen.pk).update(product_price=3.0)
+		order = checkout(self.cart, 'Ann Lee', 'Street 1')
+
+		lines = sorted(order.order_products.values_list('product_id', 'quantity', 'price'))
+		self.assertEqual(lines, [(self.book.pk, 2, 10.0), (self.pen.pk, 4, 3.0)])
+		self.assertTotalsStored(order)
+		self.assertFalse(self.cart.cart_items.exists())
+		stock = dict(Product.objects.values_list('pk', 'stock_num'))
+		self.assertEqual((stock[self.book.pk], stock[self.pen.pk]), (8, 96))
+
+	def test_oversell_changes_nothing(self):
+		self.add(self.pen, 1)
+		self.add(self.book, 11)
+		with self.assertRaises(StockError):
+			checkout(self.cart, 'Ann Lee', 'Street 1')
+		self.assertEqual(self.customer.orders.count(), 0)
+		self.assertEqual(self.cart.cart_items.count(), 2)
+		stock = dict(Product.objects.values_list('pk', 'stock_num'))
+		self.assertEqual((stock[self.book.pk], stock[self.pen.pk]), (10, 100))
+
+	def test_empty_cart_is_refused(self):
+		with self.assertRaises(CheckoutError):
+			checkout(self.cart, 'Ann Lee', 'Street 1')
+
+
+class CheckoutAccessTests(ProductinfoTestCase):
+	def test_anonymous_user_is_sent_to_login_before_the_cart_is_loaded(self):
+		url = reverse('productinfo_shoppingcart_checkout_urlpattern', kwargs={'pk': 999})
+		with self.assertNumQueries(0):
+			response = self.client.get(url)
+		self.assertEqual(response.status_code, 302)
+		self.assertTrue(response.url.startswith(reverse('login_urlpattern')))
+
+
+class RebuildOrderTotalsCommandTests(ProductinfoTestCase):
+	def test_batch_size_must_be_positive(self):
+		for batch_size in ('0', '-1'):
+			with self.subTest(batch_size=batch_size), self.assertRaises(CommandError):
+				call_command('rebuild_order_totals', '--batch-size', batch_size)
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from productinfo.exporters import EXPORT_COLUMNS, export_lines, export_rows, order_lines
+from productinfo.models import Customer, Order_Product
+from productinfo.tests.base import DAY, ProductinfoTestCase
+
+
+class OrderExportTests(ProductinfoTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		super().setUpTestData()
+		cls.other_customer = Customer.objects.create(
+			first_name='Bo', last_name='Kim', username='bo', password='x', email='bo@example.com',
+			sm_id=cls.sm, pm_id=cls.pm,
+		)
+
+	def setUp(self):
+		super().setUp()
+		self.orders = [
+			self.create_order(DAY),
+			self.create_order(DAY + timedelta(days=1), customer_id=self.other_customer),
+			self.create_order(DAY + timedelta(days=2)),
+		]
+		# Created out of order, so the export has to sort lines by order.
+		self.lines = [
+			Order_Product.objects.create(order_id=self.orders[order], product_id=product, quantity=1, price=1.0)
+			for order, product in ((1, self.book), (0, self.book), (2, self.pen), (0, self.pen), (1, self.pen))
+		]
+
+	def exported(self, lines=None, chunk_size=2000):
+		return [(row[0], row[8]) for row in export_rows(lines or order_lines(), chunk_size)]
+
+	def test_rows_are_grouped_by_order(self):
+		expected = sorted((line.order_id_id, line.pk) for line in self.lines)
+		self.assertEqual(self.exported(), expected)
+
+	def test_chunks_seek_past_the_last_row(self):
+		# Two full chunks of two and a last one with one row.
+		with self.assertNumQueries(3):
+			rows = self.exported(chunk_size=2)
+		self.assertEqual(rows, self.exported())
+
+	def test_filters(self):
+		lines = order_lines(DAY.date() + timedelta(days=1), DAY.date() + timedelta(days=2), self.customer.pk)
+		self.assertEqual(self.exported(lines), sorted(
+			(line.order_id_id, line.pk) for line in self.lines if line.order_id == self.orders[2]
+		))
+
+	def test_formats(self):
+		names = [name for name, lookup in EXPORT_COLUMNS]
+		rows = list(csv.reader(io.StringIO(''.join(export_lines(export_rows(order_lines()), 'csv')))))
+		self.assertEqual(rows[0], names)
+		self.assertEqual(len(rows), 6)
+		records = [json.loads(line) for line in export_lines(export_rows(order_lines()), 'jsonl')]
+		self.assertEqual(list(records[0]), names)
+		self.assertEqual(records[0]['username'], 'ann')
+
+	def test_download(self):
+		self.log_in('productinfo.view_order', 'productinfo.view_order_product')
+		url = reverse('productinfo_order_export_urlpattern')
+		response = self.client.get(url, {'format': 'jsonl', 'customer': self.other_customer.pk})
+		self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.jsonl"')
+		records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+		self.assertEqual({record['order_id'] for record in records}, {self.orders[1].pk})
+		self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+
+	def test_command(self):
+		output = io.StringIO()
+		call_command('export_orders', '--format', 'jsonl', '--chunk-size', '2', stdout=output)
+		self.assertEqual(len(output.getvalue().splitlines()), 5)
+		with self.assertRaises(CommandError):
+			call_command('export_orders', '--chunk-size', '0')
@@ -0,0 +1,38 @@
+from django.urls import reverse
+
+from productinfo.models import Product
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class FragmentCacheTests(ProductinfoTestCase):
+	list_url = reverse('productinfo_product_list_urlpattern')
+
+	def detail_url(self):
+		return reverse('productinfo_product_detail_urlpattern', kwargs={'pk': self.book.pk})
+
+	def test_warm_page_runs_no_queries(self):
+		self.log_in('productinfo.view_product')
+		for url in (self.list_url, self.detail_url()):
+			with self.subTest(url=url):
+				cold = self.client.get(url)
+				with self.assertNumQueries(0):
+					warm = self.client.get(url)
+				self.assertEqual(warm.status_code, 200)
+				self.assertContains(warm, 'Book')
+				self.assertEqual(warm.content, cold.content)
+
+	def test_a_write_moves_the_page_on(self):
+		self.log_in('productinfo.view_product')
+		self.client.get(self.list_url)
+		product = Product.objects.get(pk=self.book.pk)
+		product.product_name = 'Atlas'
+		product.save()
+		response = self.client.get(self.list_url)
+		self.assertContains(response, 'Atlas')
+		self.assertNotContains(response, 'Book')
+
+	def test_pages_are_kept_per_permission_set(self):
+		self.log_in('productinfo.view_product')
+		self.assertNotContains(self.client.get(self.list_url), 'Create New Product')
+		self.log_in('productinfo.view_product', 'productinfo.add_product')
+		self.assertContains(self.client.get(self.list_url), 'Create New Product')
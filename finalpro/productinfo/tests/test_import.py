@@ -0,0 +1,72 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from productinfo.importers import ImportResult, import_products, read_rows
+from productinfo.models import Product
+from productinfo.tests.base import ProductinfoTestCase
+
+HEADER = 'product_name,product_price,stock_num,category_name\n'
+
+
+def csv_rows(text):
+	return read_rows(io.BytesIO((HEADER + text).encode()), 'csv')
+
+
+class ProductImportTests(ProductinfoTestCase):
+	def products(self):
+		return list(Product.objects.order_by('product_name')
+					.values_list('product_name', 'product_price', 'stock_num', 'category_id__category_name'))
+
+	def test_creates_and_updates_by_name(self):
+		result = import_products(csv_rows('Book,12.0,5,Games\n Ink ,1.5,40,Books\n'))
+		self.assertEqual((result.created, result.updated, result.error_count), (1, 1, 0))
+		self.assertEqual(self.products(), [
+			('Book', 12.0, 5, 'Games'), ('Ink', 1.5, 40, 'Books'), ('Pen', 2.5, 100, 'Books'),
+		])
+
+	def test_invalid_rows_are_reported_and_skipped(self):
+		result = import_products(csv_rows('Ink,cheap,1,Books\nInk,1.0,1,Toys\nInk,1.0,1,Books\n'))
+		self.assertEqual((result.created, result.error_count), (1, 2))
+		self.assertEqual([line for line, message in result.errors], [2, 3])
+		self.assertTrue(result.errors[0][1].startswith('product_price:'))
+		self.assertTrue(result.errors[1][1].startswith('category_name:'))
+
+	def test_json_lines(self):
+		data = b'{"product_name": "Ink", "product_price": 1.5, "stock_num": 4, "category_name": "Books"}\n\n[1]\n{bad\n'
+		result = import_products(read_rows(io.BytesIO(data), 'jsonl'))
+		self.assertEqual(result.created, 1)
+		self.assertEqual([line for line, message in result.errors], [3, 4])
+
+	def test_rows_are_read_a_batch_at_a_time(self):
+		written_before = []
+
+		def rows():
+			for line_number, row in csv_rows(''.join(f'Item {n},1.0,1,Books\n' for n in range(5))):
+				written_before.append(Product.objects.filter(product_name__startswith='Item').count())
+				yield line_number, row
+
+		result = import_products(rows(), batch_size=2)
+		self.assertEqual(result.created, 5)
+		# Each batch is written before the next one is read.
+		self.assertEqual(written_before, [0, 0, 2, 2, 4])
+
+	def test_errors_kept_are_capped(self):
+		result = ImportResult(max_errors=2)
+		import_products(csv_rows('Ink,x,1,Books\n' * 5), result=result)
+		self.assertEqual(result.error_count, 5)
+		self.assertEqual(len(result.errors), 2)
+
+	def test_upload(self):
+		self.log_in('productinfo.add_product', 'productinfo.change_product')
+		upload = SimpleUploadedFile('products.csv', (HEADER + 'Ink,1.5,40,Books\n').encode())
+		response = self.client.post(reverse('productinfo_product_import_urlpattern'), {'file': upload, 'format': 'csv'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.context['result'].created, 1)
+		self.assertTrue(Product.objects.filter(product_name='Ink').exists())
+
+	def test_command_rejects_a_batch_size_below_one(self):
+		with self.assertRaises(CommandError):
+			call_command('import_products', 'products.csv', '--batch-size', '0')
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+
+from productinfo.jobs import HANDLERS, claim_next, enqueue, file_dir, handler, requeue_stale, run_job
+from productinfo.models import Job, Order_Product, Product
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class JobTests(ProductinfoTestCase):
+	def setUp(self):
+		super().setUp()
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		settings = override_settings(JOBS={'FILE_DIR': directory.name, 'STALE_SECONDS': 60})
+		settings.enable()
+		self.addCleanup(settings.disable)
+
+	def make_stale(self, job):
+		Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=120))
+
+	def test_claims_take_the_oldest_job_once(self):
+		first = enqueue('rebuild_order_totals')
+		second = enqueue('rebuild_order_totals')
+		claimed = claim_next('a')
+		self.assertEqual((claimed.pk, claimed.status, claimed.worker), (first.pk, Job.RUNNING, 'a'))
+		self.assertTrue(claimed.claim_token)
+		self.assertEqual(claim_next('b').pk, second.pk)
+		self.assertIsNone(claim_next('c'))
+
+	def test_only_stale_jobs_are_requeued(self):
+		enqueue('rebuild_order_totals')
+		enqueue('rebuild_order_totals')
+		stale, fresh = claim_next('a'), claim_next('a')
+		self.make_stale(stale)
+		self.assertEqual(requeue_stale(), 1)
+		stale.refresh_from_db()
+		fresh.refresh_from_db()
+		self.assertEqual((stale.status, stale.worker, stale.claim_token), (Job.QUEUED, '', ''))
+		self.assertEqual(fresh.status, Job.RUNNING)
+		self.assertEqual(claim_next('b').pk, stale.pk)
+
+	def test_export_runs_to_done(self):
+		order = self.create_order()
+		Order_Product.objects.create(order_id=order, product_id=self.book, quantity=1, price=10.0)
+		enqueue('export_orders', {'format': 'jsonl'})
+		job = claim_next('a')
+		self.assertEqual(run_job(job), Job.DONE)
+		job.refresh_from_db()
+		self.assertEqual((job.message, job.progress, job.total), ('Exported 1 order lines.', 1, 1))
+		with open(job.output_path) as output:
+			self.assertEqual(len(output.readlines()), 1)
+
+	def test_import_removes_its_upload(self):
+		upload = SimpleUploadedFile('p.csv', b'product_name,product_price,stock_num,category_name\nInk,1.0,2,Books\n')
+		enqueue('import_products', {'format': 'csv'}, upload=upload)
+		job = claim_next('a')
+		self.assertEqual(run_job(job), Job.DONE)
+		self.assertTrue(Product.objects.filter(product_name='Ink').exists())
+		self.assertFalse(os.path.exists(job.input_path))
+
+	def test_failure_is_recorded(self):
+		enqueue('import_products', upload=SimpleUploadedFile('p.csv', b''))
+		job = claim_next('a')
+		os.remove(job.input_path)
+		with self.assertLogs('productinfo.jobs', 'ERROR'):
+			self.assertEqual(run_job(job), Job.FAILED)
+		job.refresh_from_db()
+		self.assertEqual(job.status, Job.FAILED)
+		self.assertTrue(job.message.startswith('FileNotFoundError'))
+
+	def test_a_run_that_was_claimed_again_is_dropped(self):
+		def reclaimed(job, progress):
+			# Another worker requeues and claims the job while this one runs.
+			self.make_stale(job)
+			requeue_stale()
+			claim_next('b')
+			job.output_path = str(file_dir() / 'lost.txt')
+			with open(job.output_path, 'w') as output:
+				output.write('partial')
+			return 'Done.'
+
+		handler('test_reclaimed', 'Test')(reclaimed)
+		self.addCleanup(HANDLERS.pop, 'test_reclaimed')
+		enqueue('test_reclaimed')
+		job = claim_next('a')
+		with self.assertLogs('productinfo.jobs', 'WARNING'):
+			self.assertIsNone(run_job(job))
+		self.assertFalse(os.path.exists(job.output_path))
+		stored = Job.objects.get(pk=job.pk)
+		self.assertEqual((stored.status, stored.worker), (Job.RUNNING, 'b'))
+		self.assertNotEqual(stored.claim_token, job.claim_token)
+
+	def test_progress_of_a_lost_run_stops_it(self):
+		enqueue('rebuild_order_totals')
+		job = claim_next('a')
+		self.make_stale(job)
+		requeue_stale()
+		claim_next('b')
+		with self.assertLogs('productinfo.jobs', 'WARNING'):
+			self.assertIsNone(run_job(job))
+		self.assertEqual(Job.objects.get(pk=job.pk).worker, 'b')
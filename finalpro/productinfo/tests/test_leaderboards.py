@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from productinfo.caches import leaderboard_cache
+from productinfo.models import Order_Product, Product
+from productinfo.rollups import best_sellers, sales_day
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class LeaderboardTests(ProductinfoTestCase):
+	def setUp(self):
+		super().setUp()
+		self.now = timezone.now()
+		self.today = sales_day(self.now)
+		self.game = Product.objects.create(
+			product_name='Chess', product_price=20.0, stock_num=5, category_id=self.other_category)
+
+	def sell(self, product, quantity, days_ago=0):
+		order = self.create_order(self.now - timedelta(days=days_ago))
+		Order_Product.objects.create(order_id=order, product_id=product, quantity=quantity,
+									 price=product.product_price)
+
+	def ranked(self, board, ranking='units'):
+		return [row[0] for row in board[ranking]]
+
+	def test_units_and_revenue_rank_differently(self):
+		self.sell(self.book, 1)
+		self.sell(self.pen, 3)
+		board = best_sellers(7, today=self.today)
+		self.assertEqual(self.ranked(board), [self.pen.pk, self.book.pk])
+		self.assertEqual(self.ranked(board, 'revenue'), [self.book.pk, self.pen.pk])
+		self.assertEqual(board['units'][0], (self.pen.pk, self.category.pk, 3, 7.5))
+
+	def test_windows(self):
+		self.sell(self.book, 1)
+		self.sell(self.pen, 2, days_ago=6)
+		self.sell(self.game, 3, days_ago=7)
+		self.sell(self.game, 4, days_ago=40)
+		self.assertEqual(self.ranked(best_sellers(7, today=self.today)), [self.pen.pk, self.book.pk])
+		self.assertEqual(self.ranked(best_sellers(30, today=self.today)), [self.game.pk, self.pen.pk, self.book.pk])
+		board = best_sellers(None)
+		self.assertEqual(board['units'][0], (self.game.pk, self.other_category.pk, 7, 140.0))
+
+	def test_categories_and_size(self):
+		self.sell(self.book, 1)
+		self.sell(self.pen, 2)
+		self.sell(self.game, 3)
+		board = best_sellers(7, size=2, today=self.today)
+		self.assertEqual(self.ranked(board), [self.game.pk, self.pen.pk])
+		self.assertEqual(self.ranked(board['categories'][self.category.pk]), [self.pen.pk, self.book.pk])
+		self.assertEqual(self.ranked(board['categories'][self.other_category.pk]), [self.game.pk])
+
+	def test_boards_are_cached_until_refreshed(self):
+		self.sell(self.book, 1)
+		self.assertEqual(self.ranked(leaderboard_cache.get(7)), [self.book.pk])
+		self.sell(self.pen, 2)
+		with self.assertNumQueries(0):
+			self.assertEqual(self.ranked(leaderboard_cache.get(7)), [self.book.pk])
+		leaderboard_cache.reset()
+		self.assertEqual(self.ranked(leaderboard_cache.get(7)), [self.pen.pk, self.book.pk])
+
+	def test_page(self):
+		self.sell(self.book, 1)
+		self.sell(self.game, 2, days_ago=10)
+		self.log_in('productinfo.view_product')
+		url = reverse('productinfo_best_sellers_urlpattern')
+		response = self.client.get(url, {'days': 7})
+		self.assertEqual([row['product'].pk for row in response.context['by_units']], [self.book.pk])
+		response = self.client.get(url, {'category': self.other_category.pk})
+		self.assertEqual(response.context['days'], None)
+		self.assertEqual([row['product'].pk for row in response.context['by_units']], [self.game.pk])
+		# Windows other than the listed ones fall back to all time.
+		self.assertIsNone(self.client.get(url, {'days': 12}).context['days'])
@@ -0,0 +1,53 @@
+from django.test import override_settings
+
+from productinfo.caches import lookup_cache
+from productinfo.forms import ProductForm
+from productinfo.models import Category, Product
+from productinfo.tests.base import ProductinfoTestCase
+from productinfo.versions import bump_version
+
+
+@override_settings(LOOKUP_CACHE={'CHECK_INTERVAL': 0, 'MAX_AGE': 300})
+class LookupCacheTests(ProductinfoTestCase):
+	def test_related_lookups_run_no_queries(self):
+		lookup_cache.table(Category)
+		product = Product.objects.get(pk=self.book.pk)
+		with self.assertNumQueries(0):
+			self.assertEqual(product.category_id.category_name, 'Books')
+			choices = [label for value, label in ProductForm().fields['category_id'].choices]
+		self.assertEqual(choices, ['---------', 'Books', 'Games'])
+		self.assertEqual((lookup_cache.hits, lookup_cache.misses), (2, 1))
+
+	def test_callers_get_copies(self):
+		category = Product.objects.get(pk=self.book.pk).category_id
+		category.category_name = 'Changed'
+		self.assertEqual(lookup_cache.get(Category, self.category.pk).category_name, 'Books')
+
+	def test_a_write_here_reloads_the_table(self):
+		lookup_cache.table(Category)
+		with self.captureOnCommitCallbacks(execute=True):
+			category = Category.objects.get(pk=self.category.pk)
+			category.category_name = 'Paper'
+			category.save()
+		self.assertEqual(lookup_cache.get(Category, self.category.pk).category_name, 'Paper')
+
+	def test_a_stamp_moved_elsewhere_reloads_the_table(self):
+		lookup_cache.table(Category)
+		Category.objects.filter(pk=self.category.pk).update(category_name='Paper')
+		with self.assertNumQueries(0):
+			self.assertEqual(lookup_cache.get(Category, self.category.pk).category_name, 'Books')
+		# What LookupCache.changed() in another process leaves behind here.
+		bump_version('category')
+		with self.assertNumQueries(1):
+			self.assertEqual(lookup_cache.get(Category, self.category.pk).category_name, 'Paper')
+
+	@override_settings(LOOKUP_CACHE={'CHECK_INTERVAL': 60, 'MAX_AGE': 0})
+	def test_tables_are_reloaded_after_max_age(self):
+		lookup_cache.table(Category)
+		with self.assertNumQueries(1):
+			lookup_cache.table(Category)
+
+	def test_unknown_pk_is_rejected_by_the_form(self):
+		form = ProductForm({'product_name': 'Ink', 'product_price': 1.0, 'stock_num': 1, 'category_id': 0})
+		self.assertFalse(form.is_valid())
+		self.assertIn('category_id', form.errors)
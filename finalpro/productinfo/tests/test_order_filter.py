@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from productinfo.tests.base import DAY, ProductinfoTestCase
+
+
+class OrderDateFilterTests(ProductinfoTestCase):
+	url = reverse('productinfo_order_list_urlpattern')
+
+	def setUp(self):
+		super().setUp()
+		self.log_in('productinfo.view_order')
+
+	def listed(self, params):
+		response = self.client.get(self.url, params)
+		self.assertEqual(response.status_code, 200)
+		return response, [order.pk for order in response.context['object_list']]
+
+	def test_start_and_end_are_inclusive_days(self):
+		orders = [self.create_order(DAY + timedelta(days=offset)) for offset in (-1, 0, 1)]
+		response, listed = self.listed({'start': DAY.date(), 'end': DAY.date()})
+		self.assertEqual(listed, [orders[1].pk])
+		response, listed = self.listed({'start': DAY.date()})
+		self.assertEqual(listed, [orders[1].pk, orders[2].pk])
+
+	def test_last_n_days(self):
+		now = timezone.now()
+		old = self.create_order(now - timedelta(days=10))
+		recent = self.create_order(now - timedelta(days=2))
+		response, listed = self.listed({'days': 7})
+		self.assertEqual(listed, [recent.pk])
+		response, listed = self.listed({'days': 30})
+		self.assertEqual(listed, [old.pk, recent.pk])
+
+	def test_extreme_values_do_not_fail(self):
+		order = self.create_order()
+		for params in ({'days': 99999999999}, {'days': 0}, {'end': date.max}, {'start': date.min}):
+			with self.subTest(params=params):
+				response, listed = self.listed(params)
+				self.assertEqual(listed, [order.pk])
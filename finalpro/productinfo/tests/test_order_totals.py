@@ -0,0 +1,34 @@
+from productinfo.models import Order_Product
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class OrderTotalsTests(ProductinfoTestCase):
+	def test_line_writes_recount_totals(self):
+		order = self.create_order()
+		other = self.create_order()
+		line = Order_Product.objects.create(order_id=order, product_id=self.book, quantity=2, price=10.0)
+		Order_Product.objects.create(order_id=order, product_id=self.pen, quantity=1, price=2.5)
+		self.assertTotalsStored(order, other)
+
+		line.quantity = 5
+		line.save()
+		self.assertTotalsStored(order, other)
+
+		line.order_id = other
+		line.save()
+		self.assertTotalsStored(order, other)
+
+		line.delete()
+		self.assertTotalsStored(order, other)
+
+	def test_stale_line_does_not_drift_totals(self):
+		order = self.create_order()
+		other = self.create_order()
+		line = Order_Product.objects.create(order_id=order, product_id=self.book, quantity=2, price=10.0)
+		stale = Order_Product.objects.get(pk=line.pk)
+		line.order_id = other
+		line.save()
+		# Loaded before the move; saving it moves the line back.
+		stale.quantity = 3
+		stale.save()
+		self.assertTotalsStored(order, other)
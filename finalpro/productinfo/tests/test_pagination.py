@@ -0,0 +1,54 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from django.test import RequestFactory
+from django.urls import reverse
+
+from productinfo.models import Order
+from productinfo.tests.base import DAY, ProductinfoTestCase
+from productinfo.utils import SeekPaginationMixin
+
+
+class OrderPage(SeekPaginationMixin):
+	model = Order
+
+
+class CursorPaginationTests(ProductinfoTestCase):
+	def page(self, query, size=2):
+		view = OrderPage()
+		view.request = RequestFactory().get('/order/', dict(parse_qs(query), size=size))
+		return view.keyset_page(Order.objects.order_by(*view.get_ordering()), size)
+
+	def test_pages_split_inside_a_millisecond(self):
+		orders = [self.create_order(DAY + timedelta(microseconds=n)) for n in range(5)]
+		seen = []
+		page = self.page('')
+		seen.extend(page.object_list)
+		while page.has_next():
+			page = self.page(page.next_query)
+			seen.extend(page.object_list)
+		self.assertEqual([order.pk for order in seen], [order.pk for order in orders])
+
+	def test_going_back_knows_about_the_next_page(self):
+		orders = [self.create_order(DAY + timedelta(microseconds=n)) for n in range(5)]
+		page = self.page(self.page('').next_query)
+		page = self.page(page.previous_query)
+		self.assertEqual([order.pk for order in page.object_list], [order.pk for order in orders[:2]])
+		self.assertTrue(page.has_next())
+		self.assertFalse(page.has_previous())
+
+	def test_invalid_cursors_give_the_first_page(self):
+		orders = [self.create_order(DAY + timedelta(minutes=n)) for n in range(3)]
+		self.log_in('productinfo.view_order')
+		url = reverse('productinfo_order_list_urlpattern')
+		for values in ([{}, 1], [[1], 1], [None, None], [DAY.isoformat()], 'x', [True, {}]):
+			cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+			for kwarg in ('after', 'before'):
+				with self.subTest(values=values, kwarg=kwarg):
+					response = self.client.get(url, {kwarg: cursor})
+					self.assertEqual(response.status_code, 200)
+					self.assertEqual([order.pk for order in response.context['object_list']],
+									 [order.pk for order in orders])
+		self.assertEqual(self.client.get(url, {'after': '%%%'}).status_code, 200)
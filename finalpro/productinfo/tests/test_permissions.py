@@ -0,0 +1,53 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.urls import reverse
+
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class PermissionSnapshotTests(ProductinfoTestCase):
+	url = reverse('productinfo_product_list_urlpattern')
+
+	def setUp(self):
+		super().setUp()
+		self.group = Group.objects.create(name='clerks')
+		self.view_product = Permission.objects.get(content_type__app_label='productinfo', codename='view_product')
+		self.user = self.log_in()
+		self.user.groups.add(self.group)
+
+	def status(self):
+		return self.client.get(self.url).status_code
+
+	def test_snapshot_needs_no_auth_queries(self):
+		self.group.permissions.add(self.view_product)
+		self.assertEqual(self.status(), 200)
+		user = User.objects.get(pk=self.user.pk)
+		with self.assertNumQueries(0):
+			self.assertTrue(user.has_perm('productinfo.view_product'))
+
+	def test_group_permission_changes_are_seen(self):
+		self.assertEqual(self.status(), 403)
+		self.group.permissions.add(self.view_product)
+		self.assertEqual(self.status(), 200)
+		self.group.permissions.remove(self.view_product)
+		self.assertEqual(self.status(), 403)
+
+	def test_membership_changes_are_seen(self):
+		self.group.permissions.add(self.view_product)
+		self.assertEqual(self.status(), 200)
+		# From the group's side, which doesn't say whose membership changed.
+		self.group.user_set.clear()
+		self.assertEqual(self.status(), 403)
+		self.group.user_set.add(self.user)
+		self.assertEqual(self.status(), 200)
+
+	def test_user_permission_changes_are_seen(self):
+		self.assertEqual(self.status(), 403)
+		self.user.user_permissions.add(self.view_product)
+		self.assertEqual(self.status(), 200)
+
+	def test_deactivated_user_is_logged_out(self):
+		self.user.user_permissions.add(self.view_product)
+		self.assertEqual(self.status(), 200)
+		self.user.is_active = False
+		self.user.save()
+		self.assertEqual(self.status(), 302)
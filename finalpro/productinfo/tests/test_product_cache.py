@@ -0,0 +1,64 @@
+from django.test import override_settings
+
+from productinfo.caches import product_cache
+from productinfo.models import Cart_Item, Product, Shopping_Cart
+from productinfo.reservations import hold_stock
+from productinfo.tests.base import ProductinfoTestCase
+from productinfo.versions import bump_version
+
+
+@override_settings(PRODUCT_CACHE={'CHECK_INTERVAL': 0, 'STATS_LOG_INTERVAL': None})
+class ProductCacheTests(ProductinfoTestCase):
+	def test_read_through(self):
+		with self.assertNumQueries(1):
+			product = product_cache.get(self.book.pk)
+		self.assertEqual(product.category_id.category_name, 'Books')
+		with self.assertNumQueries(0):
+			again = product_cache.get(self.book.pk)
+			self.assertEqual(again.category_id.category_name, 'Books')
+		# Every caller gets its own copy.
+		again.product_name = 'Changed'
+		self.assertEqual(product_cache.get(self.book.pk).product_name, 'Book')
+		self.assertIsNone(product_cache.get(0))
+
+	def test_get_many_reads_the_missing_ones_together(self):
+		product_cache.get(self.book.pk)
+		with self.assertNumQueries(1):
+			products = product_cache.get_many([self.book.pk, self.pen.pk, 0])
+		self.assertEqual(sorted(products), [self.book.pk, self.pen.pk])
+		self.assertEqual(product_cache.stats()['hits'], 1)
+
+	def test_a_write_drops_only_that_product(self):
+		product_cache.get_many([self.book.pk, self.pen.pk])
+		product = Product.objects.get(pk=self.book.pk)
+		product.product_price = 12.0
+		product.save()
+		with self.assertNumQueries(1):
+			products = product_cache.get_many([self.book.pk, self.pen.pk])
+		self.assertEqual(products[self.book.pk].product_price, 12.0)
+
+	def test_a_stamp_moved_by_another_process_drops_the_entry(self):
+		product_cache.get_many([self.book.pk, self.pen.pk])
+		Product.objects.filter(pk=self.pen.pk).update(product_price=3.0)
+		# What invalidate() in another process leaves behind here.
+		bump_version(product_cache.stamp(self.pen.pk))
+		with self.assertNumQueries(1):
+			self.assertEqual(product_cache.get(self.pen.pk).product_price, 3.0)
+		with self.assertNumQueries(0):
+			product_cache.get(self.book.pk)
+
+	def test_a_hold_keeps_other_products_cached(self):
+		product_cache.get_many([self.book.pk, self.pen.pk])
+		cart = Shopping_Cart.objects.create(customer_id=self.customer, sm_id=self.sm, pm_id=self.pm)
+		with self.captureOnCommitCallbacks(execute=True):
+			hold_stock(Cart_Item.objects.create(cart_id=cart, product_id=self.book, quantity=3))
+		with self.assertNumQueries(0):
+			product_cache.get(self.pen.pk)
+		self.assertEqual(product_cache.get(self.book.pk).stock_num, 7)
+
+	@override_settings(PRODUCT_CACHE={'STATS_LOG_INTERVAL': 0})
+	def test_stats_are_logged(self):
+		product_cache.reset()
+		with self.assertLogs('productinfo.caches', 'INFO') as logs:
+			product_cache.get(self.book.pk)
+		self.assertIn("'misses': 1", logs.output[0])
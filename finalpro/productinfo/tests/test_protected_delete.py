@@ -0,0 +1,46 @@
+from django.urls import reverse
+
+from productinfo.models import Customer
+from productinfo.tests.base import ProductinfoTestCase
+from productinfo.utils import protected_dependencies
+
+
+class ProtectedDeleteTests(ProductinfoTestCase):
+	def blockers(self, obj, preview=10):
+		return {blocker.label: blocker for blocker in protected_dependencies(obj, preview)}
+
+	def test_counts_and_capped_previews(self):
+		for _ in range(12):
+			self.create_order()
+		# One query for every count, and a preview only for relations with rows.
+		with self.assertNumQueries(2):
+			blockers = self.blockers(self.customer, preview=5)
+		orders = blockers['orders']
+		self.assertEqual((orders.count, len(orders.preview), orders.remaining), (12, 5, 7))
+		carts = blockers['shopping carts']
+		self.assertEqual((carts.exists, carts.preview), (False, []))
+
+	def test_delete_is_refused_while_protected(self):
+		self.log_in('productinfo.delete_customer')
+		for _ in range(12):
+			self.create_order()
+		url = reverse('productinfo_customer_delete_urlpattern', kwargs={'pk': self.customer.pk})
+		response = self.client.get(url)
+		self.assertTemplateUsed(response, 'productinfo/customer_refuse_delete.html')
+		self.assertEqual([blocker.label for blocker in response.context['blockers']], ['orders'])
+		self.assertContains(response, '12 orders:')
+		self.assertContains(response, 'and 2 more')
+		response = self.client.post(url)
+		self.assertTemplateUsed(response, 'productinfo/customer_refuse_delete.html')
+		self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+
+	def test_unreferenced_object_is_deleted(self):
+		self.log_in('productinfo.delete_customer')
+		customer = Customer.objects.create(
+			first_name='Bo', last_name='Kim', username='bo', password='x', email='bo@example.com',
+			sm_id=self.sm, pm_id=self.pm,
+		)
+		url = reverse('productinfo_customer_delete_urlpattern', kwargs={'pk': customer.pk})
+		self.assertTemplateNotUsed(self.client.get(url), 'productinfo/customer_refuse_delete.html')
+		self.assertEqual(self.client.post(url).status_code, 302)
+		self.assertFalse(Customer.objects.filter(pk=customer.pk).exists())
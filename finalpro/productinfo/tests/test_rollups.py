@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from productinfo.models import Daily_Category_Sales, Order, Order_Product, Product
+from productinfo.rollups import rebuild_days, sales_day
+from productinfo.tests.base import DAY, ProductinfoTestCase
+
+
+class CategoryMoveTests(ProductinfoTestCase):
+	def category_rows(self, day):
+		return sorted(
+			Daily_Category_Sales.objects.filter(day=day, lines__gt=0)
+			.values_list('category_id', 'lines', 'units', 'revenue')
+		)
+
+	def test_category_change_moves_sales(self):
+		order = self.create_order()
+		Order_Product.objects.create(order_id=order, product_id=self.book, quantity=2, price=10.0)
+		Order_Product.objects.create(order_id=order, product_id=self.pen, quantity=1, price=2.5)
+		product = Product.objects.get(pk=self.book.pk)
+		product.category_id = self.other_category
+		product.save()
+
+		day = sales_day(order.order_date)
+		moved = self.category_rows(day)
+		self.assertEqual(moved, [(self.category.pk, 1, 1, 2.5), (self.other_category.pk, 1, 2, 20.0)])
+		rebuild_days(day, day)
+		self.assertEqual(self.category_rows(day), moved)
+
+	def test_stale_order_moves_from_the_stored_day(self):
+		order = self.create_order()
+		Order_Product.objects.create(order_id=order, product_id=self.book, quantity=2, price=10.0)
+		stale = Order.objects.get(pk=order.pk)
+		order.order_date = DAY - timedelta(days=1)
+		order.save()
+		stale.order_date = DAY + timedelta(days=1)
+		stale.save()
+
+		days = [sales_day(DAY + timedelta(days=offset)) for offset in (-1, 0, 1)]
+		moved = [self.category_rows(day) for day in days]
+		self.assertEqual(moved, [[], [], [(self.category.pk, 1, 2, 20.0)]])
+		rebuild_days(days[0], days[-1])
+		self.assertEqual([self.category_rows(day) for day in days], moved)
@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth.models import Permission
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from productinfo.middleware import ReplicaRoutingMiddleware
+from productinfo.models import Product
+from productinfo.routers import (
+	PIN_SESSION_KEY, ReplicaRouter, RequestRouting, choose_replica, replica_versions, routing, sync_stamps,
+)
+from productinfo.tests.base import ProductinfoTestCase
+from productinfo.versions import bump_version, get_version
+from productinfo.views import ProductCreate, ProductList
+
+REPLICAS = {'ALIASES': ['replica'], 'PIN_SECONDS': 10, 'SYNC_CHECK_INTERVAL': 3600}
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(ProductinfoTestCase):
+	def setUp(self):
+		super().setUp()
+		self.addCleanup(sync_stamps.reset)
+
+	def synced(self, stamp):
+		# What refresh_replicas leaves in the replica, without connecting to it.
+		sync_stamps.stamps['replica'] = (time.monotonic(), stamp)
+
+	def synced_after(self, view_class):
+		self.synced(max(get_version(name) for name in replica_versions(view_class)) + 1)
+
+	def test_only_a_replica_copied_after_the_last_write_is_chosen(self):
+		self.synced(max(get_version('product'), get_version('category')) + 1)
+		self.assertEqual(choose_replica(['product', 'category']), 'replica')
+		bump_version('product')
+		self.assertIsNone(choose_replica(['product', 'category']))
+		self.synced(None)
+		self.assertIsNone(choose_replica(['product']))
+
+	def test_router_sends_reads_to_the_request_replica(self):
+		router = ReplicaRouter()
+		self.assertEqual(router.db_for_read(Product), DEFAULT_DB_ALIAS)
+		state = RequestRouting('replica')
+		token = routing.set(state)
+		try:
+			self.assertEqual(router.db_for_read(Product), 'replica')
+			self.assertIsNone(router.db_for_read(Permission))
+			self.assertEqual(router.db_for_write(Product), DEFAULT_DB_ALIAS)
+			self.assertTrue(state.wrote)
+		finally:
+			routing.reset(token)
+
+	def process_view(self, view_class, method='get', session=None):
+		request = getattr(RequestFactory(), method)('/')
+		request.session = session or {}
+		state = RequestRouting()
+		token = routing.set(state)
+		try:
+			ReplicaRoutingMiddleware(lambda request: HttpResponse()).process_view(
+				request, view_class.as_view(), (), {})
+		finally:
+			routing.reset(token)
+		return state.replica
+
+	def test_only_list_and_detail_reads_are_routed(self):
+		self.synced_after(ProductList)
+		self.assertEqual(self.process_view(ProductList), 'replica')
+		self.assertIsNone(self.process_view(ProductList, 'post'))
+		self.assertIsNone(self.process_view(ProductCreate))
+
+	def test_a_write_pins_the_session_to_the_primary(self):
+		self.log_in('productinfo.add_product')
+		response = self.client.post(reverse('productinfo_product_create_urlpattern'), {
+			'product_name': 'Ink', 'product_price': 1.5, 'stock_num': 4, 'category_id': self.category.pk,
+		})
+		self.assertEqual(response.status_code, 302)
+		pinned_until = self.client.session[PIN_SESSION_KEY]
+		self.assertGreater(pinned_until, time.time())
+		# Even once the replica has the write, the session reads the primary until the pin runs out.
+		self.synced_after(ProductList)
+		self.assertIsNone(self.process_view(ProductList, session={PIN_SESSION_KEY: pinned_until}))
+		self.assertEqual(self.process_view(ProductList, session={PIN_SESSION_KEY: time.time() - 1}), 'replica')
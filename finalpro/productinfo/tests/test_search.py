@@ -0,0 +1,63 @@
+from django.db import connection
+from django.urls import reverse
+
+from productinfo.models import Category, Product, Product_Search
+from productinfo.search import fts_query, rebuild_search_index, search_products
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class ProductSearchTests(ProductinfoTestCase):
+	def names(self, text):
+		return [product.product_name for product in search_products(text)]
+
+	def add(self, name, category):
+		return Product.objects.create(product_name=name, product_price=1.0, stock_num=1, category_id=category)
+
+	def test_words_match_as_prefixes(self):
+		self.add('Blue Shirt', self.other_category)
+		self.assertEqual(self.names('blue sh'), ['Blue Shirt'])
+		self.assertEqual(self.names('PE'), ['Pen'])
+		self.assertEqual(self.names('shirt pen'), [])
+		self.assertEqual(self.names(''), [])
+
+	def test_category_text_is_searched(self):
+		self.assertEqual(sorted(self.names('books')), ['Book', 'Pen'])
+
+	def test_better_matches_rank_first(self):
+		self.add('Chess', self.other_category)
+		self.add('Games Console Games Edition', self.other_category)
+		self.assertEqual(self.names('games'), ['Games Console Games Edition', 'Chess'])
+
+	def test_operators_in_the_input_are_inert(self):
+		self.assertEqual(fts_query('pen OR "book'), '"pen"* "OR"* "book"*')
+		self.assertEqual(self.names('pen OR book'), [])
+		self.assertEqual(self.names('product_name: pen'), [])
+		self.assertEqual(self.names('NEAR(pen'), [])
+
+	def test_index_follows_writes(self):
+		product = Product.objects.get(pk=self.book.pk)
+		product.product_name = 'Atlas'
+		product.save()
+		self.assertEqual(self.names('atl'), ['Atlas'])
+
+		category = Category.objects.get(pk=self.category.pk)
+		category.category_name = 'Stationery'
+		category.category_description = 'Paper and pens'
+		category.save()
+		self.assertEqual(sorted(self.names('station')), ['Atlas', 'Pen'])
+		self.assertEqual(self.names('book'), [])
+
+		Product.objects.filter(pk=self.pen.pk).delete()
+		self.assertEqual(self.names('station'), ['Atlas'])
+
+	def test_rebuild(self):
+		with connection.cursor() as cursor:
+			cursor.execute(f'DELETE FROM {Product_Search._meta.db_table}')
+		self.assertEqual(self.names('pen'), [])
+		self.assertEqual(rebuild_search_index(batch_size=1), 2)
+		self.assertEqual(self.names('pen'), ['Pen'])
+
+	def test_search_page(self):
+		self.log_in('productinfo.view_product')
+		response = self.client.get(reverse('productinfo_product_search_urlpattern'), {'q': 'pe'})
+		self.assertEqual([product.product_name for product in response.context['object_list']], ['Pen'])
@@ -0,0 +1,61 @@
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from productinfo.models import Category
+from productinfo.sqlite import profile_pragmas, sqlite_profile_settings, write_atomic
+from productinfo.tests.base import TEST_CACHES
+
+PROFILE = {'ENABLED': True, 'TRANSACTION_MODE': 'IMMEDIATE'}
+
+
+@override_settings(CACHES=TEST_CACHES, READ_REPLICAS={'ALIASES': []}, SQLITE_PROFILE=PROFILE)
+class WriteAtomicTests(TransactionTestCase):
+	def statements(self, queries):
+		return [query['sql'] for query in queries.captured_queries]
+
+	def test_outermost_block_begins_immediate(self):
+		with CaptureQueriesContext(connection) as queries:
+			with write_atomic():
+				self.assertTrue(connection.in_atomic_block)
+				Category.objects.create(category_name='Books', category_description='Books')
+				with write_atomic():
+					Category.objects.create(category_name='Games', category_description='Games')
+		statements = self.statements(queries)
+		self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+		self.assertEqual(statements.count('BEGIN IMMEDIATE'), 1)
+		# The nested block is a savepoint in the same transaction.
+		self.assertTrue(any(statement.startswith('SAVEPOINT') for statement in statements))
+		self.assertTrue(connection.get_autocommit())
+		self.assertFalse(connection.in_atomic_block)
+		self.assertEqual(Category.objects.count(), 2)
+
+	def test_error_rolls_back(self):
+		with self.assertRaises(ValueError):
+			with write_atomic():
+				Category.objects.create(category_name='Books', category_description='Books')
+				raise ValueError
+		self.assertTrue(connection.get_autocommit())
+		self.assertFalse(Category.objects.exists())
+
+	def test_inside_atomic_it_is_a_savepoint(self):
+		with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+			with write_atomic():
+				Category.objects.create(category_name='Books', category_description='Books')
+		self.assertNotIn('BEGIN IMMEDIATE', self.statements(queries))
+
+	@override_settings(SQLITE_PROFILE={'ENABLED': True, 'TRANSACTION_MODE': None})
+	def test_without_a_mode_it_is_plain_atomic(self):
+		with CaptureQueriesContext(connection) as queries:
+			with write_atomic():
+				Category.objects.create(category_name='Books', category_description='Books')
+		self.assertNotIn('BEGIN IMMEDIATE', self.statements(queries))
+		self.assertEqual(Category.objects.count(), 1)
+
+
+class ProfilePragmaTests(SimpleTestCase):
+	@override_settings(SQLITE_PROFILE={'SYNCHRONOUS': None, 'TEMP_STORE': 'FILE'})
+	def test_unset_pragmas_are_skipped(self):
+		pragmas = profile_pragmas(sqlite_profile_settings())
+		self.assertNotIn('synchronous', ' '.join(pragmas))
+		self.assertIn('PRAGMA temp_store = FILE', pragmas)
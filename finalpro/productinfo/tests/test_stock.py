@@ -0,0 +1,98 @@
+import io
+
+from productinfo.forms import ProductForm
+from productinfo.importers import import_products, read_rows
+from productinfo.models import Cart_Item, Product, Shopping_Cart
+from productinfo.reservations import adjust_stock, claim_stock_versions, hold_stock
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class StockEditTests(ProductinfoTestCase):
+	def form_data(self, product, **changes):
+		data = {
+			'product_name': product.product_name,
+			'product_price': product.product_price,
+			'stock_num': product.stock_num,
+			'category_id': product.category_id_id,
+			'loaded_stock_version': product.stock_version,
+		}
+		data.update(changes)
+		return data
+
+	def test_stale_form_does_not_overwrite_stock(self):
+		product = Product.objects.get(pk=self.book.pk)
+		data = self.form_data(product, stock_num=50)
+		adjust_stock(product.pk, -4)
+		form = ProductForm(data, instance=Product.objects.get(pk=product.pk))
+		self.assertFalse(form.is_valid())
+		self.assertTrue(form.non_field_errors())
+		self.assertEqual(Product.objects.get(pk=product.pk).stock_num, 6)
+
+	def test_stale_form_can_be_saved_again(self):
+		product = Product.objects.get(pk=self.book.pk)
+		data = self.form_data(product, stock_num=50)
+		adjust_stock(product.pk, -4)
+		form = ProductForm(data, instance=Product.objects.get(pk=product.pk))
+		self.assertFalse(form.is_valid())
+		# The redisplayed form carries the version it was checked against.
+		current = Product.objects.get(pk=product.pk)
+		self.assertEqual(form['loaded_stock_version'].value(), current.stock_version)
+		self.assertEqual(form.data['loaded_stock_version'], product.stock_version)
+
+		form = ProductForm(dict(data, loaded_stock_version=form['loaded_stock_version'].value()), instance=current)
+		self.assertTrue(form.is_valid(), form.errors)
+		form.save()
+		self.assertEqual(Product.objects.get(pk=product.pk).stock_num, 50)
+
+	def test_current_form_saves(self):
+		product = Product.objects.get(pk=self.book.pk)
+		form = ProductForm(self.form_data(product, stock_num=50), instance=product)
+		self.assertTrue(form.is_valid(), form.errors)
+		form.save()
+		self.assertEqual(Product.objects.get(pk=product.pk).stock_num, 50)
+
+
+class StockImportTests(ProductinfoTestCase):
+	def import_stock(self, stock_num):
+		data = f'product_name,product_price,stock_num,category_name\nBook,10.0,{stock_num},Books\n'
+		return import_products(read_rows(io.BytesIO(data.encode()), 'csv'))
+
+	def hold(self, quantity):
+		cart = Shopping_Cart.objects.create(customer_id=self.customer, sm_id=self.sm, pm_id=self.pm)
+		hold_stock(Cart_Item.objects.create(cart_id=cart, product_id=self.book, quantity=quantity))
+
+	def test_import_sets_available_stock(self):
+		# The same meaning as the product form: held units are already out.
+		self.hold(3)
+		self.assertEqual(Product.objects.get(pk=self.book.pk).stock_num, 7)
+		result = self.import_stock(20)
+		self.assertEqual(result.updated, 1)
+		self.assertEqual(Product.objects.get(pk=self.book.pk).stock_num, 20)
+
+	def test_import_moves_the_stock_version_on(self):
+		product = Product.objects.get(pk=self.book.pk)
+		self.import_stock(20)
+		form = ProductForm(
+			{'product_name': 'Book', 'product_price': 10.0, 'stock_num': 5, 'category_id': self.category.pk,
+			 'loaded_stock_version': product.stock_version},
+			instance=Product.objects.get(pk=product.pk),
+		)
+		self.assertFalse(form.is_valid())
+
+
+class ClaimStockVersionsTests(ProductinfoTestCase):
+	def versions(self):
+		return dict(Product.objects.values_list('pk', 'stock_version'))
+
+	def test_claims_current_versions(self):
+		before = self.versions()
+		self.assertEqual(claim_stock_versions(before), [])
+		self.assertEqual(self.versions(), {pk: version + 1 for pk, version in before.items()})
+
+	def test_stale_versions_are_left_alone(self):
+		before = self.versions()
+		loaded = {self.book.pk: before[self.book.pk], self.pen.pk: before[self.pen.pk] - 1, 0: 0}
+		self.assertEqual(sorted(claim_stock_versions(loaded)), [0, self.pen.pk])
+		after = self.versions()
+		self.assertEqual(after[self.book.pk], before[self.book.pk] + 1)
+		self.assertEqual(after[self.pen.pk], before[self.pen.pk])
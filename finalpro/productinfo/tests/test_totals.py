@@ -0,0 +1,23 @@
+from productinfo.models import Cart_Item, Order_Product, Product, Shopping_Cart
+from productinfo.tests.base import ProductinfoTestCase
+
+
+class LineItemTotalsTests(ProductinfoTestCase):
+	def test_with_subtotal(self):
+		order = self.create_order()
+		Order_Product.objects.create(order_id=order, product_id=self.book, quantity=3, price=9.5)
+		line = order.order_products.with_subtotal().get()
+		self.assertAlmostEqual(line.sub_total, 28.5)
+
+	def test_total(self):
+		order = self.create_order()
+		Order_Product.objects.create(order_id=order, product_id=self.book, quantity=3, price=9.5)
+		Order_Product.objects.create(order_id=order, product_id=self.pen, quantity=2, price=2.0)
+		self.assertAlmostEqual(order.order_products.total(), 32.5)
+		self.assertEqual(self.create_order().order_products.total(), 0.0)
+
+	def test_cart_items_use_current_price(self):
+		cart = Shopping_Cart.objects.create(customer_id=self.customer, sm_id=self.sm, pm_id=self.pm)
+		Cart_Item.objects.create(cart_id=cart, product_id=self.pen, quantity=4)
+		Product.objects.filter(pk=self.pen.pk).update(product_price=3.0)
+		self.assertAlmostEqual(cart.cart_items.total(), 12.0)
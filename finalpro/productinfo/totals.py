@@ -0,0 +1,62 @@
+import math
+
+from django.db.models import Count, F, FloatField, Sum
+
+from productinfo.models import Order, Order_Product
+from productinfo.sqlite import write_atomic
+from productinfo.versions import bump_version
+
+
+def rebuild_order_totals(batch_size=1000, verify=False, on_stale=None, progress=None):
+	"""
+	Recompute Order.total_price and Order.line_count from the order lines,
+	batch_size orders per transaction, and store the ones that are stale
+	(or only report them to on_stale when verify is set). progress is called
+	with the number of orders checked so far. Returns (checked, stale).
+	"""
+	checked = stale = 0
+	last_pk = 0
+
+	while True:
+		# Read and write each batch in one transaction so concurrent line
+		# edits can't interleave between the aggregate and the update.
+		with write_atomic():
+			orders = list(
+				Order.objects.filter(pk__gt=last_pk)
+				.order_by('pk')
+				.only('pk', 'total_price', 'line_count')[:batch_size]
+			)
+			if not orders:
+				break
+			last_pk = orders[-1].pk
+
+			totals = {
+				row['order_id']: row
+				for row in Order_Product.objects
+				.filter(order_id__in=[order.pk for order in orders])
+				.order_by()
+				.values('order_id')
+				.annotate(total=Sum(F('quantity') * F('price'), output_field=FloatField()), count=Count('pk'))
+			}
+
+			changed = []
+			for order in orders:
+				row = totals.get(order.pk, {'total': 0.0, 'count': 0})
+				if order.line_count != row['count'] or not math.isclose(
+						order.total_price, row['total'], rel_tol=1e-9, abs_tol=1e-6):
+					if on_stale is not None:
+						on_stale(order, row)
+					order.total_price = row['total']
+					order.line_count = row['count']
+					changed.append(order)
+
+			if changed and not verify:
+				Order.objects.bulk_update(changed, ['total_price', 'line_count'])
+		checked += len(orders)
+		stale += len(changed)
+		if progress is not None:
+			progress(checked)
+
+	if stale and not verify:
+		bump_version('order')
+	return checked, stale
@@ -1,4 +1,6 @@
 from django.urls import path
+from productinfo import async_views
+from productinfo.api import ProductApiList, ProductApiDetail
 from productinfo.views import (
     CustomerList,
     ProductList,
@@ -25,12 +27,24 @@ from productinfo.views import (
     OrderUpdate,
     OrderProductUpdate,
     ProductDelete,
+    ProductImport,
+    ProductSearch,
     CartItemDelete,
     ShoppingCartDelete,
+    ShoppingCartCheckout,
     CustomerDelete,
     OrderProductDelete,
     OrderDelete,
-
+    OrderExport,
+    OrderExportJob,
+    OrderTotalsJob,
+    ProductImportJob,
+    ProductSearchJob,
+    JobList,
+    JobDetail,
+    JobDownload,
+    SalesReport,
+    BestSellers,
 )
 
 urlpatterns = [
@@ -59,6 +73,26 @@ urlpatterns = [
          ProductList.as_view(),
          name='productinfo_product_list_urlpattern'),
 
+    path('product/import/',
+         ProductImport.as_view(),
+         name='productinfo_product_import_urlpattern'),
+
+    path('product/import/job/',
+         ProductImportJob.as_view(),
+         name='productinfo_product_import_job_urlpattern'),
+
+    path('product/search/',
+         ProductSearch.as_view(),
+         name='productinfo_product_search_urlpattern'),
+
+    path('product/best-sellers/',
+         BestSellers.as_view(),
+         name='productinfo_best_sellers_urlpattern'),
+
+    path('product/search/job/',
+         ProductSearchJob.as_view(),
+         name='productinfo_product_search_job_urlpattern'),
+
     path('product/<int:pk>/',
          ProductDetail.as_view(),
          name='productinfo_product_detail_urlpattern'),
@@ -95,6 +129,10 @@ urlpatterns = [
          ShoppingCartDelete.as_view(),
          name='productinfo_shoppingcart_delete_urlpattern'),
 
+    path('shoppingcart/<int:pk>/checkout/',
+         ShoppingCartCheckout.as_view(),
+         name='productinfo_shoppingcart_checkout_urlpattern'),
+
     path('cartitem/',
          CartItemList.as_view(),
          name='productinfo_cart_item_list_urlpattern'),
@@ -119,6 +157,18 @@ urlpatterns = [
          OrderList.as_view(),
          name='productinfo_order_list_urlpattern'),
 
+    path('order/export/',
+         OrderExport.as_view(),
+         name='productinfo_order_export_urlpattern'),
+
+    path('order/export/job/',
+         OrderExportJob.as_view(),
+         name='productinfo_order_export_job_urlpattern'),
+
+    path('order/totals/job/',
+         OrderTotalsJob.as_view(),
+         name='productinfo_order_totals_job_urlpattern'),
+
     path('order/<int:pk>/',
          OrderDetail.as_view(),
          name='productinfo_order_detail_urlpattern'),
@@ -155,4 +205,52 @@ urlpatterns = [
          OrderProductDelete.as_view(),
          name='productinfo_orderproduct_delete_urlpattern'),
 
+    path('api/products/',
+         ProductApiList.as_view(),
+         name='productinfo_api_product_list_urlpattern'),
+
+    path('api/products/<int:pk>/',
+         ProductApiDetail.as_view(),
+         name='productinfo_api_product_detail_urlpattern'),
+
+    path('reports/sales/',
+         SalesReport.as_view(),
+         name='productinfo_sales_report_urlpattern'),
+
+    path('jobs/',
+         JobList.as_view(),
+         name='productinfo_job_list_urlpattern'),
+
+    path('jobs/<int:pk>/',
+         JobDetail.as_view(),
+         name='productinfo_job_detail_urlpattern'),
+
+    path('jobs/<int:pk>/download/',
+         JobDownload.as_view(),
+         name='productinfo_job_download_urlpattern'),
+
+    path('async/customer/',
+         async_views.customer_list,
+         name='productinfo_async_customer_list_urlpattern'),
+
+    path('async/customer/<int:pk>/',
+         async_views.customer_detail,
+         name='productinfo_async_customer_detail_urlpattern'),
+
+    path('async/product/',
+         async_views.product_list,
+         name='productinfo_async_product_list_urlpattern'),
+
+    path('async/product/<int:pk>/',
+         async_views.product_detail,
+         name='productinfo_async_product_detail_urlpattern'),
+
+    path('async/order/',
+         async_views.order_list,
+         name='productinfo_async_order_list_urlpattern'),
+
+    path('async/order/<int:pk>/',
+         async_views.order_detail,
+         name='productinfo_async_order_detail_urlpattern'),
+
 ]
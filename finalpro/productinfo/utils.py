@@ -1,4 +1,18 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import models
+from django.db.models import Count, OuterRef, ProtectedError, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from productinfo.versions import get_version
 
 
 # class ObjectCreateMixin:
@@ -22,3 +36,340 @@ from django.shortcuts import redirect, render
 # 				self.template_name,
 # 				{'form':bound_form})
 
+
+
+def date_range(start=None, end=None):
+	"""Turn inclusive start/end dates into aware [lower, upper) datetime bounds."""
+	lower = upper = None
+	if start is not None:
+		lower = timezone.make_aware(datetime.combine(start, time.min))
+	# The last representable day has no day after it to bound it.
+	if end is not None and end < date.max:
+		upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+	return lower, upper
+
+
+class SeekPage:
+	"""A page of results that knows its neighbours without counting the table."""
+
+	def __init__(self, object_list, has_next, has_previous, next_query='', previous_query=''):
+		self.object_list = object_list
+		self.has_next_page = has_next
+		self.has_previous_page = has_previous
+		self.next_query = next_query
+		self.previous_query = previous_query
+
+	def __iter__(self):
+		return iter(self.object_list)
+
+	def __len__(self):
+		return len(self.object_list)
+
+	def has_next(self):
+		return self.has_next_page
+
+	def has_previous(self):
+		return self.has_previous_page
+
+	def has_other_pages(self):
+		return self.has_next_page or self.has_previous_page
+
+
+class SeekPaginationMixin:
+	"""
+	Page-size-limited listing for ListView subclasses.
+
+	The default 'keyset' mode seeks on the model's Meta.ordering (with the
+	primary key appended as a tie-breaker), so every page is an index range
+	read no matter how deep it is. The 'offset' mode keeps ?page=N links.
+	Neither mode issues a COUNT(*): one extra row is fetched to learn
+	whether another page exists.
+	"""
+	paginate_by = 25
+	max_paginate_by = 200
+	pagination_mode = 'keyset'
+	page_kwarg = 'page'
+	after_kwarg = 'after'
+	before_kwarg = 'before'
+	size_kwarg = 'size'
+
+	def get_paginate_by(self, queryset):
+		try:
+			size = int(self.request.GET.get(self.size_kwarg, self.paginate_by))
+		except ValueError:
+			size = self.paginate_by
+		return max(1, min(size, self.max_paginate_by))
+
+	def get_seek_fields(self):
+		opts = self.model._meta
+		fields = []
+		for name in opts.ordering:
+			descending = name.startswith('-')
+			fields.append((opts.get_field(name.lstrip('-')), descending))
+		if not any(field.primary_key for field, descending in fields):
+			fields.append((opts.pk, False))
+		return fields
+
+	def get_ordering(self):
+		# Order on the raw columns (attname) so foreign keys don't pull in
+		# the related model's own default ordering and a join.
+		return [
+			('-' if descending else '') + field.attname
+			for field, descending in self.get_seek_fields()
+		]
+
+	def paginate_queryset(self, queryset, page_size):
+		if self.pagination_mode == 'offset':
+			page = self.offset_page(queryset, page_size)
+		else:
+			page = self.keyset_page(queryset, page_size)
+		return None, page, page.object_list, page.has_other_pages()
+
+	def page_query(self, **params):
+		query = self.request.GET.copy()
+		for key in (self.page_kwarg, self.after_kwarg, self.before_kwarg):
+			query.pop(key, None)
+		query.update(params)
+		return query.urlencode()
+
+	def offset_page(self, queryset, page_size):
+		try:
+			number = max(1, int(self.request.GET.get(self.page_kwarg, 1)))
+		except ValueError:
+			number = 1
+		offset = (number - 1) * page_size
+		rows = list(queryset[offset:offset + page_size + 1])
+		has_next = len(rows) > page_size
+		return SeekPage(
+			rows[:page_size],
+			has_next,
+			number > 1,
+			self.page_query(**{self.page_kwarg: number + 1}) if has_next else '',
+			self.page_query(**{self.page_kwarg: number - 1}) if number > 1 else '',
+		)
+
+	def keyset_page(self, queryset, page_size):
+		fields = self.get_seek_fields()
+		after = self.decode_cursor(self.request.GET.get(self.after_kwarg), fields)
+		before = self.decode_cursor(self.request.GET.get(self.before_kwarg), fields)
+
+		if before is not None:
+			backwards = queryset.filter(self.seek_filter(fields, before, backwards=True)).reverse()
+			rows = list(backwards[:page_size + 1])
+			has_previous = len(rows) > page_size
+			rows = rows[:page_size][::-1]
+			# Usually the page the cursor came from, unless its rows are gone.
+			has_next = bool(rows) and queryset.filter(
+				self.seek_filter(fields, self.seek_values(rows[-1], fields))
+			).exists()
+		else:
+			if after is not None:
+				queryset = queryset.filter(self.seek_filter(fields, after))
+			rows = list(queryset[:page_size + 1])
+			has_next = len(rows) > page_size
+			rows = rows[:page_size]
+			has_previous = after is not None
+
+		next_query = previous_query = ''
+		if rows and has_next:
+			next_query = self.page_query(**{self.after_kwarg: self.encode_cursor(rows[-1], fields)})
+		if rows and has_previous:
+			previous_query = self.page_query(**{self.before_kwarg: self.encode_cursor(rows[0], fields)})
+		return SeekPage(rows, has_next and bool(rows), has_previous and bool(rows),
+						next_query, previous_query)
+
+	@staticmethod
+	def seek_filter(fields, values, backwards=False):
+		# (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR ...
+		condition = Q()
+		for position, (field, descending) in enumerate(fields):
+			lookup = 'lt' if descending != backwards else 'gt'
+			term = Q(**{f'{field.attname}__{lookup}': values[position]})
+			for prior_position in range(position):
+				term &= Q(**{fields[prior_position][0].attname: values[prior_position]})
+			condition |= term
+		return condition
+
+	@staticmethod
+	def seek_values(obj, fields):
+		return [getattr(obj, field.attname) for field, descending in fields]
+
+	@staticmethod
+	def encode_cursor(obj, fields):
+		# value_to_string keeps datetimes to the microsecond; DjangoJSONEncoder
+		# would cut them to milliseconds and repeat or skip rows at the seam.
+		values = [
+			None if getattr(obj, field.attname) is None else field.value_to_string(obj)
+			for field, descending in fields
+		]
+		raw = json.dumps(values).encode()
+		return urlsafe_b64encode(raw).decode().rstrip('=')
+
+	@staticmethod
+	def decode_cursor(cursor, fields):
+		"""The seek values in a cursor, or None (the first page) for one that isn't valid."""
+		if not cursor:
+			return None
+		try:
+			raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+			values = json.loads(raw)
+			if not isinstance(values, list) or len(values) != len(fields):
+				return None
+			# None can't be sought past, and lists or objects only come from tampering.
+			if not all(isinstance(value, (str, int, float)) for value in values):
+				return None
+			values = [
+				field.target_field.to_python(value) if field.is_relation else field.to_python(value)
+				for (field, descending), value in zip(fields, values)
+			]
+		except (TypeError, ValueError, ValidationError):
+			return None
+		return None if None in values else values
+
+
+def permission_digest(user):
+	return hashlib.md5(','.join(sorted(user.get_all_permissions())).encode()).hexdigest()
+
+
+def fragment_key(request, versions):
+	parts = [str(get_version(name)) for name in versions]
+	parts.append(permission_digest(request.user))
+	parts.append(request.get_full_path())
+	return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def fragment_cache():
+	# The {% cache %} tag prefers this alias when it is configured.
+	try:
+		return caches['template_fragments']
+	except InvalidCacheBackendError:
+		return caches['default']
+
+
+def fragments_cached(names, key):
+	keys = [make_template_fragment_key(name, [key]) for name in names]
+	return len(fragment_cache().get_many(keys)) == len(keys)
+
+
+class FragmentCacheMixin:
+	"""
+	Cache the rendered body of a list or detail page.
+
+	The template wraps its body in {% cache fragment_timeout <fragment_name>
+	fragment_key %}. The key combines the version stamps of every model the
+	page shows (bumped on writes by productinfo.signals, for the models in
+	its PAGE_MODELS), the user's
+	permission set and the full path. When the fragment is already cached the
+	view skips building its context, so a warm page runs no catalog queries.
+	"""
+	fragment_name = None
+	fragment_versions = ()
+	fragment_timeout = 600
+
+	def get_fragment_names(self):
+		return [self.fragment_name]
+
+	def get_fragment_key(self):
+		return fragment_key(self.request, self.fragment_versions)
+
+	def get(self, request, *args, **kwargs):
+		self.fragment_key = self.get_fragment_key()
+		if fragments_cached(self.get_fragment_names(), self.fragment_key):
+			# Template names are derived from these without touching the database.
+			self.object = None
+			self.object_list = self.model.objects.none()
+			return self.render_to_response({
+				'view': self,
+				'fragment_key': self.fragment_key,
+				'fragment_timeout': self.fragment_timeout,
+			})
+		return super().get(request, *args, **kwargs)
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['fragment_key'] = self.fragment_key
+		context['fragment_timeout'] = self.fragment_timeout
+		return context
+
+
+class DetailFragmentCacheMixin(FragmentCacheMixin):
+	# Detail titles show the object too, so they are cached alongside the body.
+	def get_fragment_names(self):
+		return [self.fragment_name, f'{self.fragment_name}_title']
+
+
+class Blocker:
+	def __init__(self, relation, count, preview):
+		self.relation = relation
+		self.label = relation.get_accessor_name().replace('_', ' ')
+		self.count = count
+		self.exists = count > 0
+		self.preview = preview
+		self.remaining = count - len(preview)
+
+
+def protected_dependencies(obj, preview=10):
+	"""
+	Return a Blocker for every on_delete=PROTECT relation pointing at obj.
+
+	All counts come from one query of scalar subqueries, one per relation.
+	Only relations that have rows then fetch a preview, capped at `preview`
+	rows, so the cost doesn't grow with the object's history.
+	"""
+	relations = [
+		relation for relation in obj._meta.related_objects
+		if relation.on_delete is models.PROTECT and not relation.many_to_many
+	]
+	if not relations:
+		return []
+	counts = type(obj).objects.filter(pk=obj.pk).values(**{
+		f'{relation.get_accessor_name()}_count': Coalesce(Subquery(
+			relation.related_model.objects
+			.filter(**{relation.field.name: OuterRef('pk')})
+			.order_by()
+			.values(relation.field.name)
+			.annotate(count=Count('*'))
+			.values('count')
+		), 0)
+		for relation in relations
+	}).get()
+
+	blockers = []
+	for relation in relations:
+		count = counts[f'{relation.get_accessor_name()}_count']
+		rows = []
+		if count:
+			rows = list(
+				relation.related_model.objects
+				.filter(**{relation.field.name: obj})
+				.select_related()[:preview]
+			)
+		blockers.append(Blocker(relation, count, rows))
+	return blockers
+
+
+class ProtectedDeleteMixin:
+	"""
+	DeleteView mixin that shows refuse_template_name instead of the confirm
+	page while anything still protects the object from deletion.
+	"""
+	refuse_template_name = None
+	blocker_preview = 10
+
+	def get(self, request, *args, **kwargs):
+		self.object = self.get_object()
+		blockers = [blocker for blocker in protected_dependencies(self.object, self.blocker_preview) if blocker.exists]
+		if blockers:
+			return render(request, self.refuse_template_name, {
+				self.get_context_object_name(self.object): self.object,
+				'object': self.object,
+				'blockers': blockers,
+			})
+		return self.render_to_response(self.get_context_data(object=self.object))
+
+	def delete(self, request, *args, **kwargs):
+		try:
+			return super().delete(request, *args, **kwargs)
+		except ProtectedError:
+			# Something started referencing the object after the confirm page.
+			return self.get(request, *args, **kwargs)
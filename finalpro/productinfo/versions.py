@@ -0,0 +1,62 @@
+import time
+from datetime import datetime, timezone
+
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = 'productinfo:version:{}'
+
+
+def now_version():
+	return time.time_ns() // 1000
+
+
+def get_version(name):
+	"""
+	Return the current version stamp for `name`.
+
+	Stamps are microsecond timestamps kept in the default cache without a
+	timeout, so every process sharing that cache sees the same value. If the
+	key has been lost, a fresh stamp is taken from the clock, which is
+	always newer than any stamp handed out before.
+	"""
+	key = VERSION_KEY.format(name)
+	version = cache.get(key)
+	if version is None:
+		version = now_version()
+		if not cache.add(key, version, timeout=None):
+			version = cache.get(key, version)
+	return version
+
+
+def get_versions(names):
+	"""Return {name: get_version(name)}, reading the stored stamps in one go."""
+	keys = {name: VERSION_KEY.format(name) for name in names}
+	found = cache.get_many(keys.values())
+	return {name: found[key] if key in found else get_version(name) for name, key in keys.items()}
+
+
+def bump_version(*names):
+	for name in names:
+		key = VERSION_KEY.format(name)
+		cache.set(key, max(now_version(), get_version(name) + 1), timeout=None)
+
+
+def version_datetime(version):
+	return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_versions(app_configs, **kwargs):
+	if isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)):
+		return [checks.Warning(
+			'The default cache is not shared between processes.',
+			hint=(
+				'Version stamps in it invalidate cached pages, permission snapshots '
+				'and lookup tables; other worker processes never see their changes.'
+			),
+			id='productinfo.W001',
+		)]
+	return []
@@ -1,34 +1,60 @@
+from datetime import date, timedelta
+
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views import View
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-
-from productinfo.forms import CustomerForm, ProductForm, ShoppingCartForm, CartItemForm, OrderForm, OrderProductForm
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, TemplateView
+from django.views.generic.detail import SingleObjectMixin
+
+from productinfo.forms import CustomerForm, ProductForm, ShoppingCartForm, CartItemForm, OrderForm, OrderProductForm, \
+	ProductImportForm, OrderExportForm, OrderDateFilterForm, CheckoutForm, \
+	ProductSearchForm, RebuildJobForm, SalesReportForm
+from productinfo.exporters import export_lines, export_rows, order_lines
+from productinfo.caches import leaderboard_cache, lookup_cache, product_cache
+from productinfo.checkout import CheckoutError, checkout
+from productinfo.reservations import StockError, hold_stock
+from productinfo.rollups import WINDOWS, monthly_sales, sales_breakdown
+from productinfo.search import search_products
+from productinfo.sqlite import write_atomic
+from productinfo.importers import import_products, read_rows
+from productinfo.jobs import enqueue
 from productinfo.models import (
+	Category,
+	Shipping_Method,
+	Payment_Method,
 	Customer,
 	Product,
 	Shopping_Cart,
 	Cart_Item,
 	Order,
 	Order_Product,
-
+	Daily_Category_Sales,
+	Daily_Shipping_Sales,
+	Daily_Payment_Sales,
+	Job,
 )
+from productinfo.utils import SeekPaginationMixin, FragmentCacheMixin, DetailFragmentCacheMixin, ProtectedDeleteMixin
 
 
-class CustomerList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class CustomerList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Customer
 	permission_required = 'productinfo.view_customer'
+	fragment_name = 'productinfo_customer_list'
+	fragment_versions = ('customer',)
 
 
-class CustomerDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class CustomerDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
 	model = Customer
 	permission_required = 'productinfo.view_customer'
+	fragment_name = 'productinfo_customer_detail'
+	fragment_versions = ('customer', 'shipping_method', 'payment_method', 'shopping_cart', 'order')
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		customer = self.get_object()
+		context = super().get_context_data(**kwargs)
+		customer = self.object
 		shipping_method = customer.sm_id
 		payment_method = customer.pm_id
 		order_list = customer.orders.all()
@@ -53,45 +79,58 @@ class CustomerUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
 	permission_required = 'productinfo.change_customer'
 
 
-class CustomerDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class CustomerDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Customer
 	success_url = reverse_lazy('productinfo_customer_list_urlpattern')
 	permission_required = 'productinfo.delete_customer'
+	refuse_template_name = 'productinfo/customer_refuse_delete.html'
 
-	def get(self, request, pk):
-		customer = get_object_or_404(Customer, pk=pk)
-		orders = customer.orders.all()
-		shopping_cart = customer.shopping_carts.all()
 
-		if orders.count() > 0 or shopping_cart.count() > 0:
-			return render(
-				request,
-				'productinfo/customer_refuse_delete.html',
-				{'customer': customer,
-				 'orders': orders,
-				 'shopping_cart': shopping_cart,
-				 }
-			)
-		else:
-			return render(
-				request,
-				'productinfo/customer_confirm_delete.html',
-				{'customer': customer}
-			)
-
-
-class ProductList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class ProductList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Product
 	permission_required = 'productinfo.view_product'
+	fragment_name = 'productinfo_product_list'
+	fragment_versions = ('product',)
 
 
-class ProductDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class ProductSearch(LoginRequiredMixin, PermissionRequiredMixin, SeekPaginationMixin, ListView):
 	model = Product
 	permission_required = 'productinfo.view_product'
+	template_name = 'productinfo/product_search.html'
+	pagination_mode = 'offset'
+	replica_versions = ('category',)
+
+	def get_ordering(self):
+		# Ranked by search_products(), not by Meta.ordering.
+		return None
+
+	def get_queryset(self):
+		self.search_form = ProductSearchForm(self.request.GET)
+		if not self.search_form.is_valid():
+			return Product.objects.none()
+		return search_products(self.search_form.cleaned_data['q'])
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		product = self.get_object()
+		context = super().get_context_data(**kwargs)
+		context['search_form'] = self.search_form
+		return context
+
+
+class ProductDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
+	model = Product
+	permission_required = 'productinfo.view_product'
+	fragment_name = 'productinfo_product_detail'
+	fragment_versions = ('product', 'category')
+
+	def get_object(self, queryset=None):
+		product = product_cache.get(self.kwargs['pk'])
+		if product is None:
+			raise Http404('No product matches the given query.')
+		return product
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		product = self.object
 		category = product.category_id
 		context['category'] = category
 		return context
@@ -109,55 +148,54 @@ class ProductUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
 	template_name = 'productinfo/product_form_update.html'
 	permission_required = 'productinfo.change_product'
 
+	def form_valid(self, form):
+		try:
+			return super().form_valid(form)
+		except StockError as error:
+			form.add_error(None, str(error))
+			return self.form_invalid(form)
+
 
-class ProductDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class ProductImport(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+	form_class = ProductImportForm
+	template_name = 'productinfo/product_import.html'
+	permission_required = ('productinfo.add_product', 'productinfo.change_product')
+
+	def form_valid(self, form):
+		rows = read_rows(form.cleaned_data['file'], form.cleaned_data['format'])
+		result = import_products(rows)
+		return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
+class ProductDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Product
 	success_url = reverse_lazy('productinfo_product_list_urlpattern')
 	permission_required = 'productinfo.delete_product'
+	refuse_template_name = 'productinfo/product_refuse_delete.html'
 
-	def get(self, request, pk):
-		product = get_object_or_404(Product, pk=pk)
-		cartitem = product.cart_items.all()
-		orderproduct = product.order_products.all()
-
-		if orderproduct.count() > 0 or cartitem.count() > 0:
-			return render(
-				request,
-				'productinfo/product_refuse_delete.html',
-				{'product':product,
-				 'cartitem': cartitem,
-				 'orderproduct':orderproduct,
-
-				}
-			)
-		else:
-			return render(
-				request,
-				'productinfo/product_confirm_delete.html',
-				{'product': product}
-			)
-
-
-class ShoppingCartList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+
+class ShoppingCartList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Shopping_Cart
+	queryset = Shopping_Cart.objects.select_related('customer_id')
 	permission_required = 'productinfo.view_shopping_cart'
+	fragment_name = 'productinfo_shopping_cart_list'
+	fragment_versions = ('shopping_cart', 'customer')
 
 
-class ShoppingCartDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class ShoppingCartDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
 	model = Shopping_Cart
 	permission_required = 'productinfo.view_shopping_cart'
+	fragment_name = 'productinfo_shopping_cart_detail'
+	fragment_versions = ('shopping_cart', 'cart_item', 'customer', 'product', 'shipping_method', 'payment_method')
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		shopping_cart = self.get_object()
+		context = super().get_context_data(**kwargs)
+		shopping_cart = self.object
 		customer_id = shopping_cart.customer_id
 		shipping_method = shopping_cart.sm_id
 		payment_method = shopping_cart.pm_id
-		sc_list = shopping_cart.cart_items.all()
-
-		total = 0
-		for product in sc_list:
-			total = product.quantity * product.product_id.product_price + total
+		sc_list = shopping_cart.cart_items.with_subtotal().select_related('cart_id__customer_id', 'product_id')
+		total = shopping_cart.cart_items.total()
 
 		context['customer_id'] = customer_id
 		context['shipping_method'] = shipping_method
@@ -180,90 +218,144 @@ class ShoppingCartCreate(LoginRequiredMixin, PermissionRequiredMixin, CreateView
 	permission_required = 'productinfo.add_shopping_cart'
 
 
-class ShoppingCartDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class ShoppingCartCheckout(LoginRequiredMixin, PermissionRequiredMixin, SingleObjectMixin, FormView):
+	model = Shopping_Cart
+	form_class = CheckoutForm
+	template_name = 'productinfo/shopping_cart_checkout.html'
+	permission_required = ('productinfo.add_order', 'productinfo.add_order_product', 'productinfo.delete_cart_item')
+
+	# Loaded here rather than in dispatch(), so the login and permission
+	# checks run before anything is looked up.
+	def get(self, request, *args, **kwargs):
+		self.object = self.get_object()
+		return super().get(request, *args, **kwargs)
+
+	def post(self, request, *args, **kwargs):
+		self.object = self.get_object()
+		return super().post(request, *args, **kwargs)
+
+	def get_initial(self):
+		customer = self.object.customer_id
+		return {'receiver': f'{customer.first_name} {customer.last_name}'}
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['sc_list'] = self.object.cart_items.with_subtotal().select_related('product_id')
+		context['total'] = self.object.cart_items.total()
+		return context
+
+	def form_valid(self, form):
+		try:
+			order = checkout(self.object, form.cleaned_data['receiver'], form.cleaned_data['address'])
+		except (CheckoutError, StockError) as error:
+			form.add_error(None, str(error))
+			return self.form_invalid(form)
+		return redirect(order)
+
+
+class ShoppingCartDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Shopping_Cart
+	template_name = 'productinfo/shoppingcart_confirm_delete.html'
 	success_url = reverse_lazy('productinfo_shopping_cart_list_urlpattern')
 	permission_required = 'productinfo.delete_shopping_cart'
+	refuse_template_name = 'productinfo/shoppingcart_refuse_delete.html'
 
-	def get(self, request, pk):
-		shopping_cart = get_object_or_404(Shopping_Cart, pk=pk)
-		sc_list = shopping_cart.cart_items.all()
-		if sc_list.count() > 0:
-			return render(
-				request,
-				'productinfo/shopping_cart_refuse_delete.html',
-				{'shopping_cart': shopping_cart,
-				 'sc_list': sc_list,
-				 }
-			)
-		else:
-			return render(
-				request,
-				'productinfo/shoppingcart_confirm_delete.html',
-				{'shopping_cart': shopping_cart}
-			)
-
-
-class CartItemList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+
+class CartItemList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Cart_Item
+	queryset = Cart_Item.objects.select_related('cart_id__customer_id', 'product_id')
 	permission_required = 'productinfo.view_cart_item'
+	fragment_name = 'productinfo_cart_item_list'
+	fragment_versions = ('cart_item', 'shopping_cart', 'customer', 'product')
 
 
-class CartItemDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class CartItemDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
 	model = Cart_Item
 	permission_required = 'productinfo.view_cart_item'
+	fragment_name = 'productinfo_cart_item_detail'
+	fragment_versions = ('cart_item', 'shopping_cart', 'customer', 'product')
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		cart_item = self.get_object()
+		context = super().get_context_data(**kwargs)
+		cart_item = self.object
 		cart_id = cart_item.cart_id
-		product_id = cart_item.product_id
-		sub_total = cart_item.quantity * cart_item.product_id.product_price
+		product_id = product_cache.get(cart_item.product_id_id)
+		sub_total = cart_item.quantity * product_id.product_price
 		context['cart_id'] = cart_id
 		context['product_id'] = product_id
 		context['sub_total'] = sub_total
 		return context
 
 
-class CartItemCreate(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
+class StockHoldMixin:
+	"""Save a cart item form and hold stock for it in the same transaction."""
+
+	def form_valid(self, form):
+		try:
+			with write_atomic():
+				self.object = form.save()
+				hold_stock(self.object)
+		except StockError as error:
+			form.add_error('quantity', str(error))
+			return self.form_invalid(form)
+		return redirect(self.get_success_url())
+
+
+class CartItemCreate(LoginRequiredMixin, PermissionRequiredMixin, StockHoldMixin, CreateView):
 	form_class = CartItemForm
 	model = Cart_Item
 	permission_required = 'productinfo.add_cart_item'
 
 
-class CartItemUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
+class CartItemUpdate(LoginRequiredMixin, PermissionRequiredMixin, StockHoldMixin, UpdateView):
 	form_class = CartItemForm
 	model = Cart_Item
 	template_name = 'productinfo/cart_item_form_update.html'
 	permission_required = 'productinfo.change_cart_item'
 
 
-class CartItemDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class CartItemDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Cart_Item
 	success_url = reverse_lazy('productinfo_cart_item_list_urlpattern')
 	permission_required = 'productinfo.delete_cart_item'
 
 
-class OrderList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class OrderList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Order
 	permission_required = 'productinfo.view_order'
+	fragment_name = 'productinfo_order_list'
+	fragment_versions = ('order', 'order_product')
+
+	def get_queryset(self):
+		orders = super().get_queryset()
+		self.filter_form = OrderDateFilterForm(self.request.GET)
+		if self.filter_form.is_valid():
+			data = self.filter_form.cleaned_data
+			if data['days']:
+				orders = orders.filter(order_date__gte=timezone.now() - timedelta(days=data['days']))
+			orders = orders.placed_between(data['start'], data['end'])
+		return orders
 
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['filter_form'] = self.filter_form
+		return context
 
-class OrderDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+
+class OrderDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
 	model = Order
 	permission_required = 'productinfo.view_order'
+	fragment_name = 'productinfo_order_detail'
+	fragment_versions = ('order', 'order_product', 'customer', 'product', 'shipping_method', 'payment_method')
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		order = self.get_object()
+		context = super().get_context_data(**kwargs)
+		order = self.object
 		customer_id = order.customer_id
 		shipping_method = order.sm_id
 		payment_method = order.pm_id
-		product_list = order.order_products.all()
-
-		total = 0
-		for product in product_list:
-			total = product.quantity * product.product_id.product_price + total
+		product_list = order.order_products.with_subtotal().select_related('order_id', 'product_id')
+		total = order.total_price
 
 		context['customer_id'] = customer_id
 		context['shipping_method'] = shipping_method
@@ -286,45 +378,50 @@ class OrderUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
 	permission_required = 'productinfo.change_order'
 
 
-class OrderDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class OrderDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Order
 	success_url = reverse_lazy('productinfo_order_list_urlpattern')
 	permission_required = 'productinfo.delete_order'
+	refuse_template_name = 'productinfo/order_refuse_delete.html'
 
-	def get(self, request, pk):
-		order = get_object_or_404(Order, pk=pk)
-		op_list = order.order_products.all()
-		if op_list.count() > 0:
-			return render(
-				request,
-				'productinfo/order_refuse_delete.html',
-				{'order': order,
-				 'op_list': op_list,
-				 }
-			)
-		else:
-			return render(
-				request,
-				'productinfo/order_confirm_delete.html',
-				{'order': order}
-			)
-
-
-class OrderProductList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+
+class OrderExport(LoginRequiredMixin, PermissionRequiredMixin, View):
+	permission_required = ('productinfo.view_order', 'productinfo.view_order_product')
+
+	def get(self, request):
+		form = OrderExportForm(request.GET)
+		if not form.is_valid():
+			return HttpResponseBadRequest(form.errors.as_text())
+		file_format = form.cleaned_data['format'] or 'csv'
+		lines = order_lines(form.cleaned_data['start'], form.cleaned_data['end'], form.cleaned_data['customer'])
+		response = StreamingHttpResponse(
+			export_lines(export_rows(lines), file_format),
+			content_type='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+		)
+		response['Content-Disposition'] = f'attachment; filename="orders.{file_format}"'
+		return response
+
+
+class OrderProductList(LoginRequiredMixin, PermissionRequiredMixin, FragmentCacheMixin, SeekPaginationMixin, ListView):
 	model = Order_Product
+	queryset = Order_Product.objects.select_related('order_id', 'product_id')
 	permission_required = 'productinfo.view_order_product'
+	fragment_name = 'productinfo_order_product_list'
+	fragment_versions = ('order_product', 'order', 'product')
 
 
-class OrderProductDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class OrderProductDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailFragmentCacheMixin, DetailView):
 	model = Order_Product
 	permission_required = 'productinfo.view_order_product'
+	fragment_name = 'productinfo_order_product_detail'
+	fragment_versions = ('order_product', 'order', 'product')
 
 	def get_context_data(self, **kwargs):
-		context = super(DetailView, self).get_context_data(**kwargs)
-		order_product = self.get_object()
+		context = super().get_context_data(**kwargs)
+		order_product = self.object
 		order_id = order_product.order_id
-		product_id = order_product.product_id
-		sub_total = order_product.quantity * order_product.product_id.product_price
+		product_id = product_cache.get(order_product.product_id_id)
+		sub_total = order_product.quantity * order_product.price
 		context['order_id'] = order_id
 		context['product_id'] = product_id
 		context['sub_total'] = sub_total
@@ -344,7 +441,159 @@ class OrderProductUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView
 	permission_required = 'productinfo.change_order_product'
 
 
-class OrderProductDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class OrderProductDelete(LoginRequiredMixin, PermissionRequiredMixin, ProtectedDeleteMixin, DeleteView):
 	model = Order_Product
 	success_url = reverse_lazy('productinfo_order_product_list_urlpattern')
 	permission_required = 'productinfo.delete_order_product'
+
+
+class JobVisibilityMixin:
+	"""Staff with productinfo.view_job see every job, everyone else only their own."""
+	model = Job
+
+	def get_queryset(self):
+		jobs = super().get_queryset()
+		if not self.request.user.has_perm('productinfo.view_job'):
+			jobs = jobs.filter(created_by=self.request.user)
+		return jobs
+
+
+class JobList(LoginRequiredMixin, JobVisibilityMixin, SeekPaginationMixin, ListView):
+	pass
+
+
+class JobDetail(LoginRequiredMixin, JobVisibilityMixin, DetailView):
+	pass
+
+
+class JobDownload(LoginRequiredMixin, JobVisibilityMixin, SingleObjectMixin, View):
+	def get(self, request, pk):
+		job = self.get_object()
+		if job.status != Job.DONE or not job.output_path:
+			raise Http404('This job has no output to download.')
+		try:
+			output = open(job.output_path, 'rb')
+		except FileNotFoundError:
+			raise Http404('The output of this job has been removed.')
+		return FileResponse(output, as_attachment=True)
+
+
+class JobCreateMixin(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+	"""
+	Queue a job of job_kind from a submitted form instead of doing the work
+	in the request, then send the user to the job's status page.
+	"""
+	template_name = 'productinfo/job_form.html'
+	job_kind = None
+	upload_field = None
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['title'] = self.title
+		return context
+
+	def form_valid(self, form):
+		data = dict(form.cleaned_data)
+		upload = data.pop(self.upload_field) if self.upload_field else None
+		# Job parameters are stored as JSON.
+		params = {
+			name: value.isoformat() if isinstance(value, date) else value
+			for name, value in data.items()
+			if value not in (None, '')
+		}
+		job = enqueue(self.job_kind, params, self.request.user, upload)
+		return redirect(job)
+
+
+class OrderExportJob(JobCreateMixin):
+	form_class = OrderExportForm
+	permission_required = ('productinfo.view_order', 'productinfo.view_order_product')
+	job_kind = 'export_orders'
+	title = 'Export Orders in the Background'
+
+
+class ProductImportJob(JobCreateMixin):
+	form_class = ProductImportForm
+	permission_required = ('productinfo.add_product', 'productinfo.change_product')
+	job_kind = 'import_products'
+	upload_field = 'file'
+	title = 'Import Products in the Background'
+
+
+class OrderTotalsJob(JobCreateMixin):
+	form_class = RebuildJobForm
+	permission_required = 'productinfo.change_order'
+	job_kind = 'rebuild_order_totals'
+	title = 'Rebuild Order Totals'
+
+
+class ProductSearchJob(JobCreateMixin):
+	form_class = RebuildJobForm
+	permission_required = 'productinfo.change_product'
+	job_kind = 'rebuild_product_search'
+	title = 'Rebuild the Product Search Index'
+
+
+class SalesReport(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
+	"""Sales per month and per category and method, read from the daily rollups only."""
+	template_name = 'productinfo/sales_report.html'
+	permission_required = 'productinfo.view_daily_sales'
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		form = SalesReportForm(self.request.GET)
+		data = form.cleaned_data if form.is_valid() else {}
+		end = data.get('end') or timezone.localdate()
+		# Twelve whole months up to and including the end's.
+		months = end.year * 12 + end.month - 12
+		start = data.get('start') or date(months // 12, months % 12 + 1, 1)
+		product = data.get('product')
+
+		context['form'] = form
+		context['start'] = start
+		context['end'] = end
+		context['product'] = product
+		context['months'] = monthly_sales(start, end, product.pk if product else None)
+		context['totals'] = {
+			name: sum(month[name] or 0 for month in context['months'])
+			for name in ('lines', 'units', 'revenue')
+		}
+		if not product:
+			for name, model, lookup_model, field in (
+					('categories', Daily_Category_Sales, Category, 'category_id'),
+					('shipping_methods', Daily_Shipping_Sales, Shipping_Method, 'sm_id'),
+					('payment_methods', Daily_Payment_Sales, Payment_Method, 'pm_id')):
+				rows = sales_breakdown(model, field, start, end)
+				for row in rows:
+					row['name'] = lookup_cache.get(lookup_model, row[field])
+				context[name] = rows
+			context['totals']['orders'] = sum(month['orders'] for month in context['months'])
+		return context
+
+
+class BestSellers(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
+	"""The best selling products, overall or in one category, from the cached leaderboard."""
+	template_name = 'productinfo/best_sellers.html'
+	permission_required = 'productinfo.view_product'
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		days = self.request.GET.get('days')
+		days = int(days) if days in [str(window) for window in WINDOWS] else None
+		category = self.request.GET.get('category')
+		category = lookup_cache.get(Category, int(category)) if category and category.isdigit() else None
+
+		board = leaderboard_cache.get(days)
+		if category is not None:
+			board = board['categories'].get(category.pk, {'units': [], 'revenue': []})
+		products = product_cache.get_many({row[0] for ranking in ('units', 'revenue') for row in board[ranking]})
+		for ranking in ('units', 'revenue'):
+			context[f'by_{ranking}'] = [
+				{'product': products.get(product_id), 'units': units, 'revenue': revenue}
+				for product_id, category_id, units, revenue in board[ranking]
+			]
+		context['days'] = days
+		context['windows'] = WINDOWS
+		context['category'] = category
+		context['categories'] = lookup_cache.all(Category)
+		return context